@@ -1,17 +1,20 @@
 import customtkinter as ctk
 import time
-import threading
 from core.brain import BrainLogic
+from core.retrainer import RetrainService
+from core.task_runner import UITaskRunner
 from core.vision import VisionSystem
 from core.logger import log
 from core.constants import (
     AppState, AUTO_RESET_AFTER_SUCCESS, APP_TITLE, SIDEBAR_TITLE,
     CAM_INFO_SLEEP, CAM_INFO_WAKE_UP, CAM_CLICK_TO_START, CAM_STARTING,
-    LEADERBOARD_LIMIT, ZONE_GREEN, ZONE_YELLOW
+    LEADERBOARD_LIMIT, SUBMISSION_MIN_LOADING, ZONE_GREEN, ZONE_YELLOW,
+    FACE_MAX_ENCODINGS_PER_USER
 )
 from ui.camera_page import CameraPage
 from ui.confirm_page import ConfirmPage
 from ui.input_page import InputPage
+from ui.leaderboard_view import LeaderboardView
 from ui.loading_page import LoadingPage
 from ui.register_page import RegisterPage
 from ui.result_page import ResultPage
@@ -31,6 +34,8 @@ class GoodDeedApp(ctk.CTk):
         # --- System Components ---
         self.brain = BrainLogic()
         self.vision = VisionSystem()
+        self.retrainer = RetrainService(self.brain) # hot-swaps validated models in the background
+        self.tasks = UITaskRunner(self) # brain/DB work off the Tk thread, results back via after()
         
         # --- State Management ---
         self.current_state = AppState.STANDBY
@@ -38,6 +43,7 @@ class GoodDeedApp(ctk.CTk):
         self.pending_encoding = None
         self.auto_reset_timer = None
         self.temp_potential_user = None
+        self._submission_id = 0 # results of an abandoned submission (e.g. Escape) are dropped
 
         # --- UI and Services ---
         self._setup_sidebar()
@@ -52,7 +58,8 @@ class GoodDeedApp(ctk.CTk):
         )
         
         # --- Initial State ---
-        self.vision.load_memory(self.brain.get_all_users())
+        self.vision.load_memory(*self.brain.get_face_memory())
+        self.retrainer.start()
         
         if not self.brain.is_trained:
             self._train_model_flow()
@@ -73,18 +80,10 @@ class GoodDeedApp(ctk.CTk):
         self._show_frame(AppState.LOADING)
         self.loading_page.set_text("Model AI sedang disiapkan... (± 15 detik)")
         
-        # Run training in a separate thread to not freeze the GUI
-        training_thread = threading.Thread(target=self._run_training_in_thread)
-        training_thread.daemon = True
-        training_thread.start()
-
-    def _run_training_in_thread(self):
-        """The actual training process, run in a background thread."""
-        self.brain.train()
-        # Once training is done, schedule the next step in the main thread
-        self.after(100, self._on_training_complete)
-
-    def _on_training_complete(self):
+        # Run training in the worker to not freeze the GUI; completion comes back on the main thread
+        self.tasks.submit(self.brain.train, on_done=self._on_training_complete)
+
+    def _on_training_complete(self, _=None):
         """Callback executed in the main thread after the model is trained."""
         log.info("Model training complete.")
         self._go_to_sleep()
@@ -120,8 +119,8 @@ class GoodDeedApp(ctk.CTk):
         lb_title = ctk.CTkLabel(self.sidebar, text="🏆 Top Siswa", font=ctk.CTkFont(size=18, weight="bold"))
         lb_title.grid(row=3, column=0, padx=20, pady=(10, 10))
 
-        self.leaderboard_frame = ctk.CTkScrollableFrame(self.sidebar, label_text="Orang Baik", fg_color="white")
-        self.leaderboard_frame.grid(row=4, column=0, padx=20, pady=10, sticky="nsew")
+        self.leaderboard_view = LeaderboardView(self.sidebar, size=LEADERBOARD_LIMIT)
+        self.leaderboard_view.grid(row=4, column=0, padx=20, pady=10, sticky="nsew")
         self.update_leaderboard()
 
     def _setup_main_area(self):
@@ -139,21 +138,11 @@ class GoodDeedApp(ctk.CTk):
         self._show_frame(AppState.CAMERA)
     
     def update_leaderboard(self):
-        for widget in self.leaderboard_frame.winfo_children():
-            widget.destroy()
-            
-        data = self.brain.get_leaderboard(LEADERBOARD_LIMIT)
-        if not data:
-            ctk.CTkLabel(self.leaderboard_frame, text="Belum ada data.").pack()
-            return
-            
-        for idx, (name, class_name, score) in enumerate(data):
-            row = ctk.CTkFrame(self.leaderboard_frame, fg_color="transparent")
-            row.pack(fill="x", pady=2)
-            ctk.CTkLabel(row, text=f"{idx+1}. {name} ({class_name})", anchor="w").pack(side="left", padx=5)
-            ctk.CTkLabel(row, text=f"{score} poin", font=ctk.CTkFont(weight="bold")).pack(side="right", padx=5)
+        """Reads the (cached) leaderboard in the worker, relabels the sidebar rows on the main thread."""
+        self.tasks.submit(self.brain.get_leaderboard, LEADERBOARD_LIMIT, on_done=self.leaderboard_view.show)
 
     def start_reset(self):
+        self._submission_id += 1 # a submission still running in the worker is abandoned
         self.loading_page.set_text("Sabar ya, sedang proses menuju ke halaman awal... 🔄")
         self._show_frame(AppState.LOADING)
         self.after(2000, self._reset_app)
@@ -257,6 +246,9 @@ class GoodDeedApp(ctk.CTk):
         
         if zone == "GREEN":
             self.active_user = user
+            if self.vision.should_auto_enroll(user, vision_data["distance"]):
+                # Confident login: keep this capture as an extra encoding for the student (DB write in the worker)
+                self.tasks.submit(self._auto_enroll, user, encoding)
             self.input_page.set_welcome_message(user['nama'])
             self._show_frame(AppState.INPUT)
         elif zone == "YELLOW":
@@ -268,6 +260,13 @@ class GoodDeedApp(ctk.CTk):
             log.info("APP: Unrecognized face detected. Triggering registration.")
             self._show_frame(AppState.REGISTER)
         
+    def _auto_enroll(self, user, encoding):
+        """Runs in the worker thread. The cap is checked again with the insert: logins queued
+        before the first enrollment landed all passed should_auto_enroll."""
+        if self.brain.add_face_encoding(user["id"], encoding, max_encodings=FACE_MAX_ENCODINGS_PER_USER) is None:
+            return
+        self.vision.add_identity(user, encoding)
+
     def _on_confirm_yes(self):
         self.active_user = self.temp_potential_user
         self.input_page.set_welcome_message(self.active_user['nama'])
@@ -286,14 +285,24 @@ class GoodDeedApp(ctk.CTk):
             return
             
         if self.pending_encoding is not None:
-            success, msg = self.brain.register_user(name, class_name, self.pending_encoding)
-            if success:
-                self.vision.load_memory(self.brain.get_all_users())
-                self.active_user = {"nama": name, "kelas": class_name}
-                self.input_page.set_welcome_message(name)
-                self._show_frame(AppState.INPUT)
-            else:
-                log.error(f"Failed to register user: {msg}")
+            # DB write in the worker; the UI continues in _on_registration_done
+            encoding, registration_id = self.pending_encoding, self._submission_id
+            self.tasks.submit(self.brain.register_user, name, class_name, encoding,
+                              on_done=lambda result: self._on_registration_done(registration_id, encoding, result))
+
+    def _on_registration_done(self, registration_id, encoding, result):
+        success, msg, user = result
+        if not success:
+            log.error(f"Failed to register user: {msg}")
+            return
+        # Incremental update: no re-read from SQLite, no full index rebuild
+        self.vision.add_identity(user, encoding)
+        self.update_leaderboard()
+        if registration_id != self._submission_id: # reset meanwhile: registered, but stay on the reset screen
+            return
+        self.active_user = user
+        self.input_page.set_welcome_message(user["nama"])
+        self._show_frame(AppState.INPUT)
 
     def _submit_idea(self):
         text = self.input_page.get_idea_text()
@@ -301,23 +310,53 @@ class GoodDeedApp(ctk.CTk):
             log.warning("Idea submission too short.")
             return
 
+        self.loading_page.set_text("Sedang menghubungi markas...")
         self._show_frame(AppState.LOADING)
-        self.after(100, lambda: self._process_idea_submission(text))
+        self._submission_id += 1
+        submission_id, started = self._submission_id, time.monotonic()
+        user_class = self.active_user["kelas"] if self.active_user else None
+
+        # History, preprocessing, KNN and CSV logging all run in the worker; the loading
+        # page shows the stage the brain is actually in
+        self.tasks.submit(
+            self._process_idea_submission, text, user_class,
+            on_progress=lambda stage: self._on_submission_progress(submission_id, stage),
+            on_done=lambda result: self._on_submission_done(submission_id, started, result, text),
+            on_error=lambda error: self._on_submission_error(submission_id, error),
+        )
 
-    def _process_idea_submission(self, text):
-        # 1. Get active user details
+    def _process_idea_submission(self, text, user_class, progress):
+        """Runs in the worker thread."""
         class_ideas_history = []
-        if self.active_user:
-            user_class = self.active_user["kelas"]
-            # 2. Retrieve all ideas from the user's class for plagiarism check
+        if user_class:
+            # Retrieve all ideas from the user's class for plagiarism check (cached per class)
+            progress("Mengambil ide-ide di kelasmu...")
             class_ideas_history = self.brain.get_class_ideas_history(user_class)
         
-        # Pass history to predict_and_score
-        result = self.brain.predict_and_score(text, class_history=class_ideas_history)
+        return self.brain.predict_and_score(text, class_history=class_ideas_history, progress=progress)
+
+    def _submission_is_current(self, submission_id):
+        return submission_id == self._submission_id and self.current_state == AppState.LOADING
+
+    def _on_submission_progress(self, submission_id, stage):
+        if self._submission_is_current(submission_id):
+            self.loading_page.set_text(stage)
+
+    def _on_submission_done(self, submission_id, started, result, text_input):
+        if not self._submission_is_current(submission_id):
+            log.info("APP: Dropping the result of an abandoned submission.")
+            return
+        # Keep the loading page up briefly so a fast result does not just flash past
+        remaining_ms = int((SUBMISSION_MIN_LOADING - (time.monotonic() - started)) * 1000)
+        if remaining_ms > 0:
+            self.after(remaining_ms, lambda: self._on_submission_done(submission_id, started, result, text_input))
+            return
+        self._display_submission_result(result, text_input)
 
-        self.loading_page.set_text("Menganalisis kadar kebaikanmu nih 🧐")
-        self.after(1000, lambda: self.loading_page.set_text("Menghitung poin..."))
-        self.after(2000, lambda: self._display_submission_result(result, text))
+    def _on_submission_error(self, submission_id, error):
+        log.error(f"Idea submission failed: {error!r}")
+        if self._submission_is_current(submission_id):
+            self._display_submission_result({"success": False, "msg": "Terjadi kesalahan, coba lagi ya."}, None)
 
     def _display_submission_result(self, result, text_input):
         score = result.get("final_score", 0)
@@ -330,8 +369,10 @@ class GoodDeedApp(ctk.CTk):
             self.result_page.show_success(score, feedback)
             
             if self.active_user:
-                self.brain.add_points(self.active_user["nama"], self.active_user["kelas"], score, text_input, result["prediction_level"])
-                self.update_leaderboard() 
+                # Write in the worker; add_points returns the leaderboard diff, only those rows are relabeled
+                self.tasks.submit(self.brain.add_points, self.active_user["nama"], self.active_user["kelas"],
+                                  score, text_input, result["prediction_level"],
+                                  on_done=self.leaderboard_view.apply)
             
             self._start_auto_reset_timer()
         else:
@@ -353,6 +394,9 @@ class GoodDeedApp(ctk.CTk):
         log.info("Application closing. Shutting down services.")
         self.camera_manager.shutdown()
         self._cancel_auto_reset_timer()
+        self.tasks.shutdown(wait=True) # let queued writes (add_points) finish
+        self.retrainer.stop() # cancels a retrain in flight, nothing is installed after this
+        self.brain.close()
         self.destroy()
 
 if __name__ == "__main__":
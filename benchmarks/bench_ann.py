@@ -0,0 +1,89 @@
+"""Recall/latency report: IVF approximate face index vs the exact brute-force matcher.
+
+Synthetic identities are drawn from a low-rank latent space (real face encodings
+are far from uniformly spread over the 128-d space); queries are noisy re-captures
+of enrolled identities plus a share of never-seen faces.
+
+Usage: python benchmarks/bench_ann.py [--sizes 10000 100000] [--queries 300]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.face_index import BruteForceIndex, IVFIndex
+
+ZONE_GREEN = 0.48
+ZONE_YELLOW = 0.60
+
+
+def zone(dist):
+    return "GREEN" if dist < ZONE_GREEN else "YELLOW" if dist < ZONE_YELLOW else "RED"
+
+
+def synthetic_faces(rng, n, dim=128, latent=24):
+    projection = rng.standard_normal((latent, dim)) / np.sqrt(latent)
+    centers = rng.standard_normal((n, latent)) @ projection * 0.45
+    centers += rng.standard_normal((n, dim)) * 0.03
+    return centers.astype(np.float32), projection
+
+
+def make_queries(rng, matrix, projection, n_queries, unknown_share=0.2):
+    n_known = int(n_queries * (1 - unknown_share))
+    picks = rng.integers(0, len(matrix), n_known)
+    known = matrix[picks] + rng.standard_normal((n_known, matrix.shape[1])).astype(np.float32) * 0.025
+    unknown = (rng.standard_normal((n_queries - n_known, projection.shape[0])) @ projection * 0.45).astype(np.float32)
+    return np.vstack([known, unknown])
+
+
+def timed(index, queries, k=2):
+    start = time.perf_counter()
+    results = [index.query(q, k) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    for n in args.sizes:
+        matrix, projection = synthetic_faces(rng, n)
+        queries = make_queries(rng, matrix, projection, args.queries)
+
+        exact = BruteForceIndex()
+        exact.build(matrix)
+        truth, exact_us = timed(exact, queries)
+        truth_rows = np.array([r[0] for _, r in truth])
+        truth_green = np.array([d[0] < ZONE_GREEN for d, _ in truth])
+        truth_zones = [zone(d[0]) for d, _ in truth]
+
+        print(f"\nn={n}  exact: {exact_us:.1f} us/query  ({truth_green.mean():.0%} of queries are GREEN)")
+        print(f"{'nprobe':>7}{'recall@1':>10}{'ANN (us)':>10}{'speedup':>9}{'GREEN ok':>10}{'zones ok':>10}{'+rerank (us)':>14}")
+
+        for nprobe in args.nprobe:
+            ann = IVFIndex(nprobe=nprobe, background_train=False, min_train_size=1)
+            start = time.perf_counter()
+            ann.build(matrix)
+            train_s = time.perf_counter() - start
+            approx, ann_us = timed(ann, queries)
+            recall = np.mean([r[0] == t for (_, r), t in zip(approx, truth_rows)])
+
+            # Same index with exact re-ranking of would-be GREEN logins
+            ann.rerank_below = ZONE_GREEN
+            reranked, rerank_us = timed(ann, queries)
+            green_ok = np.mean([r[0] == t for (_, r), t, g in zip(reranked, truth_rows, truth_green) if g]) if truth_green.any() else 1.0
+            zones_ok = np.mean([zone(d[0]) == z for (d, _), z in zip(reranked, truth_zones)])
+
+            print(f"{nprobe:>7}{recall:>10.3f}{ann_us:>10.1f}{exact_us / ann_us:>8.1f}x{green_ok:>10.3f}{zones_ok:>10.3f}{rerank_us:>14.1f}")
+        print(f"(IVF training took {train_s:.2f}s for {len(ann._centroids)} lists)")
+
+
+if __name__ == "__main__":
+    main()
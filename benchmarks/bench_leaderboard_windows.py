@@ -0,0 +1,86 @@
+"""Windowed / per-class leaderboards: aggregating log_aktivitas on demand vs the daily rollups.
+
+A database with N logged ideas spread over a school year is synthesized; week, month and
+per-class rankings are then answered by a GROUP BY over the log (old way) and by
+KebaikanRepository.get_leaderboard over poin_harian_siswa. Both must return the same ranking.
+
+Usage: python benchmarks/bench_leaderboard_windows.py [--sizes 100000 1000000] [--students 600] [--calls 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.leaderboard import window_start
+from core.migrations import rebuild_point_rollups, register_school_date
+from core.repository import ConnectionPool, KebaikanRepository
+
+KELAS = [f"{grade}-{room}" for grade in (7, 8, 9) for room in "ABCDEF"]
+
+
+def seed(repo, n_logs, n_students, today):
+    rng = random.Random(7)
+    with repo.pool.transaction() as conn:
+        students = [(f"siswa_{i}", KELAS[i % len(KELAS)]) for i in range(n_students)]
+        conn.executemany("INSERT INTO siswa (nama, kelas, total_poin) VALUES (?, ?, 0)", students)
+        rows = []
+        for _ in range(n_logs):
+            siswa_id = rng.randrange(n_students) + 1
+            nama, kelas = students[siswa_id - 1]
+            waktu = datetime.combine(today - timedelta(days=rng.randrange(365)), datetime.min.time()) + timedelta(hours=rng.randrange(7, 15))
+            rows.append((siswa_id, nama, kelas, "ide", rng.choice((5, 10, 20)), "Friend", waktu.strftime("%Y-%m-%d %H:%M:%S")))
+        conn.executemany("INSERT INTO log_aktivitas (siswa_id, nama_siswa, kelas, ide_kebaikan, skor_ai, kategori_ide, waktu) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("UPDATE siswa SET total_poin = (SELECT COALESCE(SUM(skor_ai), 0) FROM log_aktivitas l WHERE l.siswa_id = siswa.id)")
+        rebuild_point_rollups(conn) # same backfill an existing database gets
+
+
+def scan_leaderboard(repo, limit, since, kelas):
+    where, params = "school_date(l.waktu) >= ?", [since.isoformat()] # same day buckets as the rollups
+    if kelas is not None:
+        where += " AND l.kelas = ?"
+        params.append(kelas)
+    with repo.pool.read() as conn:
+        register_school_date(conn)
+        return conn.execute(f"""SELECT s.nama, s.kelas, SUM(l.skor_ai) AS poin FROM log_aktivitas l
+                                JOIN siswa s ON s.id = l.siswa_id WHERE {where}
+                                GROUP BY l.siswa_id ORDER BY poin DESC, l.siswa_id ASC LIMIT ?""", (*params, limit)).fetchall()
+
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        result = fn()
+    return result, (time.perf_counter() - start) / calls * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--students", type=int, default=600)
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    today = date.today()
+    print(f"{'logs':>9}  {'query':<14}{'log scan (ms)':>14}{'rollup (ms)':>13}{'speedup':>9}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = KebaikanRepository(ConnectionPool(os.path.join(tmp, "bench.db")))
+            repo.init_schema()
+            seed(repo, n, args.students, today)
+            for label, window, kelas in (("week", "week", None), ("month", "month", None), ("month, 8-B", "month", "8-B")):
+                since = window_start(window, today)
+                old, old_ms = timed(lambda: scan_leaderboard(repo, 10, since, kelas), max(1, args.calls // 10))
+                new, new_ms = timed(lambda: repo.get_leaderboard(10, since=since, kelas=kelas), args.calls)
+                assert old == new, f"rollup ranking differs for {label}"
+                print(f"{n:>9}  {label:<14}{old_ms:>14.2f}{new_ms:>13.2f}{old_ms / new_ms:>8.0f}x")
+            repo.pool.close()
+
+
+if __name__ == "__main__":
+    main()
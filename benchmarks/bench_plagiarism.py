@@ -0,0 +1,74 @@
+"""Plagiarism check per submission: full scan of the class history vs the MinHash/LSH index.
+
+The old check_plagiarism compares the new idea with every earlier idea of the class
+(word-set Jaccard, SequenceMatcher for overlapping ones). With a ClassIdeaIndex only the
+ideas sharing an LSH band are compared. Histories of 10k/100k ideas are synthesized from
+the vocabulary of training_data.csv; half of the queries are light edits of a logged idea
+(should be flagged), half are new ideas.
+
+Usage: python benchmarks/bench_plagiarism.py [--sizes 10000 100000] [--queries 100]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.brain import DATA_PATH, BrainLogic
+from core.plagiarism_index import ClassIdeaIndex, minhash_signature
+
+
+def synthetic_ideas(rng, vocab, n):
+    return [" ".join(rng.choice(vocab, size=l)) for l in rng.integers(4, 12, n)]
+
+
+def light_edit(rng, vocab, text):
+    words = text.split()
+    words[rng.integers(len(words))] = rng.choice(vocab)
+    return " ".join(words)
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    source = pd.read_csv(DATA_PATH).dropna(subset=['text'])
+    vocab = np.array(sorted({w for t in source['text'].str.lower() for w in t.split() if w.isalpha()}))
+    check = lambda text, history: BrainLogic.check_plagiarism(None, text, history) # no instance state used
+
+    rng = np.random.default_rng(5)
+    print(f"{'ideas':>8}{'sign (s)':>10}{'build (s)':>10}{'scan (ms)':>11}{'index (ms)':>11}{'speedup':>9}"
+          f"{'cands':>7}  flagged (scan / index)")
+    for n in args.sizes:
+        history = synthetic_ideas(rng, vocab, n)
+        queries = [light_edit(rng, vocab, history[i]) for i in rng.integers(0, n, args.queries // 2)]
+        queries += synthetic_ideas(rng, vocab, args.queries - len(queries))
+
+        start = time.perf_counter()
+        signatures = [minhash_signature(t) for t in history]
+        sign_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index = ClassIdeaIndex("bench")
+        index.extend(history, signatures)
+        build_s = time.perf_counter() - start
+
+        scan, scan_ms = timed(lambda q: check(q, history)[0], queries)
+        lsh, lsh_ms = timed(lambda q: check(q, index)[0], queries)
+        cands = np.mean([len(index.candidates(minhash_signature(q))) for q in queries])
+        print(f"{n:>8}{sign_s:>10.2f}{build_s:>10.2f}{scan_ms:>11.2f}{lsh_ms:>11.2f}{scan_ms / lsh_ms:>8.0f}x"
+              f"{cands:>7.0f}  {sum(scan)} / {sum(lsh)}  (missed {sum(a and not b for a, b in zip(scan, lsh))})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Preprocessing cache benchmark on the training corpus (training_data.csv + learned_sample).
+
+Runs TextPreprocessor four times: cold (empty stem cache, Sastrawi stems every new word),
+cold batch (same, new words stemmed in a process pool via preprocess_batch), warm restart
+(fresh process state, stem cache loaded from disk) and a repeat in the same process
+(sentence cache). The cold run takes minutes on a slow CPU.
+
+Usage: python benchmarks/bench_preprocess.py [--limit N] [--workers N] [--db data/kebaikan.db]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.brain import load_training_frame
+from core.repository import ConnectionPool, KebaikanRepository, DB_PATH
+from core.text_pipeline import TextPreprocessor
+
+
+def run(preprocessor, texts):
+    start = time.perf_counter()
+    results = [preprocessor.preprocess(t) for t in texts]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--limit", type=int, default=None, help="only the first N rows")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the batch run (default: all cores)")
+    parser.add_argument("--db", default=DB_PATH, help="database with the learned_sample rows")
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.db)
+    df, _ = load_training_frame(KebaikanRepository(pool)) # same rows as a training run
+    pool.close()
+    texts = df['text'].tolist()[:args.limit]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "stem_cache.json")
+
+        cold = TextPreprocessor(cache_path=cache_path)
+        cold.stemmer, cold.stopword_remover # exclude dictionary loading from the timing
+        reference, cold_s = run(cold, texts)
+        print(f"cold:         {cold_s:8.2f}s  {cold.report()}")
+        cold.save_cache()
+
+        batch = TextPreprocessor(cache_path=None)
+        start = time.perf_counter()
+        results = batch.preprocess_batch(texts, workers=args.workers)
+        batch_s = time.perf_counter() - start
+        assert results == reference, "batch preprocessing changed the output"
+        print(f"cold batch:   {batch_s:8.2f}s  ({args.workers or os.cpu_count()} workers, incl. stemmer start-up)")
+
+        warm = TextPreprocessor(cache_path=cache_path)
+        results, warm_s = run(warm, texts)
+        assert results == reference, "warm cache changed the output"
+        print(f"warm restart: {warm_s:8.2f}s  {warm.report()}  (stemmer loaded: {warm._stemmer is not None})")
+
+        _, repeat_s = run(warm, texts)
+        print(f"repeat:       {repeat_s:8.2f}s  {warm.report()}")
+        print(f"{len(texts)} rows, warm restart {cold_s / warm_s:.0f}x faster than cold")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Micro-benchmark: connect-per-call SQLite (old BrainLogic) vs pooled KebaikanRepository.
+
+Usage: python benchmarks/bench_repository.py [--users 500] [--calls 300]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.repository import ConnectionPool, KebaikanRepository
+
+
+# --- Old implementation (one sqlite3.connect per call) ---
+
+class LegacyDB:
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def add_points(self, nama, kelas, poin, ide, kategori_ide):
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute("SELECT id, total_poin FROM siswa WHERE nama=? AND kelas=?", (nama, kelas))
+        data = c.fetchone()
+        if data:
+            c.execute("UPDATE siswa SET total_poin=? WHERE id=?", (data[1] + poin, data[0]))
+        else:
+            c.execute("INSERT INTO siswa (nama, kelas, total_poin) VALUES (?, ?, ?)", (nama, kelas, poin))
+        c.execute("INSERT INTO log_aktivitas (nama_siswa, kelas, ide_kebaikan, skor_ai, kategori_ide) VALUES (?, ?, ?, ?, ?)",
+                  (nama, kelas, ide, poin, kategori_ide))
+        conn.commit()
+        conn.close()
+
+    def get_leaderboard(self, limit=15):
+        conn = sqlite3.connect(self.db_path)
+        data = conn.execute("SELECT nama, kelas, total_poin FROM siswa ORDER BY total_poin DESC LIMIT ?", (limit,)).fetchall()
+        conn.close()
+        return data
+
+    def get_ideas_by_siswa(self, nama, kelas):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT ide_kebaikan FROM log_aktivitas WHERE nama_siswa=? AND kelas=? ORDER BY waktu ASC",
+                            (nama, kelas)).fetchall()
+        conn.close()
+        return [r[0] for r in rows]
+
+
+def seed(repo, n_users):
+    students = []
+    for i in range(n_users):
+        nama, kelas = f"siswa_{i}", f"{7 + i % 3}-{'ABC'[i % 3]}"
+        enc = np.random.rand(128).astype('<f4')
+        repo.register_siswa(nama, kelas, enc)
+        students.append((nama, kelas))
+    return students
+
+
+def timeit(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--calls", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        pool = ConnectionPool(db_path)
+        repo = KebaikanRepository(pool)
+        repo.init_schema()
+        students = seed(repo, args.users)
+        legacy = LegacyDB(db_path)
+
+        pick = lambda: random.choice(students)
+        cases = [
+            ("add_points", lambda db: (lambda: db.add_points(*pick(), 5, "membantu teman belajar", "Friend"))),
+            ("get_leaderboard", lambda db: (lambda: db.get_leaderboard(10))),
+            ("ideas_by_siswa", lambda db: (lambda: db.get_ideas_by_siswa(*pick()))),
+        ]
+
+        print(f"{'operation':<18}{'legacy (us)':>14}{'pooled (us)':>14}{'speedup':>10}")
+        for name, make in cases:
+            old = timeit(make(legacy), args.calls)
+            new = timeit(make(repo), args.calls)
+            print(f"{name:<18}{old:>14.1f}{new:>14.1f}{old / new:>9.1f}x")
+
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Per-submission prediction latency: separate sklearn calls vs CombinedTextPredictor.
+
+The old path in predict_and_score vectorizes the input twice and runs three neighbour
+searches (knn_level.predict, knn_quality.predict, knn_level.predict_proba). The combined
+predictor vectorizes once and searches once, either with sklearn's brute-force cosine
+KNN or with the sparse inverted-index SparseKNNClassifier. Training sets of 1k/10k/100k rows are
+synthesized from the vocabulary of training_data.csv.
+
+Usage: python benchmarks/bench_text_predict.py [--sizes 1000 10000 100000] [--queries 200]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import brain
+from core.brain import DATA_PATH, fit_model
+from core.text_knn import CombinedTextPredictor
+
+
+def synthetic_corpus(rng, vocab, levels, qualities, n):
+    lengths = rng.integers(3, 12, n)
+    texts = [" ".join(rng.choice(vocab, size=l)) for l in lengths]
+    df = pd.DataFrame({"clean_text": texts, "target_level": rng.choice(levels, n), "quality": rng.choice(qualities, n)})
+    # A share of duplicated rows so exact matches (zero distance) are exercised too
+    dup = rng.integers(0, n, n // 20)
+    df.loc[rng.integers(0, n, len(dup)), "clean_text"] = df["clean_text"].to_numpy()[dup]
+    return df
+
+
+def old_path(vectorizer, knn_level, knn_quality, text):
+    if vectorizer.transform([text]).sum() == 0:
+        return None
+    vec = vectorizer.transform([text])
+    return knn_level.predict(vec)[0], knn_quality.predict(vec)[0], np.max(knn_level.predict_proba(vec))
+
+
+def new_path(predictor, text):
+    vec = predictor.transform([text])
+    if vec.nnz == 0:
+        return None
+    levels, qualities, confidences = predictor.predict_vectors(vec)
+    return levels[0], qualities[0], confidences[0]
+
+
+def same_result(a, b):
+    return a is None and b is None or (a[0] == b[0] and a[1] == b[1] and abs(a[2] - b[2]) < 1e-6)
+
+
+def check_agreement(reference_knn, knn, X, reference, results):
+    """Asserts that `results` equal `reference` modulo ties. Both searches must find the same
+    k neighbour distances for every query. Where they picked the same neighbours the
+    level, quality and confidence must match. Where the neighbours differ, it can only be a tie
+    at the k-th place (sklearn's brute force does not order equal distances by index).
+    Returns the number of such tied queries."""
+    ref_dist, ref_ind = reference_knn.kneighbors(X)
+    dist, ind = knn.kneighbors(X)
+    assert np.allclose(np.sort(ref_dist, axis=1), np.sort(dist, axis=1), atol=1e-9), "neighbour distances differ"
+    same_neighbours = (np.sort(ref_ind, axis=1) == np.sort(ind, axis=1)).all(axis=1)
+    for a, b, same in zip(reference, results, same_neighbours):
+        assert not same or same_result(a, b), f"prediction differs with the same neighbours: {a} vs {b}"
+    return int((~same_neighbours).sum())
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    source = pd.read_csv(DATA_PATH).dropna(subset=['text', 'target_level', 'quality'])
+    vocab = np.array(sorted({w for t in source['text'].str.lower() for w in t.split() if w.isalpha()}))
+    levels, qualities = source['target_level'].unique(), source['quality'].unique()
+
+    rng = np.random.default_rng(3)
+    print(f"{'rows':>8}{'old (ms)':>10}{'combined':>10}{'+sparse':>10}{'speedup':>9}  tied queries (sparse)")
+    for n in args.sizes:
+        df = synthetic_corpus(rng, vocab, levels, qualities, n)
+        brain.TEXT_KNN_BACKEND = "sklearn"
+        vectorizer, knn_level, knn_quality = fit_model(df)
+        brain.TEXT_KNN_BACKEND = "sparse"
+        _, sparse_level, sparse_quality = fit_model(df)
+        predictor = CombinedTextPredictor(vectorizer, knn_level, knn_quality)
+        sparse_predictor = CombinedTextPredictor(vectorizer, sparse_level, sparse_quality)
+        queries = list(df['clean_text'].sample(args.queries // 2, random_state=1))
+        queries += synthetic_corpus(rng, vocab, levels, qualities, args.queries - len(queries))['clean_text'].tolist()
+
+        old, old_ms = timed(lambda q: old_path(vectorizer, knn_level, knn_quality, q), queries)
+        new, new_ms = timed(lambda q: new_path(predictor, q), queries)
+        sparse, sparse_ms = timed(lambda q: new_path(sparse_predictor, q), queries)
+        assert all(same_result(a, b) for a, b in zip(old, new)), "combined predictor differs from the old path"
+        ties = check_agreement(knn_level, sparse_level, vectorizer.transform(queries), old, sparse)
+        print(f"{n:>8}{old_ms:>10.2f}{new_ms:>10.2f}{sparse_ms:>10.2f}{old_ms / sparse_ms:>8.1f}x  "
+              f"{ties} of {len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
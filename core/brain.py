@@ -1,15 +1,12 @@
 import pandas as pd
 import numpy as np
-import re
 import os
-import pickle
 import random
 import sys
 import difflib 
-import sqlite3
-import json 
-import csv
+import threading
 from datetime import datetime
+import scipy.sparse as sp
 
 # Import Rules
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,240 +17,354 @@ try:
 except ImportError:
     print("⚠️ FATAL: rules.py tidak ditemukan di folder core!")
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import KNeighborsClassifier
-from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
-from Sastrawi.StopWordRemover.StopWordRemoverFactory import StopWordRemoverFactory
+from core.repository import ConnectionPool, KebaikanRepository, DB_PATH
+from core.text_pipeline import TextPreprocessor
+from core.text_knn import CombinedTextPredictor, SparseKNNClassifier, create_text_knn
+from core.plagiarism_index import ClassIdeaIndex, PlagiarismIndex, idea_entry, minhash_signature, normalize_idea, pack_signature
+from core.model_store import as_lite_vectorizer, bundle_path_to_read, load_bundle, load_legacy_pickle, save_bundle
+from core.leaderboard import LeaderboardService, window_start
+from core.streaks import current_streak, load_calendar
+from core.journal import WriteBehindJournal
+from core.samples import RejectedSampleSink, import_learned_csv, import_rejected_csv
+from core.constants import ONLINE_LEARNING, ONLINE_COMPACT_EVERY, TEXT_KNN_BACKEND, LEADERBOARD_LIMIT
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, '../data/training_data.csv') 
-LEARNED_PATH = os.path.join(BASE_DIR, '../data/learned_data.csv')
-REJECTED_PATH = os.path.join(BASE_DIR, '../data/rejected_data.csv')
-MODEL_PATH = os.path.join(BASE_DIR, 'trained_brain.pkl')
+LEARNED_PATH = os.path.join(BASE_DIR, '../data/learned_data.csv') # lama, diimpor sekali ke tabel learned_sample
+REJECTED_PATH = os.path.join(BASE_DIR, '../data/rejected_data.csv') # lama, diimpor sekali ke tabel rejected_sample
+MODEL_DIR = os.path.join(BASE_DIR, 'brain_model') # bundle directory, see core/model_store.py
+LEGACY_MODEL_PATH = os.path.join(BASE_DIR, 'trained_brain.pkl') # old pickle, converted on first load
+
+def load_training_frame(repo):
+    """training_data.csv + learned_sample rows as one DataFrame. Returns (df, learned_rows read).
+
+    Learned rows are streamed from the database with their stored clean_text and sample_id
+    (both NaN for training_data.csv rows). learned_rows is the highest learned_sample id read.
+    """
+    print("📂 Loading datasets (Main + Learned)...")
+    df_main = pd.read_csv(DATA_PATH)
+    df_final = df_main
+    learned_rows = 0
+    try:
+        df_learned = pd.DataFrame.from_records(
+            (row[:5] for row in repo.iter_learned_samples()),
+            columns=['sample_id', 'text', 'clean_text', 'target_level', 'quality'])
+        if not df_learned.empty:
+            learned_rows = int(df_learned['sample_id'].max())
+            print(f"📈 Menambahkan {len(df_learned)} data baru dari pengalaman lapangan.")
+            df_final = pd.concat([df_main, df_learned], ignore_index=True)
+    except Exception as e:
+        print(f"⚠️ Warning: Gagal load learned_sample, pakai data utama saja. Error: {e}")
+    df_final.dropna(subset=['text', 'target_level', 'quality'], inplace=True)
+    return df_final, learned_rows
+
+
+def fill_clean_text(df, preprocessor, repo, workers=None):
+    """Preprocesses only rows without a stored clean_text and drops rows that end up empty.
+
+    Learned rows preprocessed here (e.g. imported without it) get their clean_text stored,
+    so the next training reads them pre-cleaned.
+    """
+    if 'clean_text' not in df:
+        df['clean_text'] = None
+    missing = df['clean_text'].isna()
+    if missing.any():
+        df.loc[missing, 'clean_text'] = preprocessor.preprocess_batch(df.loc[missing, 'text'].tolist(), workers=workers)
+        if 'sample_id' in df:
+            stored = df[missing & df['sample_id'].notna()]
+            if not stored.empty:
+                repo.set_learned_clean_texts(zip(stored['clean_text'].tolist(), stored['sample_id'].astype(int).tolist()))
+    return df[df['clean_text'].str.strip() != ""]
+
+
+def fit_model(df):
+    """Fits (vectorizer, knn_level, knn_quality) on a frame with clean_text/target_level/quality."""
+    from sklearn.feature_extraction.text import TfidfVectorizer # only needed for training
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=1)
+    X = vectorizer.fit_transform(df['clean_text'])
+    vectorizer = as_lite_vectorizer(vectorizer) # same transform, no sklearn at prediction time
+    knn_level = create_text_knn(TEXT_KNN_BACKEND, n_neighbors=5)
+    knn_level.fit(X, df['target_level'])
+    knn_quality = create_text_knn(TEXT_KNN_BACKEND, n_neighbors=5)
+    knn_quality.fit(X, df['quality'])
+    return vectorizer, knn_level, knn_quality
+
+
+def read_model(path):
+    """(vectorizer, knn_level, knn_quality, learned_rows, meta) from a bundle directory or a legacy pickle.
+
+    learned_rows is None for old 3-tuple pickles. Returns None if nothing is stored at `path`.
+    """
+    if os.path.isfile(path):
+        vectorizer, knn_level, knn_quality, meta = load_legacy_pickle(path)
+    else:
+        source = bundle_path_to_read(path)
+        if source is None:
+            return None
+        vectorizer, knn_level, knn_quality, meta = load_bundle(source, backend=TEXT_KNN_BACKEND)
+    meta = dict(meta)
+    return vectorizer, knn_level, knn_quality, meta.pop("learned_rows", None), meta
+
 
 class BrainLogic:
-    def __init__(self):
+    def __init__(self, db_path=DB_PATH):
         print("🧠 Initializing Brain (Human-Centric + Plagiarism Guard)...")
-        # Lazy loading attributes
-        self._stemmer = None
-        self._stopword_remover = None
-        
+        # Long-lived pooled connections (WAL) instead of connect-per-call
+        self.pool = ConnectionPool(db_path)
+        self.repo = KebaikanRepository(self.pool)
+        self.plagiarism_index = PlagiarismIndex(self.repo) # MinHash/LSH per kelas, dimuat saat pertama dipakai
+        self.calendar = load_calendar() # zona waktu + hari sekolah untuk streak (data/school_calendar.json)
+
+        # rejected_sample ditulis di background (write-behind), bukan di jalur submission
+        self.journal = WriteBehindJournal()
+        self.rejected_sink = RejectedSampleSink(self.repo)
+
+        # Slang/stopword/stemming with word + sentence caches (Sastrawi is lazy loaded)
+        self.text_preprocessor = TextPreprocessor()
+
         self.vectorizer = None
         self.knn_level = None
         self.knn_quality = None
         self.is_trained = False
-        self.init_learned_data()
-        self.init_rejected_data()
+
+        # Online learning: highest learned_sample id already inside the model, swaps under lock
+        self._model_lock = threading.RLock()
+        self.learned_rows = 0
+        self._learned_since_train = 0
+        self._compaction_thread = None
+        self.model_meta = {}
+        self.retrain_service = None # core.retrainer.RetrainService, attached by the app
+        self.init_db()
+        self.leaderboard = LeaderboardService(self.repo, LEADERBOARD_LIMIT) # top-N di memori, dibaca sekali di sini
+        self.import_legacy_samples()
         self.load_model()
-        self.init_db() 
 
     @property
     def stemmer(self):
-        if self._stemmer is None:
-            print("⏳ Initializing Sastrawi Stemmer (Lazy Load)...")
-            self._stemmer = StemmerFactory().create_stemmer()
-        return self._stemmer
+        return self.text_preprocessor.stemmer
 
     @property
     def stopword_remover(self):
-        if self._stopword_remover is None:
-            print("⏳ Initializing Sastrawi Stopword Remover (Lazy Load)...")
-            self._stopword_remover = StopWordRemoverFactory().create_stop_word_remover()
-        return self._stopword_remover 
-
-    def init_learned_data(self):
-        """Membuat file learned_data.csv jika belum ada"""
-        if not os.path.exists(LEARNED_PATH):
-            try:
-                os.makedirs(os.path.dirname(LEARNED_PATH), exist_ok=True)
-                with open(LEARNED_PATH, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['text', 'target_level', 'quality']) # Header Standar
-                print("📂 File 'learned_data.csv' baru berhasil dibuat.")
-            except Exception as e:
-                print(f"⚠️ Gagal membuat file learned data: {e}")
-    
-    def init_rejected_data(self):
-        """[BARU] Membuat file rejected_data.csv jika belum ada"""
-        if not os.path.exists(REJECTED_PATH):
-            try:
-                os.makedirs(os.path.dirname(REJECTED_PATH), exist_ok=True)
-                with open(REJECTED_PATH, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['timestamp', 'text', 'reason']) # Header: Kapan, Apa, Kenapa
-                print("📂 File 'rejected_data.csv' siap menampung sampah.")
-            except Exception as e:
-                print(f"⚠️ Gagal membuat file rejected data: {e}")
+        return self.text_preprocessor.stopword_remover
 
     def init_db(self):
         """Membuat tabel database jika belum ada"""
-        db_path = os.path.join(BASE_DIR, '../data/kebaikan.db')
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS siswa
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      nama TEXT, 
-                      kelas TEXT, 
-                      encoding TEXT, 
-                      total_poin INTEGER DEFAULT 0, 
-                      streak INTEGER DEFAULT 0, 
-                      last_active DATE)''')
-                      
-        c.execute('''CREATE TABLE IF NOT EXISTS log_aktivitas
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      nama_siswa TEXT, 
-                      kelas TEXT, 
-                      ide_kebaikan TEXT, 
-                      skor_ai INTEGER, 
-                      kategori_ide TEXT,
-                      waktu TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        conn.commit()
-        conn.close()
+        self.repo.init_schema()
         print("🗄️ Database initialized.")
 
+    def import_legacy_samples(self):
+        """Impor sekali learned_data.csv / rejected_data.csv lama ke database (file CSV tidak diubah)"""
+        try:
+            if self.repo.max_learned_sample_id() == 0 and os.path.exists(LEARNED_PATH):
+                _, added = import_learned_csv(self.repo, LEARNED_PATH)
+                if added:
+                    print(f"📥 {added} data learned_data.csv dipindah ke database.")
+            if self.repo.count_rejected_samples() == 0 and os.path.exists(REJECTED_PATH):
+                read, _ = import_rejected_csv(self.repo, REJECTED_PATH)
+                if read:
+                    print(f"📥 {read} data rejected_data.csv dipindah ke database.")
+        except Exception as e:
+            print(f"⚠️ Gagal impor CSV lama ke database: {e}")
+
+    def close(self):
+        """Menutup koneksi database (dipanggil saat aplikasi ditutup)."""
+        self.journal.close() # tulis baris rejected yang masih antre
+        self.text_preprocessor.save_cache()
+        self.pool.close()
+
     def register_user(self, nama, kelas, encoding):
-        db_path = os.path.join(BASE_DIR, '../data/kebaikan.db')
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        
-        c.execute("SELECT id FROM siswa WHERE nama=? AND kelas=?", (nama, kelas))
-        if c.fetchone():
-            conn.close()
-            return False, "Siswa sudah terdaftar!"
-            
-        encoding_list = encoding.tolist() 
-        encoding_json = json.dumps(encoding_list)
-        
-        c.execute("INSERT INTO siswa (nama, kelas, encoding, total_poin) VALUES (?, ?, ?, 0)", 
-                  (nama, kelas, encoding_json))
-        conn.commit()
-        conn.close()
-        return True, "Pendaftaran Berhasil!"
+        """Returns (success, msg, user). `user` is the new siswa dict, None if registration failed."""
+        new_id = self.repo.register_siswa(nama, kelas, encoding)
+        if new_id is None:
+            return False, "Siswa sudah terdaftar!", None
+        user = {"id": new_id, "nama": nama, "kelas": kelas, "poin": 0}
+        self.leaderboard.update(new_id, nama, kelas, 0) # masuk top-N jika siswa masih sedikit
+        return True, "Pendaftaran Berhasil!", user
+
+    def add_face_encoding(self, siswa_id, encoding, max_encodings=None):
+        """Menambah encoding wajah baru untuk siswa yang sudah terdaftar (None jika batas max_encodings tercapai)."""
+        return self.repo.add_encoding(siswa_id, encoding, max_encodings)
 
     def add_points(self, nama, kelas, poin, ide, kategori_ide):
-        db_path = os.path.join(BASE_DIR, '../data/kebaikan.db')
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute("SELECT id, total_poin FROM siswa WHERE nama=? AND kelas=?", (nama, kelas))
-        data = c.fetchone()        
-        if data:
-            new_poin = data[1] + poin
-            c.execute("UPDATE siswa SET total_poin=? WHERE id=?", (new_poin, data[0]))
-        else:
-            c.execute("INSERT INTO siswa (nama, kelas, total_poin) VALUES (?, ?, ?)", (nama, kelas, poin))
-            
-        c.execute("INSERT INTO log_aktivitas (nama_siswa, kelas, ide_kebaikan, skor_ai, kategori_ide) VALUES (?, ?, ?, ?, ?)", 
-                  (nama, kelas, ide, poin, kategori_ide))
-                  
-        conn.commit()
-        conn.close()
-
-    def get_leaderboard(self, limit=15):
-        db_path = os.path.join(BASE_DIR, '../data/kebaikan.db')
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()        
-        c.execute("SELECT nama, kelas, total_poin FROM siswa ORDER BY total_poin DESC LIMIT ?", (limit,))
-        data = c.fetchall()         
-        conn.close()
-        return data
+        """Returns the leaderboard diff [(position, row or None)] (see LeaderboardService.update)."""
+        signature = minhash_signature(ide)
+        siswa_id, total_poin, _ = self.repo.add_points(nama, kelas, poin, ide, kategori_ide,
+                                                       signature=pack_signature(signature), calendar=self.calendar)
+        self.plagiarism_index.add(kelas, ide, signature)
+        return self.leaderboard.update(siswa_id, nama, kelas, total_poin)
+
+    def get_class_ideas_history(self, kelas):
+        """Semua ide di kelas sebagai ClassIdeaIndex (list-like, sudah dinormalisasi + LSH).
+
+        Dimuat dari DB sekali per kelas, ide baru ditambahkan oleh add_points.
+        """
+        return self.plagiarism_index.get(kelas)
+
+    def get_leaderboard(self, limit=15, window=None, kelas=None):
+        """[(nama, kelas, poin)]. window: None (all time), "day", "week" or "month"; kelas: filter per kelas.
+
+        Ranking per periode dihitung dari tabel rollup harian, bukan dari log_aktivitas.
+        """
+        if window is None and kelas is None and limit <= self.leaderboard.size:
+            return self.leaderboard.rows(limit) # cached, no ORDER BY per call
+        return self.repo.get_leaderboard(limit, since=window_start(window, self.calendar.today()), kelas=kelas)
+
+    def get_class_ranking(self, limit=15, window=None):
+        """[(kelas, poin, jumlah_ide)] peringkat antar kelas, dari rollup harian per kelas."""
+        return self.repo.get_class_ranking(limit, since=window_start(window, self.calendar.today()))
+
+    def get_streak(self, nama, kelas):
+        """Streak hari ini (0 jika ada hari sekolah yang terlewat sejak last_active)."""
+        row = self.repo.get_streak(nama, kelas)
+        return current_streak(*row, self.calendar) if row else 0
+
+    def get_face_memory(self):
+        """(users_by_id, encoding_matrix float32 (n,128), owner siswa id per row) untuk VisionSystem."""
+        return self.repo.load_face_matrix()
     
     def get_all_users(self):
-        db_path = os.path.join(BASE_DIR, '../data/kebaikan.db')
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute("SELECT id, nama, kelas, encoding, total_poin FROM siswa")
-        users = []
-        for row in c.fetchall():
-            if row[3]:
-                try:
-                    encoding_list = json.loads(row[3])
-                    users.append({
-                        "id": row[0],
-                        "nama": row[1],
-                        "kelas": row[2],
-                        "encoding": encoding_list,
-                        "poin": row[4]
-                    })
-                except:
-                    pass
-        conn.close()
-        return users
+        users, matrix, owners = self.repo.load_face_matrix()
+        result = {}
+        for row, siswa_id in enumerate(owners.tolist()):
+            user = result.setdefault(siswa_id, dict(users[siswa_id], encoding=[]))
+            user["encoding"].append(matrix[row])
+        return list(result.values())
     
     def get_user_ideas_history_by_name_class(self, nama, kelas):
         """Mengambil semua ide kebaikan yang pernah disubmit oleh seorang siswa."""
-        db_path = os.path.join(BASE_DIR, '../data/kebaikan.db')
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-        c.execute("SELECT ide_kebaikan FROM log_aktivitas WHERE nama_siswa=? AND kelas=? ORDER BY waktu ASC", (nama, kelas))
-        history = [row[0] for row in c.fetchall()]
-        conn.close()
-        return history
+        return self.repo.get_ideas_by_siswa(nama, kelas)
     
     def log_rejected_input(self, text, reason):
-        """[BARU] Catat input yang ditolak ke CSV"""
-        try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open(REJECTED_PATH, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([timestamp, text, reason])
-        except Exception as e:
-            print(f"⚠️ Gagal mencatat rejection: {e}")
+        """[BARU] Catat input yang ditolak (tabel rejected_sample, teks + alasan yang sama hanya menambah jumlah)"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.journal.append(self.rejected_sink, [timestamp, text, reason]) # ditulis oleh thread journal
 
     def preprocess_text(self, text):
-        if not isinstance(text, str): 
-            return         
-        text = text.lower()        
-        text = re.sub(r'[^a-z\s]', ' ', text)      
-        words = text.split()
-        normalized_words = []
-        for word in words:
-            correct_word = rules.SLANG_DICTIONARY.get(word, word)
-            normalized_words.append(correct_word)
-        text = " ".join(normalized_words)
-        text = self.stopword_remover.remove(text)        
-        text = self.stemmer.stem(text)
-        return text
+        """Slang normalization, stopword removal and stemming (cached, see TextPreprocessor)."""
+        return self.text_preprocessor.preprocess(text)
+
+    def preprocess_batch(self, texts, workers=None):
+        """preprocess_text untuk banyak teks sekaligus (kata baru di-stem paralel di process pool)."""
+        return self.text_preprocessor.preprocess_batch(texts, workers=workers)
     
     def train(self):
-        print("📂 Loading datasets (Main + Learned)...")
         try:
-            df_main = pd.read_csv(DATA_PATH)
-            df_final = df_main
-            if os.path.exists(LEARNED_PATH) and os.path.getsize(LEARNED_PATH) > 10:
-                try:
-                    df_learned = pd.read_csv(LEARNED_PATH)
-                    print(f"📈 Menambahkan {len(df_learned)} data baru dari pengalaman lapangan.")
-                    df_final = pd.concat([df_main, df_learned], ignore_index=True)
-                except Exception as e:
-                    print(f"⚠️ Warning: Gagal load learned_data, pakai data utama saja. Error: {e}")
-            df_final.dropna(subset=['text', 'target_level', 'quality'], inplace=True)
-            df_final['clean_text'] = df_final['text'].apply(self.preprocess_text)
-            df_final = df_final[df_final['clean_text'].str.strip() != ""]
-            self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=1)
-            X = self.vectorizer.fit_transform(df_final['clean_text'])
-            self.knn_level = KNeighborsClassifier(n_neighbors=5, metric='cosine', weights='distance')
-            self.knn_level.fit(X, df_final['target_level'])
-            self.knn_quality = KNeighborsClassifier(n_neighbors=5, metric='cosine', weights='distance')
-            self.knn_quality.fit(X, df_final['quality'])
-            
-            self.is_trained = True
+            vectorizer, knn_level, knn_quality, learned_rows = self._build_model()
+            self._swap_model(vectorizer, knn_level, knn_quality, learned_rows,
+                             {"trained_at": datetime.now().isoformat(timespec='seconds')})
+            # Rows learned while the new model was being built
+            self._replay_learned()
             self.save_model()
-            print(f"✅ Training Selesai! Total Data: {len(df_final)} baris.")
-            
+            print(f"✅ Training Selesai! Total Data: {knn_level.n_samples_fit_} baris.")
+
         except Exception as e:
             print(f"❌ Error Train: {e}")
 
+    def _build_model(self):
+        """Full training run. Returns (vectorizer, knn_level, knn_quality, learned_rows) without touching the live model."""
+        df_final, learned_rows = load_training_frame(self.repo)
+        df_final = fill_clean_text(df_final, self.text_preprocessor, self.repo)
+        print(f"🧹 {self.text_preprocessor.report()}")
+        self.text_preprocessor.save_cache()
+        return (*fit_model(df_final), learned_rows)
+
+    def _swap_model(self, vectorizer, knn_level, knn_quality, learned_rows, meta=None):
+        """Replaces the live model atomically (predictions in flight keep their snapshot)."""
+        with self._model_lock:
+            self.vectorizer, self.knn_level, self.knn_quality = vectorizer, knn_level, knn_quality
+            self.learned_rows = learned_rows
+            self.model_meta = dict(meta or {})
+            self._learned_since_train = 0
+            self.is_trained = True
+
+    def _model_snapshot(self):
+        with self._model_lock:
+            return self.vectorizer, self.knn_level, self.knn_quality
+
+    def export_model(self):
+        """(vectorizer, knn_level, knn_quality, learned_rows, meta) of the live model, e.g. for rollback."""
+        with self._model_lock:
+            return self.vectorizer, self.knn_level, self.knn_quality, self.learned_rows, dict(self.model_meta)
+
+    def install_model(self, vectorizer, knn_level, knn_quality, learned_rows, meta=None):
+        """Swaps in a model built elsewhere (retrain service), catches up on learned rows and saves it."""
+        self._swap_model(vectorizer, knn_level, knn_quality, learned_rows, meta)
+        if ONLINE_LEARNING:
+            self._replay_learned()
+        self.save_model()
+
     def auto_learn(self, text, level, quality):
+        # Langsung ke SQLite (id-nya dipakai sebagai watermark model); teks yang sudah pernah dipelajari dilewati
+        clean = self.preprocess_text(text)
+        sample_id = self.repo.add_learned_sample(text, clean, level, quality)
+        if sample_id is None:
+            return
+        # print(f"📝 AI Belajar hal baru: '{text}' -> {level}") 
+        if ONLINE_LEARNING:
+            self.learn_online([sample_id], [clean], [level], [quality])
+
+    # --- Online Learning ---
+
+    def learn_online(self, sample_ids, clean_texts, levels, qualities):
+        """Adds learned_sample rows (already preprocessed) to the live KNN models without refitting the vectorizer.
+
+        The vocabulary/IDF of the last full training stays fixed (words it has never seen are
+        ignored until the next compaction). Ids the model already contains are skipped; after
+        ONLINE_COMPACT_EVERY rows a full retrain runs in the background.
+        """
+        with self._model_lock:
+            if not self.is_trained:
+                return
+            new = [i for i, sample_id in enumerate(sample_ids) if sample_id > self.learned_rows]
+            if not new:
+                return
+            keep = [i for i in new if clean_texts[i] and clean_texts[i].strip()]
+            if keep:
+                X_new = self.vectorizer.transform([clean_texts[i] for i in keep])
+                self.knn_level = self._extend_knn(self.knn_level, X_new, [levels[i] for i in keep])
+                self.knn_quality = self._extend_knn(self.knn_quality, X_new, [qualities[i] for i in keep])
+            self.learned_rows = max(sample_ids[i] for i in new) # unusable rows still count as consumed
+            self._learned_since_train += len(new)
+            should_compact = self._learned_since_train >= ONLINE_COMPACT_EVERY
+        if should_compact:
+            self._schedule_compaction()
+
+    @staticmethod
+    def _extend_knn(knn, X_new, labels):
+        """Same kind of classifier over the old training rows + X_new. The sparse backend only
+        appends to its delta block; sklearn is refitted (no tree, fit only stores the data)."""
+        if isinstance(knn, SparseKNNClassifier):
+            return knn.extend(X_new, labels)
+        X = sp.vstack([knn._fit_X, X_new], format='csr')
+        y = np.concatenate([knn.classes_[knn._y], np.asarray(labels, dtype=knn.classes_.dtype)])
+        return type(knn)(**knn.get_params()).fit(X, y)
+
+    def _replay_learned(self):
+        """Feeds learned_sample rows that are newer than the model into learn_online."""
         try:
-            with open(LEARNED_PATH, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([text, level, quality])
-            # print(f"📝 AI Belajar hal baru: '{text}' -> {level}") 
+            rows = list(self.repo.iter_learned_samples(after_id=self.learned_rows))
         except Exception as e:
-            print(f"⚠️ Gagal menyimpan learned data: {e}")
+            print(f"⚠️ Gagal membaca learned data untuk replay: {e}")
+            return
+        if not rows:
+            return
+        print(f"🔁 Replay {len(rows)} data baru ke model (online).")
+        sample_ids, texts, clean_texts, levels, qualities, _ = (list(col) for col in zip(*rows))
+        missing = [i for i, c in enumerate(clean_texts) if c is None]
+        for i, c in zip(missing, self.preprocess_batch([texts[i] for i in missing])):
+            clean_texts[i] = c
+        self.learn_online(sample_ids, clean_texts, levels, qualities)
+
+    def _schedule_compaction(self):
+        """Full retrain (new vocabulary) in a background thread; the old model keeps serving meanwhile."""
+        if self.retrain_service is not None:
+            self.retrain_service.request() # validated retrain in a worker process
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        print(f"🧩 {self._learned_since_train} data baru sejak training terakhir, retrain di background...")
+        self._compaction_thread = threading.Thread(target=self.train, name="brain-compaction", daemon=True)
+        self._compaction_thread.start()
 
     def calculate_score_saw(self, pred_level, pred_quality, text_len):
         W = [0.5, 0.3, 0.2]
@@ -306,12 +417,15 @@ class BrainLogic:
     def check_plagiarism(self, new_text, history_list):
         if not history_list: return False, None
         
-        clean_new = new_text.lower().strip()
-        new_words = set(clean_new.split())
+        _, clean_new, new_words = idea_entry(new_text)
+
+        # ClassIdeaIndex: only the LSH candidates, already normalized + tokenized
+        if isinstance(history_list, ClassIdeaIndex):
+            entries = history_list.candidate_entries(new_text, new_words)
+        else:
+            entries = ((old_text, normalize_idea(old_text), None) for old_text in history_list)
         
-        for old_text in history_list:
-            clean_old = old_text.lower().strip()
-            
+        for old_text, clean_old, old_words in entries:
             # 1. Exact Match Shortcut
             if clean_new == clean_old:
                 return True, old_text
@@ -321,7 +435,8 @@ class BrainLogic:
                 continue
 
             # 3. Jaccard Similarity Pre-check (Set Intersection)
-            old_words = set(clean_old.split())
+            if old_words is None:
+                old_words = set(clean_old.split())
             intersection = len(new_words & old_words)
             union = len(new_words | old_words)
             
@@ -338,7 +453,8 @@ class BrainLogic:
                     
         return False, None
 
-    def predict_and_score(self, text_input, class_history=[]):
+    def predict_and_score(self, text_input, class_history=[], progress=None):
+        """`progress(text)`, jika diberikan, dipanggil di setiap tahap (untuk layar loading)."""
         fail_response = {"success": False, "original_text": text_input, "msg": "Error", "debug": "Unknown"}
         if not self.is_trained:
             fail_response["msg"] = "Model belum siap."
@@ -346,8 +462,10 @@ class BrainLogic:
 
         text_lower = text_input.lower()
         clean_input = self.preprocess_text(text_input)
+        predictor = CombinedTextPredictor(*self._model_snapshot())
+        vec_input = predictor.transform([clean_input]) # vectorize once
         
-        if self.vectorizer.transform([clean_input]).sum() == 0:
+        if vec_input.nnz == 0:
             fail_response["msg"] = "Kalimat tidak dimengerti."
             self.log_rejected_input(text_input, "Unknown Words")
             return fail_response
@@ -358,16 +476,18 @@ class BrainLogic:
             return fail_response
         
         if class_history:
+            if progress: progress("Mengecek kemiripan dengan ide teman-temanmu... 🔍")
             is_plagiat, _ = self.check_plagiarism(text_input, class_history)
             if is_plagiat: 
                 fail_response["msg"] = "Ide mirip temanmu!"
                 self.log_rejected_input(text_input, f"Plagiarism detected (Similiar to: {_})")
                 return fail_response
 
-        vec_input = self.vectorizer.transform([clean_input])
-        pred_level = self.knn_level.predict(vec_input)[0]
-        pred_quality = self.knn_quality.predict(vec_input)[0]
-        confidence = np.max(self.knn_level.predict_proba(vec_input)) * 100
+        # One neighbour search for level, quality and confidence
+        if progress: progress("Menganalisis kadar kebaikanmu nih 🧐")
+        levels, qualities, confidences = predictor.predict_vectors(vec_input)
+        pred_level, pred_quality = levels[0], qualities[0]
+        confidence = confidences[0] * 100
         
         if pred_level == "Junk": 
             fail_response["msg"] = "Kalimat kurang jelas/tidak nyambung."
@@ -379,6 +499,7 @@ class BrainLogic:
             self.log_rejected_input(text_input, "Enemy")
             return fail_response
 
+        if progress: progress("Menghitung poin...")
         final_score = self.calculate_score_saw(pred_level, pred_quality, len(text_input))
         
         feedback_text = self.get_smart_feedback(text_input, pred_level)
@@ -396,14 +517,33 @@ class BrainLogic:
             "debug": f"Conf: {confidence:.0f}%"
         }
 
-    def save_model(self):
-        with open(MODEL_PATH, 'wb') as f:
-            pickle.dump((self.vectorizer, self.knn_level, self.knn_quality), f)
+    def save_model(self, path=None, bundle=None):
+        """Writes the live model (or an exported `bundle`) as a bundle directory (default MODEL_DIR)."""
+        if bundle is None:
+            bundle = self.export_model()
+        vectorizer, knn_level, knn_quality, learned_rows, meta = bundle
+        save_bundle(path or MODEL_DIR, vectorizer, knn_level, knn_quality, dict(meta, learned_rows=learned_rows))
 
-    def load_model(self):
-        if os.path.exists(MODEL_PATH):
-            with open(MODEL_PATH, 'rb') as f:
-                self.vectorizer, self.knn_level, self.knn_quality = pickle.load(f)
-            self.is_trained = True
-        else:
-            print("⚠️ Model belum ada.")
\ No newline at end of file
+    def load_model(self, path=None):
+        try:
+            model = read_model(path or MODEL_DIR)
+        except Exception as e:
+            print(f"⚠️ Model bundle rusak/tidak terbaca: {e}")
+            model = None
+        converted = False
+        if model is None and path is None and os.path.exists(LEGACY_MODEL_PATH):
+            model, converted = read_model(LEGACY_MODEL_PATH), True
+        if model is None:
+            print("⚠️ Model belum ada.")
+            return
+
+        vectorizer, knn_level, knn_quality, learned_rows, meta = model
+        if learned_rows is None:
+            # Old 3-tuple model: assume it already contains every learned row
+            learned_rows = self.repo.max_learned_sample_id()
+        self._swap_model(vectorizer, knn_level, knn_quality, learned_rows, meta)
+        if converted:
+            self.save_model()
+            print(f"📦 Model lama dikonversi ke bundle: {MODEL_DIR}")
+        if ONLINE_LEARNING:
+            self._replay_learned()
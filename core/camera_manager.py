@@ -6,9 +6,10 @@ import queue
 import customtkinter as ctk
 from PIL import Image
 from core.vision import VisionSystem
+from core.vision_pipeline import VisionPipeline
 from core.logger import log
 from core.constants import (
-    SLEEP_TIMEOUT, SMILE_HOLD_DURATION, UNRECOGNIZED_FACE_HOLD_DURATION, CAM_STARTING, CAM_ERROR,
+    VISION_PIPELINE, VISION_ENCODER_WORKERS, SLEEP_TIMEOUT, SMILE_HOLD_DURATION, UNRECOGNIZED_FACE_HOLD_DURATION, CAM_STARTING, CAM_ERROR,
     FACE_BOX_RED, FACE_BOX_GREEN, FACE_BOX_YELLOW,
     SMILE_PROGRESS_BAR_COLOR, SMILE_PROGRESS_TEXT_COLOR
 )
@@ -29,6 +30,7 @@ class CameraManager:
         self.frame_queue = queue.Queue(maxsize=2) # Keep queue small to ensure real-time feel
         self.stop_event = threading.Event()
         self.camera_thread = None
+        self.pipeline = VisionPipeline(vision_system, self.frame_queue, VISION_ENCODER_WORKERS) if VISION_PIPELINE else None
 
         # --- Liveness Detection State ---
         self.challenges = ["smile", "mouth_open", "blink"]
@@ -59,9 +61,12 @@ class CameraManager:
         self.is_camera_on = True
         self.stop_event.clear()
         
-        # Start Worker Thread
-        self.camera_thread = threading.Thread(target=self._camera_worker, daemon=True)
-        self.camera_thread.start()
+        # Start Worker Thread(s)
+        if self.pipeline:
+            self.pipeline.start()
+        else:
+            self.camera_thread = threading.Thread(target=self._camera_worker, daemon=True)
+            self.camera_thread.start()
         
         # Start UI Update Loop
         self._update_ui_loop()
@@ -72,6 +77,8 @@ class CameraManager:
         
         # Signal thread to stop
         self.stop_event.set()
+        if self.pipeline:
+            self.pipeline.stop()
         
         # Clear queue to prevent processing stale frames
         with self.frame_queue.mutex:
@@ -279,3 +286,5 @@ class CameraManager:
     def shutdown(self):
         """Releases camera resources and stops the update loop."""
         self.go_to_sleep()
+        if self.pipeline:
+            self.pipeline.shutdown()
@@ -14,6 +14,10 @@ SLEEP_TIMEOUT = 300
 SMILE_HOLD_DURATION = 2.5
 UNRECOGNIZED_FACE_HOLD_DURATION = 2.0
 AUTO_RESET_AFTER_SUCCESS = 7.0
+SUBMISSION_MIN_LOADING = 0.8 # layar loading tampil minimal sekian detik agar tidak berkedip
+
+# --- UI Worker (core/task_runner.py) ---
+UI_TASK_POLL_MS = 50 # seberapa sering thread Tk mengambil hasil dari worker
 
 # --- UI Texts ---
 # General
@@ -43,6 +47,77 @@ COLOR_FAILURE_BORDER = "red"
 # --- Leaderboard ---
 LEADERBOARD_LIMIT = 10
 
+# --- Face Index ---
+# "bruteforce": float32 matrix + precomputed norms, satu perkalian matriks-vektor (BLAS) per query
+# "kdtree": sklearn KDTree + delta buffer (lambat di 128 dimensi, disimpan untuk perbandingan)
+# "ivf": approximate (k-means + inverted lists) untuk 100k+ encoding; kandidat GREEN dicek ulang secara exact
+FACE_INDEX_BACKEND = "bruteforce"
+# IVF baru dipakai (dilatih) mulai jumlah encoding ini; di bawahnya query exact (bruteforce).
+# Terukur (benchmarks/bench_face_index.py, 1 core, 200 query, per query):
+#   10k:  bruteforce 356 us (batch 116) | ivf/8 145 us (batch 139)  -> batch bruteforce masih menang
+#   30k:  bruteforce 849 us (batch 401) | ivf/8 347 us (batch 296)  -> titik impas ~30k
+#   100k: bruteforce 2739 us (batch 1262) | ivf/8 837 us (batch 755)
+FACE_INDEX_IVF_MIN_TRAIN_SIZE = 32768
+# Jumlah cluster yang di-scan per query. Recall top-1 vs bruteforce: nprobe 8 = 0.995 (30k/100k,
+# data sintetis; data asli bisa lebih rendah, mis. ~0.95), nprobe 16 = 1.000 tapi ~1.7x lebih lambat,
+# nprobe 32 = setara bruteforce. Login GREEN selalu dicek ulang exact, jadi recall hanya memengaruhi kandidat lain.
+FACE_INDEX_IVF_NPROBE = 8
+
+# Satu siswa boleh punya beberapa encoding; pencocokan mengambil jarak terbaik per siswa
+FACE_MATCH_PER_IDENTITY = True
+FACE_MAX_ENCODINGS_PER_USER = 5
+# Auto-enroll: login GREEN yang sangat yakin (< 0.40) tapi cukup berbeda (>= 0.15) disimpan sbg encoding baru
+FACE_AUTO_ENROLL_DISTANCE = 0.40
+FACE_AUTO_ENROLL_MIN_NOVELTY = 0.15
+
+# --- Vision Pipeline ---
+# True: capture / deteksi / encoding berjalan di worker terpisah (encoder di process pool)
+# False: semua tahap serial di satu thread kamera (VisionSystem.process_frame)
+VISION_PIPELINE = True
+VISION_ENCODER_WORKERS = None # None = jumlah core - 2 (minimal 1)
+
+# --- Adaptive Frame Processing ---
+# True: SKIP_FRAMES & RESIZE_FACTOR diatur otomatis dari latensi yang terukur
+VISION_ADAPTIVE = True
+ADAPTIVE_TARGET_FPS = 10 # frame yang diproses per detik saat ada wajah (cukup untuk kedip/senyum)
+ADAPTIVE_IDLE_RESIZE = 0.35 # resolusi deteksi saat tidak ada wajah (murah, tetap responsif)
+ADAPTIVE_ACTIVE_RESIZE = 0.50 # resolusi deteksi saat ada wajah
+ADAPTIVE_MAX_SKIP = 5 # batas atas frame yang dilewati
+ENCODE_RESIZE = 0.50 # resolusi encoding wajah, tetap walau resolusi deteksi berubah
+
+# --- Face Tracking ---
+# True: deteksi HOG penuh hanya tiap beberapa frame, di antaranya wajah dilacak (correlation tracker)
+FACE_TRACKING = True
+TRACKER_REDETECT_INTERVAL = 10 # deteksi ulang penuh tiap N frame yang diproses
+TRACKER_MIN_PSR = 7.0 # kualitas tracker (peak-to-sidelobe ratio) minimum, di bawahnya dianggap hilang
+
+# --- Brain / Online Learning ---
+# "sparse": KNN teks dengan inverted index (hanya dokumen yang berbagi kata dihitung)
+# "sklearn": KNeighborsClassifier(metric='cosine') brute force
+TEXT_KNN_BACKEND = "sparse"
+# True: data hasil auto_learn langsung masuk ke model KNN (kosakata TF-IDF tetap)
+ONLINE_LEARNING = True
+ONLINE_COMPACT_EVERY = 200 # setelah N data baru, training penuh dijalankan di background
+
+# --- Background Retrain (core/retrainer.py) ---
+RETRAIN_CHECK_SECONDS = 60 # seberapa sering service mengecek apakah perlu retrain
+RETRAIN_INTERVAL_HOURS = 24 # retrain berkala (None = hanya berdasarkan jumlah data baru)
+RETRAIN_MIN_LEARNED = 50 # retrain jika sudah ada N data baru sejak training terakhir
+RETRAIN_HOLDOUT_SHARE = 0.1 # porsi data untuk validasi model baru
+RETRAIN_MAX_ACCURACY_DROP = 0.03 # model baru dipakai jika akurasi holdout-nya turun maks. sekian dibanding model aktif
+
+# --- Write-Behind Journal (core/journal.py) ---
+# rejected_sample ditulis oleh thread background, bukan di jalur submission
+JOURNAL_MAX_QUEUE = 10000 # antrean penuh -> pemanggil menunggu (tidak ada baris yang dibuang)
+JOURNAL_FLUSH_SECONDS = 0.5 # baris dikumpulkan maksimal sekian detik sebelum ditulis
+JOURNAL_BATCH_SIZE = 500 # atau sampai sekian baris (satu transaksi per batch)
+
+# --- Plagiarism Index (core/plagiarism_index.py) ---
+# MinHash per ide (set kata) + LSH banding: hanya ide yang mirip dicek dengan SequenceMatcher.
+# Mengubah nilai ini membuat signature lama di DB dihitung ulang saat kelas pertama kali dimuat.
+PLAGIARISM_MINHASH_PERM = 64 # panjang signature
+PLAGIARISM_LSH_BANDS = 32 # harus membagi PLAGIARISM_MINHASH_PERM (32 band x 2 baris)
+
 # --- Camera Processing ---
 ZONE_GREEN = "GREEN"
 ZONE_YELLOW = "YELLOW"
@@ -0,0 +1,441 @@
+import threading
+import numpy as np
+from core.logger import log
+
+
+class FaceIndex:
+    """Base class: append-only row store for face encodings with tombstoned removals.
+
+    Row ids are stable for the lifetime of the index (until the next build()), so
+    callers can keep per-row metadata in a parallel list/array. Subclasses implement
+    the actual search; query() returns (distances, rows) closest first.
+    """
+
+    def __init__(self, dim=128):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._vectors = np.empty((0, dim), dtype=np.float32) # capacity buffer, rows [0, _size) are valid
+        self._size = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._n_alive = 0
+
+    def __len__(self):
+        return self._n_alive
+
+    def build(self, matrix):
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, self.dim)
+        n = len(matrix)
+        with self._lock:
+            self._vectors = matrix # never written in place; add() grows into a new buffer
+            self._size = n
+            self._alive = np.ones(n, dtype=bool)
+            self._n_alive = n
+            self._on_build(matrix)
+
+    def add(self, vectors):
+        """Appends encodings, returns their row ids. O(1) amortized."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            start, end = self._size, self._size + len(vectors)
+            if end > len(self._vectors):
+                capacity = max(end, 2 * len(self._vectors), 16)
+                self._grow(capacity)
+            self._vectors[start:end] = vectors
+            self._alive[start:end] = True
+            self._size = end
+            self._n_alive += len(vectors)
+            rows = np.arange(start, end, dtype=np.int64)
+            self._on_add(rows, vectors)
+        self._after_update()
+        return rows
+
+    def remove(self, rows):
+        with self._lock:
+            removed = []
+            for r in np.atleast_1d(rows).tolist():
+                if 0 <= r < self._size and self._alive[r]:
+                    self._alive[r] = False
+                    self._n_alive -= 1
+                    removed.append(r)
+            self._on_remove(removed)
+        self._after_update()
+
+    def query_batch(self, vectors, k=2):
+        """Returns a list of (distances, rows), one per query vector."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        return [self.query(v, k) for v in vectors]
+
+    # --- Hooks (called with self._lock held, except _after_update) ---
+
+    def _grow(self, capacity):
+        start = self._size
+        grown = np.empty((capacity, self.dim), dtype=np.float32)
+        grown[:start] = self._vectors[:start]
+        self._vectors = grown
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:start] = self._alive[:start]
+        self._alive = alive
+
+    def _on_build(self, matrix):
+        pass
+
+    def _on_add(self, rows, vectors):
+        pass
+
+    def _on_remove(self, rows):
+        pass
+
+    def _after_update(self):
+        pass
+
+
+class KDTreeIndex(FaceIndex):
+    """KDTree over the bulk of the encodings + a small brute-force delta buffer.
+
+    New rows go to the delta buffer; once it (plus tombstones) grows past
+    `merge_threshold` the tree is rebuilt over the live rows in a background
+    thread and swapped in.
+    """
+
+    def __init__(self, dim=128, merge_threshold=64, background_merge=True):
+        super().__init__(dim)
+        self.merge_threshold = merge_threshold
+        self.background_merge = background_merge
+        self._tree = None
+        self._tree_rows = np.empty(0, dtype=np.int64) # tree position -> row id
+        self._tree_dead = 0 # tombstoned rows still inside the tree
+        self._delta_rows = [] # rows not yet in the tree
+        self._merge_thread = None
+        self._pending_tree = None
+
+    def build(self, matrix):
+        # Build the tree outside the lock; the base build() only swaps state
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, self.dim)
+        self._pending_tree = self._make_tree(matrix)
+        super().build(matrix)
+
+    @staticmethod
+    def _make_tree(matrix):
+        from sklearn.neighbors import KDTree
+        return KDTree(matrix, metric='euclidean') if len(matrix) else None
+
+    def _on_build(self, matrix):
+        self._tree = self._pending_tree
+        self._pending_tree = None
+        self._tree_rows = np.arange(len(matrix), dtype=np.int64)
+        self._tree_dead = 0
+        self._delta_rows = []
+
+    def _on_add(self, rows, vectors):
+        self._delta_rows.extend(rows.tolist())
+
+    def _on_remove(self, rows):
+        delta = set(self._delta_rows)
+        for r in rows:
+            if r in delta:
+                self._delta_rows.remove(r)
+            else:
+                self._tree_dead += 1
+
+    def _after_update(self):
+        with self._lock:
+            pending = len(self._delta_rows) + self._tree_dead
+            if pending < self.merge_threshold or self._merge_thread is not None:
+                return
+            if self.background_merge:
+                self._merge_thread = threading.Thread(target=self._merge, daemon=True)
+                self._merge_thread.start()
+                return
+            self._merge_thread = threading.current_thread()
+        self._merge()
+
+    def _merge(self):
+        """Rebuilds the tree over every live row, then swaps it in."""
+        try:
+            with self._lock:
+                size = self._size
+                rows = np.flatnonzero(self._alive[:size])
+                snapshot = self._vectors[rows] # fancy indexing -> private copy
+            tree = self._make_tree(snapshot)
+            with self._lock:
+                still_alive = self._alive[rows]
+                self._tree = tree
+                self._tree_rows = rows
+                self._tree_dead = int(len(rows) - still_alive.sum())
+                # Rows added while we were building stay in the delta buffer
+                self._delta_rows = [r for r in self._delta_rows if r >= size]
+            log.info(f"🌳 Face index merged: {len(rows)} rows in tree, {len(self._delta_rows)} in delta.")
+        except Exception as e:
+            log.error(f"Face index merge failed: {e}")
+        finally:
+            with self._lock:
+                self._merge_thread = None
+
+    def query(self, vector, k=2):
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, self.dim)
+        with self._lock:
+            tree, tree_rows, tree_dead = self._tree, self._tree_rows, self._tree_dead
+            delta_rows = np.array(self._delta_rows, dtype=np.int64)
+            delta_vectors = self._vectors[delta_rows]
+            alive = self._alive
+
+        cand_d, cand_r = [], []
+        if tree is not None and len(tree_rows):
+            kk = min(len(tree_rows), k + tree_dead) # over-fetch to skip tombstones
+            d, idx = tree.query(vector, k=kk)
+            rows = tree_rows[idx[0]]
+            mask = alive[rows]
+            cand_d.append(d[0][mask])
+            cand_r.append(rows[mask])
+        if len(delta_rows):
+            cand_d.append(np.linalg.norm(delta_vectors - vector, axis=1))
+            cand_r.append(delta_rows)
+
+        if not cand_d:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        dists = np.concatenate(cand_d)
+        rows = np.concatenate(cand_r)
+        order = np.argsort(dists, kind='stable')[:k]
+        return dists[order], rows[order]
+
+
+class BruteForceIndex(FaceIndex):
+    """Exact search as one BLAS matrix-vector product per query.
+
+    ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2, with ||x||^2 precomputed per row.
+    Removed rows get an infinite norm so they can never be selected.
+    """
+
+    def __init__(self, dim=128):
+        super().__init__(dim)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+
+    def _grow(self, capacity):
+        super()._grow(capacity)
+        sq = np.full(capacity, np.inf, dtype=np.float32)
+        sq[:self._size] = self._sq_norms[:self._size]
+        self._sq_norms = sq
+
+    def _on_build(self, matrix):
+        self._sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+
+    def _on_add(self, rows, vectors):
+        self._sq_norms[rows] = np.einsum('ij,ij->i', vectors, vectors)
+
+    def _on_remove(self, rows):
+        if rows:
+            # Copy-on-write so concurrent queries keep a consistent snapshot
+            sq = self._sq_norms.copy()
+            sq[rows] = np.inf
+            self._sq_norms = sq
+
+    def query(self, vector, k=2):
+        dists, rows = self._search(np.asarray(vector, dtype=np.float32).reshape(1, self.dim), k)
+        return dists[0], rows[0]
+
+    def query_batch(self, vectors, k=2):
+        dists, rows = self._search(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim), k)
+        return list(zip(dists, rows))
+
+    def _search(self, queries, k):
+        with self._lock:
+            size = self._size
+            matrix = self._vectors[:size]
+            sq_norms = self._sq_norms[:size]
+            n_alive = self._n_alive
+
+        k = min(k, n_alive)
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty, empty.astype(np.int64)
+
+        # (q, n) squared distances from a single GEMM/GEMV
+        d2 = sq_norms[None, :] - 2.0 * (queries @ matrix.T)
+        d2 += np.einsum('ij,ij->i', queries, queries)[:, None]
+
+        if k < size:
+            part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(size), (len(queries), size))
+        part_d2 = np.take_along_axis(d2, part, axis=1)
+        order = np.argsort(part_d2, axis=1, kind='stable')
+        rows = np.take_along_axis(part, order, axis=1).astype(np.int64)
+        dists = np.sqrt(np.maximum(np.take_along_axis(part_d2, order, axis=1), 0.0))
+        return dists, rows
+
+
+class IVFIndex(BruteForceIndex):
+    """Approximate search for very large enrollments: k-means coarse quantizer + inverted lists.
+
+    Only the `nprobe` lists whose centroids are closest to the query are scanned.
+    When the approximate best match is closer than `rerank_below` (a would-be GREEN
+    login) the query is re-run exactly over every row, so logins keep exact accuracy.
+    Below `min_train_size` rows, or until the first training finishes, every query
+    is exact (BruteForceIndex): brute force is faster up to roughly 30k encodings
+    (see FACE_INDEX_IVF_MIN_TRAIN_SIZE for the measured break-even). Training runs in a background thread and is repeated
+    whenever the index has doubled in size since the last one.
+    """
+
+    def __init__(self, dim=128, nprobe=8, n_lists=None, rerank_below=None, min_train_size=32768,
+                 kmeans_iters=10, background_train=True, seed=0):
+        super().__init__(dim)
+        self.nprobe = nprobe
+        self.n_lists = n_lists
+        self.rerank_below = rerank_below
+        self.min_train_size = min_train_size
+        self.kmeans_iters = kmeans_iters
+        self.background_train = background_train
+        self._rng = np.random.default_rng(seed)
+
+        self._centroids = None # (n_lists, dim), None = not trained yet
+        self._centroid_sq = None
+        self._lists = [] # per list: int64 array of rows assigned at training time
+        self._list_extra = [] # per list: python list of rows added after training
+        self._trained_size = 0
+        self._train_thread = None
+
+    def build(self, matrix):
+        with self._lock:
+            self._centroids = None
+            self._trained_size = 0
+        super().build(matrix)
+        self._after_update()
+
+    # --- Training ---
+
+    def _after_update(self):
+        with self._lock:
+            size = self._size
+            if size < self.min_train_size or size < 2 * self._trained_size or self._train_thread is not None:
+                return
+            if self.background_train:
+                self._train_thread = threading.Thread(target=self._train, daemon=True)
+                self._train_thread.start()
+                return
+            self._train_thread = threading.current_thread()
+        self._train()
+
+    def _train(self):
+        try:
+            with self._lock:
+                size = self._size
+                rows = np.flatnonzero(self._alive[:size])
+                matrix = self._vectors[:size]
+
+            n_lists = self.n_lists or int(np.clip(np.sqrt(len(rows)), 16, 4096))
+            sample_size = min(len(rows), max(n_lists * 64, 20000))
+            sample = matrix[self._rng.choice(rows, sample_size, replace=False)]
+            centroids = self._kmeans(sample, n_lists)
+            centroid_sq = np.einsum('ij,ij->i', centroids, centroids)
+
+            assign = self._assign(matrix[rows], centroids, centroid_sq)
+            order = np.argsort(assign, kind='stable')
+            bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+            lists = [rows[order[bounds[c]:bounds[c + 1]]] for c in range(n_lists)]
+
+            with self._lock:
+                # Rows added while training get assigned with the new centroids
+                list_extra = [[] for _ in range(n_lists)]
+                late_rows = np.arange(size, self._size)
+                if len(late_rows):
+                    for r, c in zip(late_rows.tolist(), self._assign(self._vectors[late_rows], centroids, centroid_sq).tolist()):
+                        list_extra[c].append(r)
+                self._centroids = centroids
+                self._centroid_sq = centroid_sq
+                self._lists = lists
+                self._list_extra = list_extra
+                self._trained_size = len(rows)
+            log.info(f"🗂️ IVF face index trained: {n_lists} lists over {len(rows)} encodings (nprobe={self.nprobe}).")
+        except Exception as e:
+            log.error(f"IVF face index training failed: {e}")
+        finally:
+            with self._lock:
+                self._train_thread = None
+
+    def _kmeans(self, data, n_clusters):
+        centroids = data[self._rng.choice(len(data), n_clusters, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            labels = self._assign(data, centroids, np.einsum('ij,ij->i', centroids, centroids))
+            order = np.argsort(labels, kind='stable')
+            counts = np.bincount(labels, minlength=n_clusters)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            non_empty = counts > 0
+            sums = np.add.reduceat(data[order], starts[non_empty], axis=0)
+            centroids[non_empty] = sums / counts[non_empty, None]
+            # Re-seed empty clusters with random points
+            n_empty = int((~non_empty).sum())
+            if n_empty:
+                centroids[~non_empty] = data[self._rng.choice(len(data), n_empty, replace=False)]
+        return centroids.astype(np.float32)
+
+    @staticmethod
+    def _assign(vectors, centroids, centroid_sq, chunk=8192):
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk):
+            block = vectors[start:start + chunk]
+            labels[start:start + chunk] = np.argmin(centroid_sq[None, :] - 2.0 * (block @ centroids.T), axis=1)
+        return labels
+
+    def _on_add(self, rows, vectors):
+        super()._on_add(rows, vectors)
+        if self._centroids is not None:
+            for r, c in zip(rows.tolist(), self._assign(vectors, self._centroids, self._centroid_sq).tolist()):
+                self._list_extra[c].append(r)
+
+    # --- Search ---
+
+    def query(self, vector, k=2):
+        vector = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            centroids, centroid_sq = self._centroids, self._centroid_sq
+            if centroids is not None:
+                size = self._size
+                matrix = self._vectors[:size]
+                sq_norms = self._sq_norms[:size]
+                d2c = centroid_sq - 2.0 * (centroids @ vector)
+                nprobe = min(self.nprobe, len(centroids))
+                probe = np.argpartition(d2c, nprobe - 1)[:nprobe]
+                parts = [self._lists[c] for c in probe]
+                parts += [np.array(self._list_extra[c], dtype=np.int64) for c in probe if self._list_extra[c]]
+
+        if centroids is None:
+            return super().query(vector, k)
+
+        cand = np.concatenate(parts)
+        cand_sq = sq_norms[cand]
+        keep = np.isfinite(cand_sq) # drop removed rows
+        cand, cand_sq = cand[keep], cand_sq[keep]
+        if len(cand) < k:
+            return super().query(vector, k)
+
+        d2 = cand_sq - 2.0 * (matrix[cand] @ vector) + float(vector @ vector)
+        if k < len(cand):
+            top = np.argpartition(d2, k - 1)[:k]
+        else:
+            top = np.arange(len(cand))
+        top = top[np.argsort(d2[top], kind='stable')]
+        dists = np.sqrt(np.maximum(d2[top], 0.0))
+
+        # Exact re-ranking for would-be logins
+        if self.rerank_below is not None and dists[0] < self.rerank_below:
+            return super().query(vector, k)
+        return dists, cand[top]
+
+    def query_batch(self, vectors, k=2):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        return [self.query(v, k) for v in vectors]
+
+
+FACE_INDEX_BACKENDS = {
+    "kdtree": KDTreeIndex,
+    "bruteforce": BruteForceIndex,
+    "ivf": IVFIndex,
+}
+
+
+def create_face_index(backend="bruteforce", **kwargs):
+    try:
+        cls = FACE_INDEX_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown face index backend '{backend}'. Choose from: {', '.join(FACE_INDEX_BACKENDS)}")
+    return cls(**kwargs)
@@ -0,0 +1,102 @@
+import math
+import time
+from core.logger import log
+
+
+class AdaptiveFrameController:
+    """Picks SKIP_FRAMES / RESIZE_FACTOR for VisionSystem from measured stage latencies.
+
+    Three situations, each with its own processing-rate target:
+    - idle (no face): low detection resolution, every frame if the CPU keeps up,
+      so a student walking up is picked up immediately;
+    - tracking (face present, identity locked): normal resolution at `target_fps`,
+      enough for the blink/smile/mouth liveness checks;
+    - encoding (face present, identity still unknown): same target, but the skip
+      count also absorbs the encoding cost, which then runs on every processed frame.
+
+    Stage costs are tracked as exponential moving averages. Detection cost is stored
+    per pixel area so it can be predicted for any resolution. A new decision is only
+    applied after it has been stable for `hold_frames` processed frames (right away when
+    a face appears, so the first frames of a student are not thrown away), and every
+    change is logged.
+    """
+
+    def __init__(self, target_fps=10.0, idle_target_fps=30.0, idle_resize=0.35, active_resize=0.5,
+                 max_skip=5, alpha=0.2, hold_frames=5):
+        self.target_fps = target_fps
+        self.idle_target_fps = idle_target_fps
+        self.idle_resize = idle_resize
+        self.active_resize = active_resize
+        self.max_skip = max_skip
+        self.alpha = alpha
+        self.hold_frames = hold_frames
+
+        self.stage_seconds = {} # EMA per stage ("detect" is per unit of resize^2)
+        self.frame_interval = None # EMA of the camera frame interval (seconds)
+        self._last_tick = None
+        self._last_tick_skipped = False
+
+        self.mode = None
+        self.skip = 2
+        self.resize = active_resize
+        self._candidate = None
+        self._candidate_count = 0
+
+    # --- Measurements ---
+
+    def tick(self, skipped):
+        """Called for every camera frame. Only gaps after skipped frames measure the camera itself."""
+        now = time.perf_counter()
+        if self._last_tick is not None and self._last_tick_skipped:
+            self._ema_interval(now - self._last_tick)
+        self._last_tick = now
+        self._last_tick_skipped = skipped
+
+    def _ema_interval(self, seconds):
+        if self.frame_interval is None:
+            self.frame_interval = seconds
+        else:
+            self.frame_interval += self.alpha * (seconds - self.frame_interval)
+
+    def record(self, stage, seconds, resize=None):
+        if stage == "detect" and resize:
+            seconds = seconds / (resize * resize)
+        previous = self.stage_seconds.get(stage)
+        self.stage_seconds[stage] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def _cost(self, stage, resize=None):
+        seconds = self.stage_seconds.get(stage, 0.0)
+        return seconds * resize * resize if stage == "detect" and resize else seconds
+
+    # --- Decision ---
+
+    def update(self, face_present, identity_unknown):
+        """Returns (skip_frames, resize_factor) to use from now on."""
+        if not face_present:
+            mode, resize, target = "idle", self.idle_resize, self.idle_target_fps
+            cost = self._cost("detect", resize)
+        else:
+            mode = "encoding" if identity_unknown else "tracking"
+            resize, target = self.active_resize, self.target_fps
+            cost = self._cost("detect", resize) + self._cost("landmarks")
+            if identity_unknown:
+                cost += self._cost("encode")
+
+        interval = self.frame_interval or (1.0 / 30.0)
+        period = max(1.0 / target, cost) # time one processed frame may take
+        skip = min(self.max_skip, max(0, math.ceil(period / interval - 1e-6) - 1))
+
+        decision = (mode, skip, resize)
+        if decision == (self.mode, self.skip, self.resize):
+            self._candidate, self._candidate_count = None, 0
+            return self.skip, self.resize
+
+        if decision != self._candidate:
+            self._candidate, self._candidate_count = decision, 0
+        self._candidate_count += 1
+        if self.mode is None or (self.mode == "idle" and mode != "idle") or self._candidate_count >= self.hold_frames:
+            log.info(f"ADAPTIVE: {self.mode} -> {mode}: skip {self.skip} -> {skip}, resize {self.resize:.2f} -> {resize:.2f} "
+                     f"(cost {cost * 1000:.1f} ms, camera {1.0 / interval:.0f} fps, target {target:.0f} fps)")
+            self.mode, self.skip, self.resize = decision
+            self._candidate, self._candidate_count = None, 0
+        return self.skip, self.resize
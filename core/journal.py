@@ -0,0 +1,86 @@
+import atexit
+import queue
+import threading
+import time
+from core.logger import log
+from core.constants import JOURNAL_MAX_QUEUE, JOURNAL_FLUSH_SECONDS, JOURNAL_BATCH_SIZE
+
+_FLUSH = object()
+_STOP = object()
+
+
+class WriteBehindJournal:
+    """Background writer for side-channel rows (rejected samples, see core.samples.RejectedSampleSink).
+
+    append() only puts the row on a bounded queue, so the caller never waits for the database.
+    The writer thread collects rows for up to `flush_seconds` (or `batch_size` rows) and hands
+    each sink its rows in one write() call, i.e. one SQLite transaction per batch instead of
+    one per row. When the queue is full append() blocks (back-pressure) instead of dropping
+    rows. flush() waits until everything queued so far is written; close() flushes and stops.
+    Any object with write(rows) can be a sink.
+    """
+
+    def __init__(self, max_queue=JOURNAL_MAX_QUEUE, flush_seconds=JOURNAL_FLUSH_SECONDS, batch_size=JOURNAL_BATCH_SIZE):
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="write-behind-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, sink, row):
+        if self._closed: # after shutdown: write through
+            sink.write([row])
+            return
+        try:
+            self._queue.put_nowait((sink, row))
+        except queue.Full:
+            log.warning("JOURNAL: queue full, waiting for the writer (disk slow?)")
+            self._queue.put((sink, row))
+
+    def flush(self, timeout=None):
+        """Blocks until every row appended before this call is written."""
+        if self._closed or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout)
+
+    # --- Writer thread ---
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, control = [item], None
+            deadline = time.monotonic() + self.flush_seconds
+            while batch[-1][0] not in (_FLUSH, _STOP) and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1][0] in (_FLUSH, _STOP):
+                control = batch.pop()
+
+            self._write(batch)
+            if control is not None:
+                if control[0] is _STOP:
+                    return
+                control[1].set()
+
+    def _write(self, batch):
+        by_sink = {}
+        for sink, row in batch:
+            by_sink.setdefault(sink, []).append(row)
+        for sink, rows in by_sink.items():
+            try:
+                sink.write(rows)
+            except Exception as e:
+                log.error(f"JOURNAL: failed to write {len(rows)} rows to {type(sink).__name__}: {e}")
@@ -0,0 +1,94 @@
+import bisect
+import threading
+from datetime import date, timedelta
+
+LEADERBOARD_WINDOWS = (None, "day", "week", "month")
+
+
+def window_start(window, today=None):
+    """First date of a ranking window (None = all time). Weeks start on Monday."""
+    today = today or date.today()
+    if window is None:
+        return None
+    if window == "day":
+        return today
+    if window == "week":
+        return today - timedelta(days=today.weekday())
+    if window == "month":
+        return today.replace(day=1)
+    raise ValueError(f"Unknown leaderboard window '{window}', expected one of {LEADERBOARD_WINDOWS}")
+
+
+class LeaderboardService:
+    """All-time top-N kept in memory and updated in place when a score changes.
+
+    Entries are sorted by (-total_poin, siswa_id), the same order as
+    KebaikanRepository.get_top_siswa, so a bisect finds the new position of a student in
+    O(log N); moving the entry there is a list insert/delete, O(N) element shifts, which for
+    the sidebar's N (LEADERBOARD_LIMIT) is cheaper than a tree. Points only ever go up, so a
+    student outside the top N can only enter it by pushing out the last entry; nothing has
+    to be re-read from SQLite after add_points.
+
+    The top N is read once in __init__ (the schema must exist), so the "before" state of the
+    first update() is the cache from before the write, not a read that already sees it.
+
+    update() returns a diff: [(position, (nama, kelas, total_poin) or None)] for every row
+    whose content changed, which the sidebar uses to relabel just those rows.
+    """
+
+    def __init__(self, repo, size):
+        self.repo = repo
+        self.size = size
+        self._lock = threading.Lock()
+        self._keys = [] # [(-total_poin, siswa_id)]
+        self._rows = [] # [(nama, kelas, total_poin)], same order
+        self._members = {} # siswa_id -> total_poin for the students currently in the top N
+        self._load()
+
+    def _load(self):
+        top = self.repo.get_top_siswa(self.size)
+        self._keys = [(-poin, siswa_id) for siswa_id, _, _, poin in top]
+        self._rows = [(nama, kelas, poin) for _, nama, kelas, poin in top]
+        self._members = {siswa_id: poin for siswa_id, _, _, poin in top}
+
+    def rows(self, limit=None):
+        with self._lock:
+            return list(self._rows[:limit])
+
+    def update(self, siswa_id, nama, kelas, total_poin):
+        """A student's total changed to total_poin. Returns the diff (empty if the top N did not change)."""
+        with self._lock:
+            before = list(self._rows)
+            old = None
+            if siswa_id in self._members:
+                old = bisect.bisect_left(self._keys, (-self._members.pop(siswa_id), siswa_id))
+                del self._keys[old], self._rows[old]
+            key = (-total_poin, siswa_id)
+            position = bisect.bisect_left(self._keys, key)
+            if position < self.size:
+                self._keys.insert(position, key)
+                self._rows.insert(position, (nama, kelas, total_poin))
+                self._members[siswa_id] = total_poin
+                for _, dropped in self._keys[self.size:]:
+                    del self._members[dropped]
+                del self._keys[self.size:], self._rows[self.size:]
+            elif old is not None:
+                # Fell out of the top N (only if points can go down): refill from the database
+                self._load()
+            return self._diff(before, self._rows)
+
+    def reload(self):
+        """Re-reads the top N (e.g. after points were edited outside the app). Returns the diff."""
+        with self._lock:
+            before = list(self._rows)
+            self._load()
+            return self._diff(before, self._rows)
+
+    def _diff(self, before, after):
+        diff = []
+        for position in range(max(len(before), len(after))):
+            old = before[position] if position < len(before) else None
+            new = after[position] if position < len(after) else None
+            if old != new:
+                diff.append((position, new))
+        return diff
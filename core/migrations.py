@@ -0,0 +1,201 @@
+import json
+import numpy as np
+from core.logger import log
+
+# Versioned schema migrations. The applied version is kept in PRAGMA user_version,
+# so an existing kebaikan.db is upgraded in place, one step at a time, each step
+# inside its own transaction (a failed step rolls back and leaves the data untouched).
+
+
+def _m001_base_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS siswa
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  nama TEXT,
+                  kelas TEXT,
+                  encoding TEXT,
+                  total_poin INTEGER DEFAULT 0,
+                  streak INTEGER DEFAULT 0,
+                  last_active DATE)''')
+
+    conn.execute('''CREATE TABLE IF NOT EXISTS log_aktivitas
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  nama_siswa TEXT,
+                  kelas TEXT,
+                  ide_kebaikan TEXT,
+                  skor_ai INTEGER,
+                  kategori_ide TEXT,
+                  waktu TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+
+def _m002_lookup_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_siswa_nama_kelas ON siswa(nama, kelas)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_siswa_total_poin ON siswa(total_poin DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_kelas_waktu ON log_aktivitas(kelas, waktu)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_nama_kelas_waktu ON log_aktivitas(nama_siswa, kelas, waktu)")
+
+
+def _m003_log_siswa_fk(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(log_aktivitas)")]
+    if "siswa_id" not in columns:
+        conn.execute("ALTER TABLE log_aktivitas ADD COLUMN siswa_id INTEGER REFERENCES siswa(id) ON DELETE SET NULL")
+
+    # Backfill from the old (nama_siswa, kelas) pair
+    conn.execute('''UPDATE log_aktivitas
+                    SET siswa_id = (SELECT s.id FROM siswa s
+                                    WHERE s.nama = log_aktivitas.nama_siswa AND s.kelas = log_aktivitas.kelas
+                                    ORDER BY s.id LIMIT 1)
+                    WHERE siswa_id IS NULL''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_siswa_waktu ON log_aktivitas(siswa_id, waktu)")
+
+
+def _m004_encoding_blobs(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS siswa_encoding
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  siswa_id INTEGER NOT NULL REFERENCES siswa(id) ON DELETE CASCADE,
+                  encoding BLOB NOT NULL,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_siswa_encoding_siswa ON siswa_encoding(siswa_id)")
+
+    # One-time conversion of the old JSON text column into packed float32 rows
+    converted = 0
+    rows = conn.execute("SELECT id, encoding FROM siswa WHERE encoding IS NOT NULL AND encoding != ''").fetchall()
+    for siswa_id, encoding_json in rows:
+        try:
+            data = json.loads(encoding_json)
+            if data and isinstance(data[0], list): # multiple encodings
+                encodings = data
+            else:
+                encodings = [data]
+            for enc in encodings:
+                blob = np.asarray(enc, dtype="<f4").tobytes()
+                conn.execute("INSERT INTO siswa_encoding (siswa_id, encoding) VALUES (?, ?)", (siswa_id, blob))
+            conn.execute("UPDATE siswa SET encoding = NULL WHERE id = ?", (siswa_id,))
+            converted += 1
+        except Exception as e:
+            # Leave the JSON in place so nothing is lost; it can be fixed by hand
+            log.error(f"DB: Could not convert encoding of siswa id {siswa_id}: {e}")
+    if converted:
+        log.info(f"DB: Converted {converted} JSON encodings to float32 BLOBs.")
+
+
+def _m005_idea_signatures(conn):
+    from core.plagiarism_index import minhash_signature, pack_signature
+    conn.execute('''CREATE TABLE IF NOT EXISTS ide_signature
+                 (log_id INTEGER PRIMARY KEY REFERENCES log_aktivitas(id) ON DELETE CASCADE,
+                  kelas TEXT NOT NULL,
+                  signature BLOB NOT NULL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ide_signature_kelas ON ide_signature(kelas)")
+
+    # Backfill MinHash signatures for every idea logged so far
+    rows = conn.execute('''SELECT id, kelas, ide_kebaikan FROM log_aktivitas
+                            WHERE id NOT IN (SELECT log_id FROM ide_signature)''').fetchall()
+    conn.executemany("INSERT INTO ide_signature (log_id, kelas, signature) VALUES (?, ?, ?)",
+                     ((log_id, kelas or "", pack_signature(minhash_signature(ide or ""))) for log_id, kelas, ide in rows))
+    if rows:
+        log.info(f"DB: Computed {len(rows)} idea signatures for the plagiarism index.")
+
+
+def _m006_point_rollups(conn):
+    # Daily aggregates maintained by add_points, so windowed / per-class rankings never scan log_aktivitas.
+    # tanggal is the submission's date in the school timezone (see rebuild_point_rollups).
+    conn.execute('''CREATE TABLE IF NOT EXISTS poin_harian_siswa
+                 (tanggal DATE NOT NULL,
+                  siswa_id INTEGER NOT NULL REFERENCES siswa(id) ON DELETE CASCADE,
+                  kelas TEXT,
+                  poin INTEGER NOT NULL DEFAULT 0,
+                  jumlah_ide INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (tanggal, siswa_id))''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_poin_harian_siswa_kelas ON poin_harian_siswa(kelas, tanggal)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS poin_harian_kelas
+                 (tanggal DATE NOT NULL,
+                  kelas TEXT NOT NULL,
+                  poin INTEGER NOT NULL DEFAULT 0,
+                  jumlah_ide INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY (tanggal, kelas))''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_siswa_kelas_poin ON siswa(kelas, total_poin DESC)")
+
+    rebuild_point_rollups(conn) # backfill from the existing log
+
+
+def register_school_date(conn, calendar=None):
+    """Makes school_date(waktu) available in SQL on `conn`: SchoolCalendar.local_date as ISO text."""
+    from core.streaks import load_calendar
+    calendar = calendar or load_calendar()
+    conn.create_function("school_date", 1, lambda waktu: calendar.local_date(waktu).isoformat(), deterministic=True)
+
+
+def rebuild_point_rollups(conn, calendar=None):
+    """Recomputes poin_harian_siswa / poin_harian_kelas from log_aktivitas.
+
+    Days are bucketed with SchoolCalendar.local_date (school_calendar.json's timezone), the
+    same date add_points uses for new submissions, not the host's 'localtime'.
+    """
+    register_school_date(conn, calendar)
+    conn.execute("DELETE FROM poin_harian_siswa")
+    conn.execute("DELETE FROM poin_harian_kelas")
+    conn.execute('''INSERT INTO poin_harian_siswa (tanggal, siswa_id, kelas, poin, jumlah_ide)
+                    SELECT school_date(waktu), siswa_id, kelas, SUM(COALESCE(skor_ai, 0)), COUNT(*)
+                    FROM log_aktivitas WHERE siswa_id IS NOT NULL AND waktu IS NOT NULL
+                    GROUP BY school_date(waktu), siswa_id''')
+    conn.execute('''INSERT INTO poin_harian_kelas (tanggal, kelas, poin, jumlah_ide)
+                    SELECT school_date(waktu), kelas, SUM(COALESCE(skor_ai, 0)), COUNT(*)
+                    FROM log_aktivitas WHERE kelas IS NOT NULL AND waktu IS NOT NULL
+                    GROUP BY school_date(waktu), kelas''')
+
+
+def _m007_sample_tables(conn):
+    # Learned / rejected samples (were learned_data.csv / rejected_data.csv). text_norm is
+    # core.samples.normalize_sample_text(text); the unique indexes are the dedup.
+    conn.execute('''CREATE TABLE IF NOT EXISTS learned_sample
+                 (id INTEGER PRIMARY KEY,
+                  text TEXT NOT NULL,
+                  text_norm TEXT NOT NULL,
+                  clean_text TEXT,
+                  target_level TEXT NOT NULL,
+                  quality TEXT NOT NULL,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_learned_sample_norm ON learned_sample(text_norm)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS rejected_sample
+                 (id INTEGER PRIMARY KEY,
+                  text TEXT NOT NULL,
+                  text_norm TEXT NOT NULL,
+                  reason TEXT NOT NULL,
+                  jumlah INTEGER NOT NULL DEFAULT 1,
+                  first_seen TIMESTAMP,
+                  last_seen TIMESTAMP)''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_rejected_sample_norm ON rejected_sample(text_norm, reason)")
+
+
+MIGRATIONS = [
+    (1, "base schema", _m001_base_schema),
+    (2, "lookup indexes", _m002_lookup_indexes),
+    (3, "log_aktivitas.siswa_id foreign key", _m003_log_siswa_fk),
+    (4, "float32 BLOB face encodings", _m004_encoding_blobs),
+    (5, "MinHash idea signatures", _m005_idea_signatures),
+    (6, "daily point rollups", _m006_point_rollups),
+    (7, "learned / rejected sample tables", _m007_sample_tables),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(pool):
+    with pool.read() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(pool):
+    """Applies every migration newer than the database's user_version. Returns the final version."""
+    current = get_schema_version(pool)
+    for version, name, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with pool.transaction() as conn:
+            # Re-check under the write lock in case another process migrated meanwhile
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            log.info(f"DB: Applying migration {version:03d} ({name})...")
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+        current = version
+    return current
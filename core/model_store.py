@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+from collections import Counter
+from datetime import datetime
+import numpy as np
+import scipy.sparse as sp
+from core.logger import log
+from core.text_knn import SparseKNNClassifier, create_text_knn, training_matrix
+
+FORMAT_VERSION = 1
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b") # sklearn's default token_pattern
+
+
+class TfidfVectorizerLite:
+    """transform()-only TF-IDF using the vocabulary + idf of a fitted sklearn TfidfVectorizer.
+
+    Covers the settings brain.fit_model uses (lowercase, word n-grams, smooth idf, no
+    sublinear tf, l2 norm) and produces the same matrix, without importing sklearn.
+    """
+
+    def __init__(self, terms, idf, ngram_range=(1, 2)):
+        self.terms = list(terms)
+        self.vocabulary_ = {term: i for i, term in enumerate(self.terms)}
+        self.idf_ = np.asarray(idf, dtype=np.float64)
+        self.ngram_range = tuple(ngram_range)
+
+    @classmethod
+    def from_sklearn(cls, vectorizer):
+        terms = [None] * len(vectorizer.vocabulary_)
+        for term, i in vectorizer.vocabulary_.items():
+            terms[i] = term
+        return cls(terms, vectorizer.idf_, vectorizer.ngram_range)
+
+    def _ngrams(self, text):
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(tokens) - n + 1):
+                yield " ".join(tokens[i:i + n])
+
+    def transform(self, texts):
+        indptr, indices, counts = [0], [], []
+        for text in texts:
+            row = Counter(i for i in map(self.vocabulary_.get, self._ngrams(text)) if i is not None)
+            for i in sorted(row):
+                indices.append(i)
+                counts.append(row[i])
+            indptr.append(len(indices))
+        X = sp.csr_matrix(
+            (np.asarray(counts, dtype=np.float64), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int32)),
+            shape=(len(indptr) - 1, len(self.terms))
+        )
+        X.data *= self.idf_[X.indices]
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        norms[norms == 0.0] = 1.0
+        X.data /= np.repeat(norms, np.diff(X.indptr))
+        return X
+
+
+def as_lite_vectorizer(vectorizer):
+    return vectorizer if isinstance(vectorizer, TfidfVectorizerLite) else TfidfVectorizerLite.from_sklearn(vectorizer)
+
+
+# --- Bundle directory ---
+# manifest.json      format version, meta, matrix shape, sha256 of every other file
+# vocabulary.json    terms in column order
+# idf.npy            float64 idf per column
+# X_*.npy            CSR training matrix (data / indices / indptr), memory-mapped on load
+# postings_*.npy     CSR of the transposed matrix (inverted index for SparseKNNClassifier)
+# level_*.npy, quality_*.npy   label codes per row + class names
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _save_csr(directory, prefix, matrix, files):
+    for part in ("data", "indices", "indptr"):
+        name = f"{prefix}_{part}.npy"
+        np.save(os.path.join(directory, name), getattr(matrix, part), allow_pickle=False)
+        files.append(name)
+
+
+def _load_csr(directory, prefix, shape):
+    parts = [np.load(os.path.join(directory, f"{prefix}_{part}.npy"), mmap_mode='r', allow_pickle=False)
+             for part in ("data", "indices", "indptr")]
+    return sp.csr_matrix(tuple(parts), shape=shape, copy=False)
+
+
+def save_bundle(path, vectorizer, knn_level, knn_quality, meta):
+    """Writes the model as a bundle directory. The directory is built next to `path` and
+    renamed into place, so readers never see a half-written bundle."""
+    if knn_level.n_samples_fit_ != knn_quality.n_samples_fit_:
+        raise ValueError("knn_level and knn_quality were fitted on different rows")
+    vectorizer = as_lite_vectorizer(vectorizer)
+    X = sp.csr_matrix(training_matrix(knn_level))
+    postings = X.T.tocsr()
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    files = ["vocabulary.json", "idf.npy"]
+    with open(os.path.join(tmp_path, "vocabulary.json"), 'w', encoding='utf-8') as f:
+        json.dump(vectorizer.terms, f, ensure_ascii=False)
+    np.save(os.path.join(tmp_path, "idf.npy"), vectorizer.idf_, allow_pickle=False)
+    _save_csr(tmp_path, "X", X, files)
+    _save_csr(tmp_path, "postings", postings, files)
+    for name, knn in (("level", knn_level), ("quality", knn_quality)):
+        np.save(os.path.join(tmp_path, f"{name}_codes.npy"), np.asarray(knn._y, dtype=np.int32), allow_pickle=False)
+        np.save(os.path.join(tmp_path, f"{name}_classes.npy"), np.asarray(knn.classes_, dtype=str), allow_pickle=False)
+        files += [f"{name}_codes.npy", f"{name}_classes.npy"]
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "meta": meta,
+        "ngram_range": list(vectorizer.ngram_range),
+        "n_neighbors": knn_level.n_neighbors,
+        "shape": list(X.shape),
+        "files": {name: _sha256(os.path.join(tmp_path, name)) for name in files},
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def bundle_path_to_read(path):
+    """`path`, or its `.old` copy if a save was interrupted between the two renames."""
+    if os.path.exists(os.path.join(path, "manifest.json")):
+        return path
+    if os.path.exists(os.path.join(path + ".old", "manifest.json")):
+        return path + ".old"
+    return None
+
+
+def load_bundle(path, verify=True, backend="sparse"):
+    """(vectorizer, knn_level, knn_quality, meta) from a bundle directory.
+
+    Arrays are memory-mapped, so pages are only read when a query touches them; with
+    verify=True every file is checked against the manifest checksum first.
+    """
+    with open(os.path.join(path, "manifest.json"), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle format {manifest.get('format')} in {path}")
+    if verify:
+        for name, expected in manifest["files"].items():
+            if _sha256(os.path.join(path, name)) != expected:
+                raise ValueError(f"Model bundle file {name} is corrupt (checksum mismatch)")
+
+    with open(os.path.join(path, "vocabulary.json"), 'r', encoding='utf-8') as f:
+        terms = json.load(f)
+    idf = np.load(os.path.join(path, "idf.npy"), allow_pickle=False)
+    vectorizer = TfidfVectorizerLite(terms, idf, manifest["ngram_range"])
+
+    shape = tuple(manifest["shape"])
+    X = _load_csr(path, "X", shape)
+    postings = _load_csr(path, "postings", (shape[1], shape[0]))
+    models = []
+    for name in ("level", "quality"):
+        codes = np.load(os.path.join(path, f"{name}_codes.npy"), allow_pickle=False)
+        classes = np.load(os.path.join(path, f"{name}_classes.npy"), allow_pickle=False).astype(object)
+        if backend == "sparse":
+            models.append(SparseKNNClassifier.from_arrays(X, postings, codes, classes, manifest["n_neighbors"]))
+        else:
+            models.append(create_text_knn(backend, manifest["n_neighbors"]).fit(X, classes[codes]))
+    return (vectorizer, *models, manifest.get("meta", {}))
+
+
+def load_legacy_pickle(path):
+    """(vectorizer, knn_level, knn_quality, meta) from an old trained_brain.pkl (needs sklearn)."""
+    with open(path, 'rb') as f:
+        bundle = pickle.load(f)
+    meta = dict(bundle[3]) if len(bundle) > 3 else {}
+    log.info(f"MODEL: loaded legacy pickle {os.path.basename(path)}.")
+    return (as_lite_vectorizer(bundle[0]), *bundle[1:3], meta)
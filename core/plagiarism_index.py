@@ -0,0 +1,175 @@
+import threading
+import zlib
+import numpy as np
+from core.logger import log
+from core.constants import PLAGIARISM_MINHASH_PERM, PLAGIARISM_LSH_BANDS
+
+# MinHash over the word set of an idea (the same words check_plagiarism compares with
+# Jaccard), LSH banding on top. Signatures are stored in SQLite (ide_signature, see
+# migrations), so the hash functions must stay the same across runs: fixed seed.
+SIGNATURE_DTYPE = np.dtype("<u4")
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_rng = np.random.default_rng(20240101)
+_A = (_rng.integers(0, 2**63, PLAGIARISM_MINHASH_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1) # odd
+_B = _rng.integers(0, 2**63, PLAGIARISM_MINHASH_PERM, dtype=np.uint64)
+_EMPTY = np.full(PLAGIARISM_MINHASH_PERM, np.iinfo(SIGNATURE_DTYPE).max, dtype=SIGNATURE_DTYPE)
+
+
+def normalize_idea(text):
+    """Same normalization as check_plagiarism: lowercase + strip."""
+    return text.lower().strip()
+
+
+def idea_entry(text):
+    """(text, normalized text, word set): what check_plagiarism compares, computed once per idea."""
+    clean = normalize_idea(text)
+    return text, clean, frozenset(clean.split())
+
+
+def minhash_signature(text, words=None):
+    """(PLAGIARISM_MINHASH_PERM,) uint32 MinHash of the idea's word set."""
+    if words is None:
+        words = set(normalize_idea(text).split())
+    if not words:
+        return _EMPTY.copy()
+    x = np.fromiter((zlib.crc32(w.encode('utf-8')) for w in words), dtype=np.uint64, count=len(words))
+    # Multiply-shift hashing, one (a, b) pair per permutation; uint64 arithmetic wraps
+    hashed = (_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(SIGNATURE_DTYPE)
+
+
+def pack_signature(signature):
+    return np.asarray(signature, dtype=SIGNATURE_DTYPE).tobytes()
+
+
+def unpack_signature(blob):
+    """Signature array from a stored BLOB, or None if it was made with other parameters."""
+    if blob is None or len(blob) != PLAGIARISM_MINHASH_PERM * SIGNATURE_DTYPE.itemsize:
+        return None
+    return np.frombuffer(blob, dtype=SIGNATURE_DTYPE)
+
+
+def band_keys(signatures, bands=PLAGIARISM_LSH_BANDS):
+    """(n, bands) uint64: each band of rows hashed into one key."""
+    signatures = np.asarray(signatures, dtype=SIGNATURE_DTYPE).reshape(-1, PLAGIARISM_MINHASH_PERM)
+    grouped = signatures.reshape(len(signatures), bands, -1).astype(np.uint64)
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for col in range(grouped.shape[2]):
+        keys = keys * _MIX + grouped[:, :, col]
+    return keys
+
+
+class ClassIdeaIndex:
+    """LSH index over the ideas of one class.
+
+    Two ideas become candidates when at least one band of their signatures is equal. With
+    64 permutations in 32 bands of 2, ideas with word Jaccard 0.3 are found with ~95%
+    probability and 0.5+ practically always, while unrelated ideas rarely collide.
+
+    Band keys of the bulk-loaded rows are kept sorted per band (binary search per query);
+    ideas added later go to a small tail that is scanned with one vectorized compare and
+    merged into the sorted part once it grows past `merge_every`.
+    """
+
+    def __init__(self, kelas, bands=PLAGIARISM_LSH_BANDS, merge_every=1024):
+        self.kelas = kelas
+        self.bands = bands
+        self.merge_every = merge_every
+        self.texts = []
+        self.entries = [] # idea_entry() per text, same order
+        self._lock = threading.Lock()
+        self._keys = np.empty((0, bands), dtype=np.uint64) # capacity buffer, rows [0, len(texts)) are valid
+        self._sorted_keys = np.empty((0, bands), dtype=np.uint64)
+        self._sorted_rows = np.empty((0, bands), dtype=np.intp)
+        self._n_sorted = 0
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return iter(list(self.texts))
+
+    def extend(self, texts, signatures):
+        entries = [idea_entry(t) for t in texts]
+        keys = band_keys(signatures, self.bands) if len(texts) else np.empty((0, self.bands), dtype=np.uint64)
+        with self._lock:
+            start, end = len(self.texts), len(self.texts) + len(texts)
+            if end > len(self._keys):
+                grown = np.empty((max(end, 2 * len(self._keys), 16), self.bands), dtype=np.uint64)
+                grown[:start] = self._keys[:start]
+                self._keys = grown
+            self._keys[start:end] = keys
+            self.texts.extend(texts)
+            self.entries.extend(entries)
+            if end - self._n_sorted > self.merge_every:
+                self._merge()
+
+    def add(self, text, signature):
+        self.extend([text], [signature])
+
+    def _merge(self):
+        keys = self._keys[:len(self.texts)]
+        self._sorted_rows = np.argsort(keys, axis=0, kind='stable')
+        self._sorted_keys = np.take_along_axis(keys, self._sorted_rows, axis=0)
+        self._n_sorted = len(keys)
+
+    def candidates(self, signature):
+        """Row numbers of ideas sharing at least one LSH band with `signature` (ascending)."""
+        query = band_keys(signature, self.bands)[0]
+        with self._lock:
+            found = []
+            for band in range(self.bands):
+                column = self._sorted_keys[:, band]
+                lo, hi = np.searchsorted(column, query[band], 'left'), np.searchsorted(column, query[band], 'right')
+                if hi > lo:
+                    found.append(self._sorted_rows[lo:hi, band])
+            tail = self._keys[self._n_sorted:len(self.texts)]
+            if len(tail):
+                found.append(self._n_sorted + np.flatnonzero((tail == query).any(axis=1)))
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
+
+    def candidate_entries(self, text, words=None):
+        return [self.entries[i] for i in self.candidates(minhash_signature(text, words)).tolist()]
+
+
+class PlagiarismIndex:
+    """ClassIdeaIndex per class, loaded from the database the first time a class is checked.
+
+    Doubles as the class history cache: each class is read once, ideas logged afterwards
+    are appended in place by add().
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self._classes = {}
+        self._lock = threading.Lock()
+
+    def get(self, kelas):
+        with self._lock:
+            index = self._classes.get(kelas)
+            if index is None:
+                index = self._classes[kelas] = self._load(kelas)
+            return index
+
+    def _load(self, kelas):
+        texts, signatures, repaired = [], [], []
+        for log_id, text, blob in self.repo.load_idea_signatures(kelas):
+            signature = unpack_signature(blob)
+            if signature is None: # missing or made with other PLAGIARISM_* settings
+                signature = minhash_signature(text)
+                repaired.append((log_id, kelas, pack_signature(signature)))
+            texts.append(text)
+            signatures.append(signature)
+        if repaired:
+            self.repo.save_idea_signatures(repaired)
+            log.info(f"PLAGIARISM: recomputed {len(repaired)} signatures for class {kelas}.")
+        index = ClassIdeaIndex(kelas)
+        index.extend(texts, signatures)
+        return index
+
+    def add(self, kelas, text, signature):
+        """Keeps an already loaded class in sync after an idea was logged (unloaded classes read it from the DB later)."""
+        with self._lock:
+            index = self._classes.get(kelas)
+        if index is not None:
+            index.add(text, signature)
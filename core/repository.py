@@ -0,0 +1,341 @@
+import os
+import sqlite3
+import threading
+from datetime import date
+import numpy as np
+from contextlib import contextmanager
+from core.logger import log
+from core.migrations import migrate
+from core.samples import normalize_sample_text
+from core.streaks import SchoolCalendar, next_streak
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, '../data/kebaikan.db')
+
+DEFAULT_CALENDAR = SchoolCalendar() # weekends only, system timezone (BrainLogic passes the configured one)
+
+# Face encodings are stored as packed little-endian float32 (128 * 4 = 512 bytes)
+ENCODING_DTYPE = np.dtype("<f4")
+ENCODING_DIM = 128
+
+
+def pack_encoding(encoding):
+    return np.asarray(encoding, dtype=ENCODING_DTYPE).reshape(-1).tobytes()
+
+
+class ConnectionPool:
+    """Long-lived SQLite connections: one shared writer + one reader per thread (WAL mode)."""
+
+    def __init__(self, db_path=DB_PATH, cached_statements=256, timeout=5.0):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        # Writes are serialized through a single connection. RLock + depth counter
+        # so a transaction() opened inside another one joins the outer transaction.
+        self._write_lock = threading.RLock()
+        self._tx_depth = 0
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+
+        # Readers: one connection per thread, never shared across threads
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        # isolation_level=None -> autocommit; transactions are opened explicitly.
+        # cached_statements keeps the prepared statements alive for the connection lifetime.
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def read(self):
+        """Yields the calling thread's reader connection."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("ConnectionPool sudah ditutup.")
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        yield conn
+
+    @contextmanager
+    def transaction(self):
+        """Yields the writer connection inside BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error)."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("ConnectionPool sudah ditutup.")
+        with self._write_lock:
+            if self._tx_depth > 0:
+                # Nested: piggyback on the outer transaction
+                self._tx_depth += 1
+                try:
+                    yield self._writer
+                finally:
+                    self._tx_depth -= 1
+                return
+
+            self._writer.execute("BEGIN IMMEDIATE")
+            self._tx_depth = 1
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK")
+                raise
+            else:
+                self._writer.execute("COMMIT")
+            finally:
+                self._tx_depth = 0
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except Exception as e:
+                    log.error(f"DB: Failed to close reader connection: {e}")
+            self._readers = []
+        with self._write_lock:
+            self._writer.close()
+
+
+class KebaikanRepository:
+    """All SQL used by BrainLogic lives here, on top of a shared ConnectionPool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    # --- Schema ---
+
+    def init_schema(self):
+        """Creates or upgrades the schema to the latest migration version."""
+        return migrate(self.pool)
+
+    # --- Siswa ---
+
+    def register_siswa(self, nama, kelas, encoding):
+        """Returns the new siswa id, or None if (nama, kelas) is already registered."""
+        with self.pool.transaction() as conn:
+            row = conn.execute("SELECT id FROM siswa WHERE nama=? AND kelas=?", (nama, kelas)).fetchone()
+            if row:
+                return None
+            cur = conn.execute("INSERT INTO siswa (nama, kelas, total_poin) VALUES (?, ?, 0)", (nama, kelas))
+            siswa_id = cur.lastrowid
+            self.add_encoding(siswa_id, encoding)
+            return siswa_id
+
+    def add_encoding(self, siswa_id, encoding, max_encodings=None):
+        """Stores one more face encoding for a siswa. Returns the encoding row id, or None if
+        the siswa already has max_encodings (checked in the same transaction as the insert)."""
+        with self.pool.transaction() as conn:
+            if max_encodings is not None:
+                count = conn.execute("SELECT COUNT(*) FROM siswa_encoding WHERE siswa_id=?", (siswa_id,)).fetchone()[0]
+                if count >= max_encodings:
+                    return None
+            cur = conn.execute("INSERT INTO siswa_encoding (siswa_id, encoding) VALUES (?, ?)",
+                               (siswa_id, pack_encoding(encoding)))
+            return cur.lastrowid
+
+    def add_points(self, nama, kelas, poin, ide, kategori_ide, signature=None, tanggal=None, calendar=None):
+        """Adds points, updates the streak, logs the idea (+ its MinHash signature, packed) and
+        updates the daily rollups. tanggal: the school-local date (default: calendar.today()).
+
+        Returns (siswa_id, new total_poin, log id).
+        """
+        calendar = calendar or DEFAULT_CALENDAR
+        day = tanggal or calendar.today()
+        tanggal = day.isoformat()
+        with self.pool.transaction() as conn:
+            data = conn.execute("SELECT id, total_poin, streak, last_active FROM siswa WHERE nama=? AND kelas=?", (nama, kelas)).fetchone()
+            if data:
+                siswa_id = data[0]
+                total_poin = data[1] + poin
+                streak, last_active = next_streak(data[2], data[3], day, calendar) # O(1), no log scan
+                conn.execute("UPDATE siswa SET total_poin=?, streak=?, last_active=? WHERE id=?",
+                             (total_poin, streak, last_active.isoformat(), siswa_id))
+            else:
+                total_poin = poin
+                cur = conn.execute("INSERT INTO siswa (nama, kelas, total_poin, streak, last_active) VALUES (?, ?, ?, 1, ?)",
+                                   (nama, kelas, poin, tanggal))
+                siswa_id = cur.lastrowid
+
+            cur = conn.execute("INSERT INTO log_aktivitas (siswa_id, nama_siswa, kelas, ide_kebaikan, skor_ai, kategori_ide) VALUES (?, ?, ?, ?, ?, ?)",
+                                (siswa_id, nama, kelas, ide, poin, kategori_ide))
+            log_id = cur.lastrowid
+            if signature is not None:
+                conn.execute("INSERT INTO ide_signature (log_id, kelas, signature) VALUES (?, ?, ?)", (log_id, kelas, signature))
+            conn.execute('''INSERT INTO poin_harian_siswa (tanggal, siswa_id, kelas, poin, jumlah_ide) VALUES (?, ?, ?, ?, 1)
+                            ON CONFLICT(tanggal, siswa_id) DO UPDATE SET poin = poin + excluded.poin, jumlah_ide = jumlah_ide + 1''',
+                         (tanggal, siswa_id, kelas, poin))
+            conn.execute('''INSERT INTO poin_harian_kelas (tanggal, kelas, poin, jumlah_ide) VALUES (?, ?, ?, 1)
+                            ON CONFLICT(tanggal, kelas) DO UPDATE SET poin = poin + excluded.poin, jumlah_ide = jumlah_ide + 1''',
+                         (tanggal, kelas, poin))
+            return siswa_id, total_poin, log_id
+
+    def get_streak(self, nama, kelas):
+        """(streak, last_active) as stored, or None if the siswa does not exist."""
+        with self.pool.read() as conn:
+            return conn.execute("SELECT streak, last_active FROM siswa WHERE nama=? AND kelas=?", (nama, kelas)).fetchone()
+
+    def get_leaderboard(self, limit=15, since=None, kelas=None):
+        """[(nama, kelas, poin)] best first. since=None: all-time total_poin; otherwise the points
+        earned from date `since` on, summed from the daily rollup (rows in the window, not the log)."""
+        with self.pool.read() as conn:
+            if since is None:
+                if kelas is None:
+                    return conn.execute("SELECT nama, kelas, total_poin FROM siswa ORDER BY total_poin DESC, id ASC LIMIT ?", (limit,)).fetchall()
+                return conn.execute("SELECT nama, kelas, total_poin FROM siswa WHERE kelas=? ORDER BY total_poin DESC, id ASC LIMIT ?",
+                                    (kelas, limit)).fetchall()
+            where, params = "r.tanggal >= ?", [since.isoformat()]
+            if kelas is not None:
+                where += " AND r.kelas = ?"
+                params.append(kelas)
+            return conn.execute(f'''SELECT s.nama, s.kelas, SUM(r.poin) AS poin FROM poin_harian_siswa r
+                                     JOIN siswa s ON s.id = r.siswa_id
+                                     WHERE {where} GROUP BY r.siswa_id ORDER BY poin DESC, r.siswa_id ASC LIMIT ?''',
+                                (*params, limit)).fetchall()
+
+    def get_class_ranking(self, limit=15, since=None):
+        """[(kelas, poin, jumlah_ide)] best first, from the daily per-class rollup (since=None: all days)."""
+        with self.pool.read() as conn:
+            return conn.execute('''SELECT kelas, SUM(poin) AS total, SUM(jumlah_ide) FROM poin_harian_kelas
+                                    WHERE tanggal >= ? GROUP BY kelas ORDER BY total DESC, kelas ASC LIMIT ?''',
+                                ((since or date.min).isoformat(), limit)).fetchall()
+
+    def get_top_siswa(self, limit):
+        """[(id, nama, kelas, total_poin)] best first, ties by id (LeaderboardService order)."""
+        with self.pool.read() as conn:
+            return conn.execute("SELECT id, nama, kelas, total_poin FROM siswa ORDER BY total_poin DESC, id ASC LIMIT ?",
+                                (limit,)).fetchall()
+
+    def load_face_matrix(self):
+        """Returns (users, matrix, owners).
+
+        users: {siswa_id: {"id", "nama", "kelas", "poin"}}
+        matrix: (n, 128) float32, one contiguous buffer holding every stored encoding
+        owners: (n,) siswa id of each matrix row
+        """
+        with self.pool.read() as conn:
+            rows = conn.execute("SELECT siswa_id, encoding FROM siswa_encoding ORDER BY id").fetchall()
+            user_rows = conn.execute("SELECT id, nama, kelas, total_poin FROM siswa "
+                                     "WHERE id IN (SELECT siswa_id FROM siswa_encoding)").fetchall()
+
+        users = {r[0]: {"id": r[0], "nama": r[1], "kelas": r[2], "poin": r[3]} for r in user_rows}
+        row_size = ENCODING_DIM * ENCODING_DTYPE.itemsize
+        blobs, owners = [], []
+        for siswa_id, blob in rows:
+            if len(blob) != row_size:
+                log.error(f"DB: Skipping malformed encoding ({len(blob)} bytes) for siswa id {siswa_id}")
+                continue
+            blobs.append(blob)
+            owners.append(siswa_id)
+
+        # One join + frombuffer: no per-row parsing and no per-row arrays
+        matrix = np.frombuffer(b"".join(blobs), dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIM)
+        return users, matrix, np.asarray(owners, dtype=np.int64)
+
+    def get_ideas_by_siswa(self, nama, kelas):
+        with self.pool.read() as conn:
+            rows = conn.execute("SELECT ide_kebaikan FROM log_aktivitas WHERE nama_siswa=? AND kelas=? ORDER BY waktu ASC",
+                                (nama, kelas)).fetchall()
+        return [row[0] for row in rows]
+
+    # --- Plagiarism Index ---
+
+    def load_idea_signatures(self, kelas):
+        """[(log_id, ide, signature BLOB or None)] of every idea logged in a class, oldest first."""
+        with self.pool.read() as conn:
+            return conn.execute('''SELECT l.id, l.ide_kebaikan, s.signature FROM log_aktivitas l
+                                    LEFT JOIN ide_signature s ON s.log_id = l.id
+                                    WHERE l.kelas = ? AND l.ide_kebaikan IS NOT NULL ORDER BY l.id''', (kelas,)).fetchall()
+
+    def save_idea_signatures(self, rows):
+        """rows: [(log_id, kelas, signature BLOB)], replacing stored signatures."""
+        with self.pool.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO ide_signature (log_id, kelas, signature) VALUES (?, ?, ?)", rows)
+
+    # --- Learned / Rejected Samples ---
+
+    def add_learned_sample(self, text, clean_text, target_level, quality):
+        """Returns the new learned_sample id, or None if the normalized text is already stored."""
+        with self.pool.transaction() as conn:
+            cursor = conn.execute('''INSERT OR IGNORE INTO learned_sample (text, text_norm, clean_text, target_level, quality)
+                                     VALUES (?, ?, ?, ?, ?)''',
+                                  (text, normalize_sample_text(text), clean_text or None, target_level, quality))
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def add_learned_samples(self, rows):
+        """rows: (text, clean_text or None, target_level, quality). A text whose normalized form
+        is already stored is skipped. Returns how many rows were added."""
+        with self.pool.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany('''INSERT OR IGNORE INTO learned_sample (text, text_norm, clean_text, target_level, quality)
+                                VALUES (?, ?, ?, ?, ?)''',
+                             ((text, normalize_sample_text(text), clean or None, level, quality) for text, clean, level, quality in rows))
+            return conn.total_changes - before
+
+    def add_rejected_samples(self, rows):
+        """rows: (timestamp, text, reason). A repeat of a stored (text, reason) only bumps jumlah / last_seen."""
+        with self.pool.transaction() as conn:
+            conn.executemany('''INSERT INTO rejected_sample (text, text_norm, reason, first_seen, last_seen)
+                                VALUES (?, ?, ?, ?, ?)
+                                ON CONFLICT(text_norm, reason) DO UPDATE SET
+                                    jumlah = jumlah + 1,
+                                    first_seen = MIN(first_seen, excluded.first_seen),
+                                    last_seen = MAX(last_seen, excluded.last_seen)''',
+                             ((text, normalize_sample_text(text), reason, ts, ts) for ts, text, reason in rows))
+
+    def max_learned_sample_id(self):
+        with self.pool.read() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM learned_sample").fetchone()[0]
+
+    def count_rejected_samples(self):
+        with self.pool.read() as conn:
+            return conn.execute("SELECT COUNT(*) FROM rejected_sample").fetchone()[0]
+
+    def iter_learned_samples(self, after_id=0, batch_size=1000):
+        """Streams (id, text, clean_text, target_level, quality, created_at) with id > after_id, in id order."""
+        with self.pool.read() as conn:
+            cursor = conn.execute('''SELECT id, text, clean_text, target_level, quality, created_at
+                                     FROM learned_sample WHERE id > ? ORDER BY id''', (after_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def iter_rejected_samples(self, batch_size=1000):
+        """Streams (last_seen, text, reason, jumlah, first_seen), most recent first."""
+        with self.pool.read() as conn:
+            cursor = conn.execute('''SELECT last_seen, text, reason, jumlah, first_seen
+                                     FROM rejected_sample ORDER BY last_seen DESC, id DESC''')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def reset_learned_clean_texts(self):
+        """Forgets every stored preprocessed form (e.g. after the slang/stopword lists changed)."""
+        with self.pool.transaction() as conn:
+            return conn.execute("UPDATE learned_sample SET clean_text = NULL WHERE clean_text IS NOT NULL").rowcount
+
+    def set_learned_clean_texts(self, rows):
+        """rows: [(clean_text, id)], filling in the stored preprocessed form."""
+        with self.pool.transaction() as conn:
+            conn.executemany("UPDATE learned_sample SET clean_text = ? WHERE id = ?", rows)
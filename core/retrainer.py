@@ -0,0 +1,254 @@
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+from core.brain import read_model
+from core.logger import log
+from core.constants import (
+    RETRAIN_CHECK_SECONDS, RETRAIN_INTERVAL_HOURS, RETRAIN_MIN_LEARNED,
+    RETRAIN_HOLDOUT_SHARE, RETRAIN_MAX_ACCURACY_DROP
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PREVIOUS_MODEL_PATH = os.path.join(BASE_DIR, 'brain_model.prev') # bundle directory
+
+
+def _holdout_mask(clean_texts, share):
+    """Stable split by text hash: identical texts always land on the same side."""
+    buckets = np.fromiter((zlib.crc32(t.encode('utf-8')) % 1000 for t in clean_texts), dtype=np.int64, count=len(clean_texts))
+    return buckets < int(share * 1000)
+
+
+def _accuracy(model, df):
+    vectorizer, knn_level, knn_quality = model
+    X = vectorizer.transform(df['clean_text'])
+    return {
+        "level": float(np.mean(knn_level.predict(X) == df['target_level'].to_numpy())),
+        "quality": float(np.mean(knn_quality.predict(X) == df['quality'].to_numpy())),
+        "holdout_rows": int(len(df)),
+    }
+
+
+def train_and_validate(holdout_share, baseline, max_drop, db_path):
+    """Worker process: full training with holdout validation.
+
+    The candidate is fitted without the holdout rows and scored on them. Only when the
+    level accuracy is not more than `max_drop` below `baseline` (the live model's own
+    validation score; None = no score yet, accept) is the final model fitted on all rows.
+    There is no absolute floor: what is reachable depends on the data, so the candidate
+    only has to be as good as what is serving now.
+    Returns (accepted, reason, scores, bundle, new_stems) where bundle = (vectorizer,
+    knn_level, knn_quality, learned_rows) or None. The stem cache file is only read here:
+    new_stems goes back to the app, which owns data/stem_cache.json (two writers would
+    overwrite each other's cache).
+    """
+    from core.brain import load_training_frame, fill_clean_text, fit_model
+    from core.repository import ConnectionPool, KebaikanRepository
+    from core.text_pipeline import TextPreprocessor
+
+    preprocessor = TextPreprocessor()
+    db = ConnectionPool(db_path)
+    try:
+        repo = KebaikanRepository(db)
+        df, learned_rows = load_training_frame(repo)
+        df = fill_clean_text(df, preprocessor, repo, workers=1)
+    finally:
+        db.close()
+    new_stems = preprocessor.new_stems()
+
+    holdout = _holdout_mask(df['clean_text'].tolist(), holdout_share)
+    scores = _accuracy(fit_model(df[~holdout]), df[holdout]) if holdout.any() else {"level": 1.0, "quality": 1.0, "holdout_rows": 0}
+
+    if baseline is not None and scores["level"] < baseline - max_drop:
+        return False, f"level accuracy {scores['level']:.3f} dropped from {baseline:.3f}", scores, None, new_stems
+    return True, "ok", scores, (*fit_model(df), learned_rows), new_stems
+
+
+class RetrainService:
+    """Retrains the brain in a worker process and hot-swaps the result into the live BrainLogic.
+
+    A retrain runs when requested (BrainLogic asks once enough data was learned online), when
+    RETRAIN_MIN_LEARNED rows were learned since the last training, or every
+    RETRAIN_INTERVAL_HOURS. Submissions keep using the old model until the validated new one is
+    swapped in. The replaced model is kept in memory and in PREVIOUS_MODEL_PATH for rollback().
+    After a rejected candidate the next attempt waits for RETRAIN_MIN_LEARNED more learned rows
+    (or the interval), instead of retraining on the same data on every check.
+    """
+
+    def __init__(self, brain, check_seconds=RETRAIN_CHECK_SECONDS, interval_hours=RETRAIN_INTERVAL_HOURS,
+                 min_learned=RETRAIN_MIN_LEARNED, holdout_share=RETRAIN_HOLDOUT_SHARE,
+                 max_drop=RETRAIN_MAX_ACCURACY_DROP):
+        self.brain = brain
+        self.check_seconds = check_seconds
+        self.interval_seconds = interval_hours * 3600 if interval_hours else None
+        self.min_learned = min_learned
+        self.holdout_share = holdout_share
+        self.max_drop = max_drop
+
+        self.previous = None # exported bundle of the model that was replaced last
+        self.last_result = None # (accepted, reason, scores) of the last run
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._run_lock = threading.Lock()
+        self._executor = None # worker pool of the retrain in flight
+        self._executor_lock = threading.Lock()
+        self._thread = None
+        self._last_run = time.monotonic()
+        self._rejected_learned = None # brain._learned_since_train when the last candidate was rejected
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.brain.retrain_service = self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name="brain-retrainer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Cancels a retrain in flight and waits until nothing touches the brain any more.
+
+        After stop() returns no model is installed, so the brain can be closed right after.
+        """
+        self._stop_event.set()
+        self._wake.set()
+        self._cancel_worker()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._run_lock: # a retrain_now() called from elsewhere
+            pass
+        if self.brain.retrain_service is self:
+            self.brain.retrain_service = None
+
+    def _cancel_worker(self):
+        with self._executor_lock:
+            executor = self._executor
+        if executor is None:
+            return
+        log.info("RETRAIN: cancelling the retrain in flight.")
+        # ProcessPoolExecutor cannot cancel a running task: end its worker process instead,
+        # which fails the future (BrokenProcessPool) and lets the executor's exit hook return.
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def request(self):
+        """Asks for a retrain as soon as possible (non-blocking)."""
+        self._wake.set()
+
+    # --- Scheduling ---
+
+    def _due(self, requested=False):
+        learned = self.brain._learned_since_train
+        if self._rejected_learned is not None and learned >= self._rejected_learned:
+            # Back off: the same data as the rejected attempt would give the same result
+            learned -= self._rejected_learned
+            requested = False
+        if requested or learned >= self.min_learned:
+            return True
+        return self.interval_seconds is not None and time.monotonic() - self._last_run >= self.interval_seconds
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            requested = self._wake.wait(self.check_seconds)
+            self._wake.clear()
+            if self._stop_event.is_set():
+                break
+            if not self.brain.is_trained: # first training is still running in the app
+                continue
+            if self._due(requested):
+                try:
+                    self.retrain_now()
+                except Exception as e:
+                    log.error(f"RETRAIN: failed: {e}")
+
+    # --- Retrain / Swap ---
+
+    def retrain_now(self):
+        """Trains + validates in a worker process, then swaps. Returns True if the new model went live."""
+        with self._run_lock:
+            if self._stop_event.is_set():
+                return False
+            self._last_run = time.monotonic()
+            learned = self.brain._learned_since_train
+            baseline = self.brain.model_meta.get("validation", {}).get("level")
+            log.info("RETRAIN: training a new model in a worker process...")
+            start = time.perf_counter()
+            try:
+                accepted, reason, scores, bundle = self._train_in_worker(baseline)
+            except Exception:
+                if self._stop_event.is_set(): # cancelled by stop()
+                    return False
+                raise
+            if self._stop_event.is_set(): # stopped meanwhile: the brain may be closing
+                log.info("RETRAIN: service stopped, new model discarded.")
+                return False
+            self.last_result = (accepted, reason, scores)
+            seconds = time.perf_counter() - start
+
+            if not accepted:
+                self._rejected_learned = learned
+                log.warning(f"RETRAIN: new model rejected ({reason}), keeping the live model. [{seconds:.1f}s]")
+                return False
+            self._rejected_learned = None
+
+            vectorizer, knn_level, knn_quality, learned_rows = bundle
+            meta = {"trained_at": datetime.now().isoformat(timespec='seconds'), "validation": scores}
+            self._keep_previous()
+            self.brain.install_model(vectorizer, knn_level, knn_quality, learned_rows, meta)
+            log.info(f"RETRAIN: new model live ({knn_level.n_samples_fit_} rows, level acc {scores['level']:.3f}, "
+                     f"quality acc {scores['quality']:.3f}) [{seconds:.1f}s]")
+            return True
+
+    def _train_in_worker(self, baseline):
+        """(accepted, reason, scores, bundle) from train_and_validate in a worker process."""
+        pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) # no fork of the threaded app
+        with self._executor_lock:
+            if self._stop_event.is_set(): # stop() ran before there was a worker to cancel
+                pool.shutdown()
+                raise RuntimeError("retrain service stopped")
+            self._executor = pool
+        try:
+            *result, new_stems = pool.submit(
+                train_and_validate, self.holdout_share, baseline, self.max_drop,
+                self.brain.pool.db_path # the worker reads learned_sample itself
+            ).result()
+        finally:
+            with self._executor_lock:
+                self._executor = None
+            pool.shutdown(wait=True)
+        if self._stop_event.is_set():
+            return result
+        # The worker's stems go into the app's cache, the only writer of the cache file
+        self.brain.text_preprocessor.add_stems(new_stems)
+        self.brain.text_preprocessor.save_cache()
+        return result
+
+    def _keep_previous(self):
+        self.previous = self.brain.export_model()
+        try:
+            self.brain.save_model(PREVIOUS_MODEL_PATH, bundle=self.previous)
+        except Exception as e:
+            log.error(f"RETRAIN: could not save previous model: {e}")
+
+    def rollback(self):
+        """Puts the previously replaced model back live (the current one becomes the new 'previous')."""
+        with self._run_lock:
+            if self._stop_event.is_set():
+                return False
+            previous = self.previous
+            if previous is None and os.path.exists(PREVIOUS_MODEL_PATH):
+                previous = read_model(PREVIOUS_MODEL_PATH) # e.g. after an app restart
+            if previous is None or previous[3] is None:
+                log.warning("RETRAIN: no previous model to roll back to.")
+                return False
+            self._keep_previous()
+            self.brain.install_model(*previous)
+            log.info("RETRAIN: rolled back to the previous model.")
+            return True
@@ -0,0 +1,83 @@
+import csv
+import os
+import pandas as pd
+from core.logger import log
+
+# Learned / rejected samples live in SQLite (tables learned_sample / rejected_sample, see
+# migration 007). A model bundle's learned_rows is the highest learned_sample id inside it.
+
+
+def normalize_sample_text(text):
+    """Dedup key: lowercase, whitespace collapsed."""
+    return " ".join(str(text).lower().split())
+
+
+class RejectedSampleSink:
+    """WriteBehindJournal sink: rows (timestamp, text, reason) -> rejected_sample."""
+
+    def __init__(self, repo):
+        self.repo = repo
+
+    def write(self, rows):
+        self.repo.add_rejected_samples(rows) # one transaction per batch
+
+
+# --- CSV import / export ---
+
+def _read_csv(path, columns):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, on_bad_lines='warn')
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)} has no column(s) {missing}")
+    return df[(df['text'].str.strip() != "")]
+
+
+def import_learned_csv(repo, path, preprocessor=None):
+    """learned_data.csv -> learned_sample (duplicates by normalized text are skipped).
+    With a TextPreprocessor the preprocessed form is stored too, otherwise the next
+    training fills it in. Returns (rows read, rows added)."""
+    df = _read_csv(path, ['text', 'target_level', 'quality'])
+    if df is None or df.empty:
+        return 0, 0
+    df = df[(df['target_level'] != "") & (df['quality'] != "")]
+    texts = df['text'].tolist()
+    clean = preprocessor.preprocess_batch(texts) if preprocessor is not None else [None] * len(texts)
+    added = repo.add_learned_samples(zip(texts, clean, df['target_level'], df['quality']))
+    log.info(f"SAMPLES: imported {added} of {len(df)} learned rows from {os.path.basename(path)}.")
+    return len(df), added
+
+
+def import_rejected_csv(repo, path):
+    """rejected_data.csv -> rejected_sample (repeats are counted). Returns (rows read, distinct rows after import)."""
+    df = _read_csv(path, ['timestamp', 'text', 'reason'])
+    if df is None or df.empty:
+        return 0, repo.count_rejected_samples()
+    repo.add_rejected_samples(zip(df['timestamp'], df['text'], df['reason']))
+    log.info(f"SAMPLES: imported {len(df)} rejected rows from {os.path.basename(path)}.")
+    return len(df), repo.count_rejected_samples()
+
+
+def export_learned_csv(repo, path):
+    """learned_sample -> CSV for teachers (same columns as learned_data.csv + created_at). Returns rows written."""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['text', 'target_level', 'quality', 'created_at'])
+        for _, text, _, level, quality, created_at in repo.iter_learned_samples():
+            writer.writerow([text, level, quality, created_at])
+            count += 1
+    return count
+
+
+def export_rejected_csv(repo, path):
+    """rejected_sample -> CSV for teachers. Returns rows written."""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['last_seen', 'text', 'reason', 'jumlah', 'first_seen'])
+        for row in repo.iter_rejected_samples():
+            writer.writerow(row)
+            count += 1
+    return count
@@ -0,0 +1,103 @@
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from core.logger import log
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CALENDAR_PATH = os.path.join(BASE_DIR, '../data/school_calendar.json')
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+class SchoolCalendar:
+    """Which dates are school days, and what 'today' is in the school's timezone.
+
+    A streak only breaks when a school day is missed: weekends and holidays between two
+    submissions are skipped. Submitting on a non-school day still counts as an active day.
+    """
+
+    def __init__(self, timezone_name=None, weekend=("saturday", "sunday"), holidays=(), holiday_ranges=()):
+        self.timezone_name = timezone_name
+        self.tz = _load_timezone(timezone_name)
+        self.weekend = frozenset(WEEKDAYS.index(day.lower()) for day in weekend)
+        self.holidays = {date.fromisoformat(d) for d in holidays}
+        for start, end in holiday_ranges:
+            day, end = date.fromisoformat(start), date.fromisoformat(end)
+            while day <= end:
+                self.holidays.add(day)
+                day += timedelta(days=1)
+        if len(self.weekend) == 7:
+            raise ValueError("School calendar has no school days (every weekday is a weekend)")
+
+    @classmethod
+    def from_file(cls, path=CALENDAR_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get("timezone"), config.get("weekend", ("saturday", "sunday")),
+                   config.get("holidays", ()), config.get("holiday_ranges", ()))
+
+    def today(self):
+        return datetime.now(self.tz).date() if self.tz else date.today()
+
+    def local_date(self, utc_timestamp):
+        """School-local date of a log_aktivitas.waktu value (SQLite CURRENT_TIMESTAMP, UTC)."""
+        moment = datetime.fromisoformat(utc_timestamp).replace(tzinfo=timezone.utc)
+        return moment.astimezone(self.tz).date() if self.tz else moment.astimezone().date()
+
+    def is_school_day(self, day):
+        return day.weekday() not in self.weekend and day not in self.holidays
+
+    def previous_school_day(self, day):
+        """Last school day strictly before `day` (steps back over weekends / holidays only)."""
+        day -= timedelta(days=1)
+        while not self.is_school_day(day):
+            day -= timedelta(days=1)
+        return day
+
+
+def _load_timezone(name):
+    if not name:
+        return None
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception as e: # e.g. Windows without the tzdata package
+        log.warning(f"STREAK: timezone '{name}' not available ({e}), using the system timezone.")
+        return None
+
+
+def load_calendar(path=CALENDAR_PATH):
+    """Calendar from the config file, or weekends-only in the system timezone if it is missing/broken."""
+    if os.path.exists(path):
+        try:
+            return SchoolCalendar.from_file(path)
+        except Exception as e:
+            log.error(f"STREAK: could not read school calendar {path}: {e}")
+    return SchoolCalendar()
+
+
+def next_streak(streak, last_active, day, calendar):
+    """(streak, last_active) after a submission on `day`. O(1): only last_active is looked at.
+
+    Same day: unchanged. Nothing missed since last_active (it is on or after the previous
+    school day): +1. Otherwise the streak restarts at 1.
+    """
+    if last_active is None:
+        return 1, day
+    if not isinstance(last_active, date):
+        last_active = date.fromisoformat(last_active)
+    if day <= last_active: # same day (or the clock went back)
+        return max(streak or 0, 1), last_active
+    if last_active >= calendar.previous_school_day(day):
+        return (streak or 0) + 1, day
+    return 1, day
+
+
+def current_streak(streak, last_active, calendar, today=None):
+    """Streak as of today: 0 if a school day has been missed since last_active."""
+    if not streak or last_active is None:
+        return 0
+    if not isinstance(last_active, date):
+        last_active = date.fromisoformat(last_active)
+    today = today or calendar.today()
+    return streak if last_active >= calendar.previous_school_day(today) else 0
@@ -0,0 +1,71 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from core.logger import log
+from core.constants import UI_TASK_POLL_MS
+
+
+class UITaskRunner:
+    """Runs brain / database work off the Tk main thread and hands results back to it.
+
+    submit() returns a Future. Its on_done / on_error / on_progress callbacks are never called
+    from the worker: the worker only puts them on a queue, which the Tk thread drains with
+    master.after() while tasks are pending. One worker by default, so brain and database calls
+    still run one at a time, in submission order (e.g. add_points before the next check).
+    """
+
+    def __init__(self, master, workers=1, poll_ms=UI_TASK_POLL_MS):
+        self.master = master
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ui-task")
+        self._callbacks = queue.Queue()
+        self._pending = 0 # only touched on the Tk thread
+        self._polling = False
+        self._closed = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, **kwargs):
+        """Runs fn(*args, **kwargs) in the worker (call from the Tk thread). With on_progress,
+        fn also gets a `progress(value)` keyword it may call any number of times."""
+        if on_progress is not None:
+            kwargs["progress"] = lambda value: self._callbacks.put((on_progress, value))
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._pending += 1
+        future.add_done_callback(lambda f: self._callbacks.put((self._finish, (f, on_done, on_error))))
+        self._schedule_poll()
+        return future
+
+    def _finish(self, args):
+        future, on_done, on_error = args
+        self._pending -= 1
+        error = future.exception()
+        if error is None:
+            if on_done is not None:
+                on_done(future.result())
+        elif on_error is not None:
+            on_error(error)
+        else:
+            log.error(f"TASK: background task failed: {error!r}")
+
+    def _schedule_poll(self):
+        if not self._polling and not self._closed:
+            self._polling = True
+            self.master.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        while True:
+            try:
+                callback, value = self._callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(value)
+            except Exception as e:
+                log.error(f"TASK: callback failed: {e!r}")
+        if self._pending > 0:
+            self._schedule_poll()
+
+    def shutdown(self, wait=True):
+        """Stops accepting work; with wait=True queued tasks (e.g. pending writes) finish first.
+        Callbacks of tasks finishing after this point are dropped."""
+        self._closed = True
+        self._executor.shutdown(wait=wait)
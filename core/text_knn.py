@@ -0,0 +1,186 @@
+import numpy as np
+import scipy.sparse as sp
+
+TEXT_KNN_BACKENDS = ("sparse", "sklearn")
+
+
+def distance_weights(dist):
+    """KNeighborsClassifier(weights='distance') weighting: 1/d, and rows that contain an exact
+    match (d == 0) weight only the exact matches with 1.0."""
+    with np.errstate(divide="ignore"):
+        weights = 1.0 / dist
+    inf_mask = np.isinf(weights)
+    inf_row = inf_mask.any(axis=1)
+    weights[inf_row] = inf_mask[inf_row]
+    return weights
+
+
+def weighted_proba(neigh_codes, weights, n_classes):
+    """Per-class weight share for each query row (same as predict_proba)."""
+    proba = np.zeros((len(neigh_codes), n_classes))
+    rows = np.arange(len(neigh_codes))[:, None]
+    np.add.at(proba, (np.broadcast_to(rows, neigh_codes.shape), neigh_codes), weights)
+    totals = proba.sum(axis=1, keepdims=True)
+    totals[totals == 0.0] = 1.0
+    return proba / totals
+
+
+class CombinedTextPredictor:
+    """Level + quality + confidence from a single neighbour search.
+
+    knn_level and knn_quality are fitted on the same rows (see brain.fit_model and
+    BrainLogic._extend_knn), so the k nearest rows only need to be found once; both label
+    sets are then looked up for those rows. Results match calling knn_level.predict,
+    knn_quality.predict and knn_level.predict_proba separately.
+    """
+
+    def __init__(self, vectorizer, knn_level, knn_quality):
+        if knn_level.n_samples_fit_ != knn_quality.n_samples_fit_:
+            raise ValueError("knn_level and knn_quality were fitted on different rows")
+        self.vectorizer = vectorizer
+        self.knn_level = knn_level
+        self.knn_quality = knn_quality
+
+    def transform(self, clean_texts):
+        return self.vectorizer.transform(clean_texts)
+
+    def predict_vectors(self, X):
+        """Returns (levels, qualities, confidences) for already vectorized rows."""
+        dist, ind = self.knn_level.kneighbors(X)
+        weights = distance_weights(dist)
+        level_proba = weighted_proba(self.knn_level._y[ind], weights, len(self.knn_level.classes_))
+        quality_proba = weighted_proba(self.knn_quality._y[ind], weights, len(self.knn_quality.classes_))
+        levels = self.knn_level.classes_[level_proba.argmax(axis=1)]
+        qualities = self.knn_quality.classes_[quality_proba.argmax(axis=1)]
+        return levels, qualities, level_proba.max(axis=1)
+
+    def predict(self, clean_texts):
+        return self.predict_vectors(self.transform(clean_texts))
+
+
+def _l2_normalize(X):
+    X = sp.csr_matrix(X, dtype=np.float64)
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0.0] = 1.0
+    return sp.csr_matrix(sp.diags(1.0 / norms) @ X)
+
+
+class SparseKNNClassifier:
+    """Cosine KNN over sparse TF-IDF rows using an inverted index (term -> documents).
+
+    Drop-in for KNeighborsClassifier(metric='cosine', weights='distance'): fit / kneighbors /
+    predict / predict_proba, classes_, n_samples_fit_. Similarities are computed as a sparse
+    product with the transposed training matrix, so only documents that share at least one
+    term with the query are touched; cost follows the posting lists of the query terms, not
+    the corpus size. The top k come from argpartition over those candidates; equally distant
+    documents are ordered by training index, also at the k-th place. When fewer than k
+    documents share a term, the rest are filled with non-matching documents (distance 1.0)
+    in index order, like a brute-force search that breaks ties by index.
+
+    Rows added with extend() go to a small delta block that is searched next to the main
+    index (indices continue after the main rows); it is merged into the main index once it
+    grows past MAX_DELTA_ROWS. Normally the next full training (compaction) replaces the whole
+    classifier before that.
+    """
+
+    MAX_DELTA_ROWS = 2000
+
+    def __init__(self, n_neighbors=5):
+        self.n_neighbors = n_neighbors
+        self._delta_X = None
+
+    def get_params(self, deep=True):
+        return {"n_neighbors": self.n_neighbors}
+
+    def fit(self, X, y):
+        self._fit_X = _l2_normalize(X)
+        self._postings = self._fit_X.T.tocsr() # row t = documents containing term t
+        self.classes_, self._y = np.unique(np.asarray(y), return_inverse=True)
+        self.n_samples_fit_ = self._fit_X.shape[0]
+        return self
+
+    @classmethod
+    def from_arrays(cls, X, postings, codes, classes, n_neighbors=5):
+        """Rebuilds a fitted classifier from stored arrays (rows already L2-normalized, see model_store)."""
+        knn = cls(n_neighbors=n_neighbors)
+        knn._fit_X, knn._postings = X, postings
+        knn._y, knn.classes_ = np.asarray(codes, dtype=np.intp), np.asarray(classes)
+        knn.n_samples_fit_ = X.shape[0]
+        return knn
+
+    def extend(self, X_new, y_new):
+        """New classifier over the training rows + X_new; this one is left untouched (snapshots
+        in use keep working). Costs O(delta block), not O(corpus): the main index is shared."""
+        y_new = np.asarray(y_new, dtype=self.classes_.dtype)
+        if not np.isin(y_new, self.classes_).all():
+            # A class the model has never seen changes every code: refit over all rows
+            return type(self)(**self.get_params()).fit(sp.vstack([self.training_matrix(), X_new], format='csr'),
+                                                       np.concatenate([self.classes_[self._y], y_new]))
+        knn = type(self)(**self.get_params())
+        knn._fit_X, knn._postings, knn.classes_ = self._fit_X, self._postings, self.classes_
+        X_new = _l2_normalize(X_new)
+        knn._delta_X = X_new if self._delta_X is None else sp.vstack([self._delta_X, X_new], format='csr')
+        knn._y = np.concatenate([self._y, np.searchsorted(self.classes_, y_new)])
+        knn.n_samples_fit_ = self.n_samples_fit_ + X_new.shape[0]
+        if knn._delta_X.shape[0] > self.MAX_DELTA_ROWS:
+            knn._fit_X = knn.training_matrix()
+            knn._postings, knn._delta_X = knn._fit_X.T.tocsr(), None
+        return knn
+
+    def training_matrix(self):
+        """All training rows (main index + delta block), L2-normalized."""
+        if self._delta_X is None:
+            return self._fit_X
+        return sp.vstack([self._fit_X, self._delta_X], format='csr')
+
+    def _similarities(self, X):
+        X = _l2_normalize(X)
+        S = X @ self._postings # cosine similarity, candidates only
+        if self._delta_X is not None:
+            S = sp.hstack([S, X @ self._delta_X.T])
+        return S.tocsr()
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        k = min(n_neighbors or self.n_neighbors, self.n_samples_fit_)
+        S = self._similarities(X)
+        dist = np.empty((S.shape[0], k))
+        ind = np.empty((S.shape[0], k), dtype=np.intp)
+        for i in range(S.shape[0]):
+            cols = S.indices[S.indptr[i]:S.indptr[i + 1]]
+            sims = S.data[S.indptr[i]:S.indptr[i + 1]]
+            if len(cols) > k:
+                kth = -np.partition(-sims, k - 1)[k - 1]
+                top = sims >= kth # every document tied with the k-th, so the lowest indices win
+                cols, sims = cols[top], sims[top]
+            order = np.lexsort((cols, -sims))[:k]
+            cols, sims = cols[order], sims[order]
+            if len(cols) < k:
+                fill = np.setdiff1d(np.arange(min(self.n_samples_fit_, k + len(cols))), cols)[:k - len(cols)]
+                cols = np.concatenate([cols, fill])
+                sims = np.concatenate([sims, np.zeros(len(fill))])
+            ind[i] = cols
+            dist[i] = np.clip(1.0 - sims, 0.0, 2.0)
+        dist[dist < 1e-12] = 0.0 # rounding noise of identical rows: keep the exact-match rule working
+        return (dist, ind) if return_distance else ind
+
+    def predict_proba(self, X):
+        dist, ind = self.kneighbors(X)
+        return weighted_proba(self._y[ind], distance_weights(dist), len(self.classes_))
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def training_matrix(knn):
+    """Training rows of a fitted text classifier of either backend."""
+    return knn.training_matrix() if isinstance(knn, SparseKNNClassifier) else knn._fit_X
+
+
+def create_text_knn(backend="sparse", n_neighbors=5):
+    """Text classifier used by brain.fit_model (backend via TEXT_KNN_BACKEND)."""
+    if backend == "sparse":
+        return SparseKNNClassifier(n_neighbors=n_neighbors)
+    if backend == "sklearn":
+        from sklearn.neighbors import KNeighborsClassifier
+        return KNeighborsClassifier(n_neighbors=n_neighbors, metric='cosine', weights='distance')
+    raise ValueError(f"Unknown text KNN backend '{backend}', expected one of {TEXT_KNN_BACKENDS}")
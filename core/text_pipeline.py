@@ -0,0 +1,260 @@
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from Sastrawi.Stemmer.Filter.TextNormalizer import normalize_text
+from core.logger import log
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+import rules
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STEM_CACHE_PATH = os.path.join(BASE_DIR, '../data/stem_cache.json')
+
+# --- Process pool workers (preprocess_batch) ---
+_worker_stemmer = None
+
+
+def _init_stem_worker():
+    """Builds one Sastrawi stemmer per worker process (dictionary loading is the slow part)."""
+    global _worker_stemmer
+    from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
+    _worker_stemmer = StemmerFactory().create_stemmer()
+
+
+def _stem_chunk(words):
+    start = time.perf_counter()
+    stems = [_worker_stemmer.stem(word) for word in words]
+    return stems, time.perf_counter() - start
+
+
+class LRUCache:
+    """Small bounded LRU map (OrderedDict, most recently used last)."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def items(self):
+        return self._data.items()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TextPreprocessor:
+    """Slang normalization + Sastrawi stopword removal + stemming, memoized at two levels.
+
+    - Sentence cache: normalized text (lowercase, letters only, slang replaced) -> result.
+    - Word cache: word -> stem, bounded LRU persisted to `cache_path` between runs. When
+      every word of a sentence is cached the Sastrawi stemmer is not even created.
+
+    Output is identical to running the stopword remover and stemmer on the whole text.
+    """
+
+    def __init__(self, cache_path=STEM_CACHE_PATH, max_words=50000, max_sentences=10000):
+        self.cache_path = cache_path
+        self._stemmer = None
+        self._stopword_remover = None
+        self._lock = threading.Lock()
+
+        self.word_cache = LRUCache(max_words)
+        self.sentence_cache = LRUCache(max_sentences)
+        self._dirty = False
+        self._new_stems = {} # word -> stem computed by this instance (not loaded from disk)
+
+        # --- Stats ---
+        self.word_hits = 0
+        self.word_misses = 0
+        self.sentence_hits = 0
+        self.sentence_misses = 0
+        self.stem_seconds = 0.0 # time spent in the Sastrawi stemmer (cache misses only)
+        self.sentence_seconds = 0.0 # time spent preprocessing uncached sentences
+        self._seconds_per_stem = 0.0 # average stem cost measured in earlier runs
+
+        self.load_cache()
+
+    @property
+    def stemmer(self):
+        if self._stemmer is None:
+            print("⏳ Initializing Sastrawi Stemmer (Lazy Load)...")
+            from Sastrawi.Stemmer.StemmerFactory import StemmerFactory
+            self._stemmer = StemmerFactory().create_stemmer()
+        return self._stemmer
+
+    @property
+    def stopword_remover(self):
+        if self._stopword_remover is None:
+            print("⏳ Initializing Sastrawi Stopword Remover (Lazy Load)...")
+            from Sastrawi.StopWordRemover.StopWordRemoverFactory import StopWordRemoverFactory
+            self._stopword_remover = StopWordRemoverFactory().create_stop_word_remover()
+        return self._stopword_remover
+
+    # --- Preprocessing ---
+
+    @staticmethod
+    def normalize(text):
+        """Lowercase, letters only, slang replaced. Also the sentence cache key."""
+        text = re.sub(r'[^a-z\s]', ' ', text.lower())
+        return " ".join(rules.SLANG_DICTIONARY.get(word, word) for word in text.split())
+
+    def preprocess(self, text):
+        if not isinstance(text, str):
+            return
+        key = self.normalize(text)
+        with self._lock:
+            cached = self.sentence_cache.get(key)
+            if cached is not None:
+                self.sentence_hits += 1
+                return cached
+            self.sentence_misses += 1
+
+            start = time.perf_counter()
+            text = self.stopword_remover.remove(key)
+            result = " ".join(self._stem_word(word) for word in normalize_text(text).split(' '))
+            self.sentence_seconds += time.perf_counter() - start
+
+            self.sentence_cache.put(key, result)
+            return result
+
+    def preprocess_batch(self, texts, workers=None, min_parallel_words=200):
+        """preprocess() for many texts; uncached words are stemmed in a process pool.
+
+        Texts are reduced to their distinct, not yet cached words first, so every word is
+        stemmed once no matter how often it occurs. The words are split over `workers`
+        processes (default: all cores), each with its own stemmer. Results come back in
+        input order and are identical to calling preprocess() on each text.
+        """
+        workers = workers or os.cpu_count() or 1
+        keys = [self.normalize(t) if isinstance(t, str) else None for t in texts]
+
+        with self._lock:
+            pending = {}
+            for key in keys:
+                if key is None or key in pending or self.sentence_cache.get(key) is not None:
+                    continue
+                pending[key] = normalize_text(self.stopword_remover.remove(key)).split(' ')
+            missing = sorted({w for words in pending.values() for w in words if self.word_cache.get(w) is None})
+
+        if workers > 1 and len(missing) >= min_parallel_words:
+            self._stem_parallel(missing, workers)
+
+        return [self.preprocess(t) if key is not None else None for t, key in zip(texts, keys)]
+
+    def _stem_parallel(self, words, workers):
+        chunks = [words[i::workers] for i in range(workers)] # similar mix of word lengths per chunk
+        log.info(f"Stemming {len(words)} new words in {workers} processes...")
+        # spawn, not fork: the caller may be a multithreaded app holding locks (logging, SQLite, ...)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_stem_worker,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_stem_chunk, chunks))
+        with self._lock:
+            for chunk, (stems, seconds) in zip(chunks, results):
+                for word, stem in zip(chunk, stems):
+                    self.word_cache.put(word, stem)
+                    self._new_stems[word] = stem
+                self.word_misses += len(chunk)
+                self.stem_seconds += seconds
+            self._dirty = True
+
+    def _stem_word(self, word):
+        stem = self.word_cache.get(word)
+        if stem is not None:
+            self.word_hits += 1
+            return stem
+        self.word_misses += 1
+        start = time.perf_counter()
+        stem = self.stemmer.stem(word)
+        self.stem_seconds += time.perf_counter() - start
+        self.word_cache.put(word, stem)
+        self._new_stems[word] = stem
+        self._dirty = True
+        return stem
+
+    def new_stems(self):
+        """Stems computed by this instance, e.g. to hand a worker process's work back to the app."""
+        with self._lock:
+            return dict(self._new_stems)
+
+    def add_stems(self, stems):
+        """Merges stems computed elsewhere into the word cache (saved with the next save_cache)."""
+        with self._lock:
+            for word, stem in stems.items():
+                self.word_cache.put(word, stem)
+            self._dirty = self._dirty or bool(stems)
+
+    # --- Persistence ---
+
+    def load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for word, stem in data["stems"].items():
+                self.word_cache.put(word, stem)
+            self._seconds_per_stem = data.get("seconds_per_stem", 0.0)
+            log.info(f"Stem cache loaded: {len(self.word_cache)} words.")
+        except Exception as e:
+            log.error(f"Stem cache unreadable, starting empty. Error: {e}")
+
+    def save_cache(self):
+        """Writes the word cache if it changed (atomic replace)."""
+        if not self.cache_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = {"seconds_per_stem": self._stem_cost(), "stems": dict(self.word_cache.items())}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            self._dirty = True
+            log.error(f"Failed to save stem cache: {e}")
+
+    # --- Stats ---
+
+    def _stem_cost(self):
+        return self.stem_seconds / self.word_misses if self.word_misses else self._seconds_per_stem
+
+    def stats(self):
+        word_total = self.word_hits + self.word_misses
+        sentence_total = self.sentence_hits + self.sentence_misses
+        per_word = self._stem_cost()
+        per_sentence = self.sentence_seconds / self.sentence_misses if self.sentence_misses else 0.0
+        return {
+            "word_hit_rate": self.word_hits / word_total if word_total else 0.0,
+            "sentence_hit_rate": self.sentence_hits / sentence_total if sentence_total else 0.0,
+            "cached_words": len(self.word_cache),
+            "cached_sentences": len(self.sentence_cache),
+            # Estimate vs. uncached stemming: every hit would have cost the average miss
+            "seconds_saved": self.word_hits * per_word + self.sentence_hits * per_sentence,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"Preprocess cache: words {s['word_hit_rate']:.0%} hit ({s['cached_words']} cached), "
+                f"sentences {s['sentence_hit_rate']:.0%} hit, ~{s['seconds_saved']:.2f}s saved")
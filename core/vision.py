@@ -2,10 +2,18 @@ import cv2
 import dlib
 import numpy as np
 import os
-import json
+import threading
+import time
 import face_recognition # Tetap butuh ini utk encoding login awal
-from sklearn.neighbors import KDTree # Optimalisasi pencarian wajah
+from core.face_index import create_face_index # Optimalisasi pencarian wajah (backend via config)
+from core.frame_controller import AdaptiveFrameController
 from core.logger import log # Import log
+from core.constants import (
+    FACE_INDEX_BACKEND, FACE_INDEX_IVF_NPROBE, FACE_INDEX_IVF_MIN_TRAIN_SIZE, FACE_MATCH_PER_IDENTITY,
+    FACE_MAX_ENCODINGS_PER_USER, FACE_AUTO_ENROLL_DISTANCE, FACE_AUTO_ENROLL_MIN_NOVELTY,
+    VISION_ADAPTIVE, ADAPTIVE_TARGET_FPS, ADAPTIVE_IDLE_RESIZE, ADAPTIVE_ACTIVE_RESIZE,
+    ADAPTIVE_MAX_SKIP, ENCODE_RESIZE, FACE_TRACKING, TRACKER_REDETECT_INTERVAL, TRACKER_MIN_PSR
+)
 
 class VisionSystem:
     def __init__(self):
@@ -19,10 +27,6 @@ class VisionSystem:
         self.detector = dlib.get_frontal_face_detector()
         self.predictor = dlib.shape_predictor(model_path)
 
-        self.memory_users = []
-        self.memory_encodings = []
-        self.face_tree = None # KDTree index
-        
         # --- Thresholds ---
         self.ZONE_GREEN = 0.48  # Diperketat dari 0.55 (Standar face_recognition 0.6 itu longgar)
         self.ZONE_YELLOW = 0.60
@@ -30,11 +34,37 @@ class VisionSystem:
         self.MOUTH_AR_THRESHOLD = 0.5 # Mouth Aspect Ratio
         self.EYE_AR_THRESHOLD = 0.23 # Eye Aspect Ratio for blink
 
+        # --- Face Memory ---
+        self.users_by_id = {}
+        self.row_owner = np.empty(0, dtype=np.int32) # index row -> siswa id (-1 = removed)
+        self.encoding_counts = {} # siswa id -> stored encodings
+        self._max_encodings_per_user = 1
+        index_options = {}
+        if FACE_INDEX_BACKEND == "ivf":
+            # ANN for huge enrollments; GREEN candidates are re-ranked exactly
+            index_options = {"nprobe": FACE_INDEX_IVF_NPROBE, "rerank_below": self.ZONE_GREEN,
+                             "min_train_size": FACE_INDEX_IVF_MIN_TRAIN_SIZE}
+        self.face_index = create_face_index(FACE_INDEX_BACKEND, **index_options)
+        self._memory_lock = threading.Lock() # keeps row_owner aligned with index rows
+
         # --- Frame Processing Settings ---
         self.frame_count = 0
-        self.SKIP_FRAMES = 2 
-        self.RESIZE_FACTOR = 0.50 
-        
+        self.SKIP_FRAMES = 2
+        self.RESIZE_FACTOR = 0.50
+        self.ENCODE_RESIZE = ENCODE_RESIZE # encoding quality must not drop with the detection resize
+        self._frames_to_skip = 0
+        self.frame_controller = AdaptiveFrameController(
+            target_fps=ADAPTIVE_TARGET_FPS, idle_resize=ADAPTIVE_IDLE_RESIZE,
+            active_resize=ADAPTIVE_ACTIVE_RESIZE, max_skip=ADAPTIVE_MAX_SKIP
+        ) if VISION_ADAPTIVE else None
+
+        # --- Face Tracking (detect-then-track) ---
+        self.tracker = None # dlib.correlation_tracker on the small frame
+        self.tracker_resize = None # RESIZE_FACTOR the tracker was started with
+        self.frames_since_detection = 0
+        self.TRACKER_REDETECT_INTERVAL = TRACKER_REDETECT_INTERVAL
+        self.TRACKER_MIN_PSR = TRACKER_MIN_PSR
+
         # --- Smile Score Stabilizer ---
         self.avg_smile_score = 0.0
         self.smile_alpha = 0.3
@@ -58,34 +88,61 @@ class VisionSystem:
             "encoding": None
         }
         
-    def load_memory(self, users_data):
-        self.memory_users = []
-        self.memory_encodings = []
-        for user in users_data:
-            if user['encoding']:
-                try:
-                    user_encodings_from_db = user["encoding"]
-
-                    if isinstance(user_encodings_from_db[0], list): # If it's a list of lists (multiple encodings)
-                        for enc in user_encodings_from_db:
-                            self.memory_encodings.append(np.array(enc))
-                            self.memory_users.append(user) # Append user for each encoding
-                    else: # If it's a single list (old format or first encoding)
-                        self.memory_encodings.append(np.array(user_encodings_from_db))
-                        self.memory_users.append(user)
-                except Exception as e: 
-                    log.error(f"Error loading encoding for user {user.get('nama', 'Unknown')}, ID: {user.get('id', 'N/A')}. Error: {e}")
-        
-        # Build KDTree Index
-        if self.memory_encodings:
-            try:
-                log.info(f"🌳 Building KDTree for {len(self.memory_encodings)} face encodings...")
-                self.face_tree = KDTree(self.memory_encodings, metric='euclidean')
-            except Exception as e:
-                log.error(f"Failed to build KDTree: {e}")
-                self.face_tree = None
-        else:
-            self.face_tree = None
+    def load_memory(self, users, encodings, owners):
+        """users: {siswa_id: user_dict}, encodings: (n, 128) float32 matrix, owners: siswa id per row."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+        owners = np.asarray(owners, dtype=np.int32).reshape(-1)
+        known = np.isin(owners, np.fromiter(users.keys(), dtype=np.int32, count=len(users)))
+        if not known.all():
+            log.error(f"{int((~known).sum())} encoding rows without user data, skipped.")
+            encodings, owners = encodings[known], owners[known]
+
+        ids, counts = np.unique(owners, return_counts=True)
+        log.info(f"🌳 Building face index for {len(encodings)} face encodings ({len(ids)} students)...")
+        with self._memory_lock:
+            self.face_index.build(encodings)
+            self.row_owner = owners.copy() # row -> siswa id (-1 = removed)
+            self.users_by_id = {int(i): users[int(i)] for i in ids}
+            self.encoding_counts = dict(zip(ids.tolist(), counts.tolist()))
+            self._max_encodings_per_user = int(counts.max()) if len(counts) else 1
+
+    def add_identity(self, user, encoding):
+        """Adds one encoding for a (new or existing) user without rebuilding the index."""
+        with self._memory_lock:
+            rows = self.face_index.add(encoding)
+            end = int(rows[-1]) + 1
+            if end > len(self.row_owner):
+                grown = np.full(max(end, 2 * len(self.row_owner), 16), -1, dtype=np.int32)
+                grown[:len(self.row_owner)] = self.row_owner
+                self.row_owner = grown
+            self.row_owner[rows] = user['id']
+            self.users_by_id[user['id']] = user
+            count = self.encoding_counts.get(user['id'], 0) + len(rows)
+            self.encoding_counts[user['id']] = count
+            self._max_encodings_per_user = max(self._max_encodings_per_user, count)
+        log.info(f"VISION: Identity added for {user.get('nama', 'N/A')} ({count} encodings, {len(self.face_index)} in memory).")
+
+    def remove_identity(self, user_id):
+        """Drops every encoding of a user from the index."""
+        with self._memory_lock:
+            rows = np.flatnonzero(self.row_owner == user_id)
+            self.face_index.remove(rows)
+            self.row_owner[rows] = -1
+            self.users_by_id.pop(user_id, None)
+            self.encoding_counts.pop(user_id, None)
+        return len(rows)
+
+    def should_auto_enroll(self, user, distance):
+        """True if a confident GREEN login should be stored as an extra encoding for this user.
+
+        Only near-certain matches (< FACE_AUTO_ENROLL_DISTANCE) that still differ enough from the
+        user's closest stored encoding (>= FACE_AUTO_ENROLL_MIN_NOVELTY) are kept, up to a cap.
+        """
+        if user is None or distance is None:
+            return False
+        if self.encoding_counts.get(user['id'], 0) >= FACE_MAX_ENCODINGS_PER_USER:
+            return False
+        return FACE_AUTO_ENROLL_MIN_NOVELTY <= distance < FACE_AUTO_ENROLL_DISTANCE
 
     # --- Geometric Expression Calculation ---
 
@@ -140,27 +197,44 @@ class VisionSystem:
     # --- Face Recognition ---
 
     def identify_face_zones(self, unknown_encoding):
-        """Matches a face encoding using Fast KDTree Search."""
-        if self.face_tree is None or not self.memory_encodings:
-            return "RED", None, 1.0
-        
-        # Query KDTree for nearest neighbors
-        # k=2 to allow ambiguity check (compare best match vs runner-up)
-        k_neighbors = min(len(self.memory_users), 2)
-        
-        # reshape(1, -1) because query expects 2D array
-        dists, indices = self.face_tree.query([unknown_encoding], k=k_neighbors)
-        
-        min_dist = dists[0][0]
-        best_match_idx = indices[0][0]
-        candidate = self.memory_users[best_match_idx]
+        """Matches a face encoding against the face index (backend: FACE_INDEX_BACKEND)."""
+        return self.identify_face_zones_batch([unknown_encoding])[0]
+
+    def identify_face_zones_batch(self, unknown_encodings):
+        """Same as identify_face_zones for several encodings, with a single index query."""
+        with self._memory_lock:
+            if not len(self.face_index):
+                return [("RED", None, 1.0) for _ in unknown_encodings]
+            # k=2 to allow ambiguity check (compare best match vs runner-up). In per-identity
+            # mode fetch enough rows that the runner-up is guaranteed to be another student.
+            k = self._max_encodings_per_user + 1 if FACE_MATCH_PER_IDENTITY else 2
+            results = self.face_index.query_batch(unknown_encodings, k=k)
+            neighbors = [(dists, self.row_owner[rows]) for dists, rows in results]
+
+        zones = []
+        for dists, owners in neighbors:
+            if FACE_MATCH_PER_IDENTITY:
+                dists, owners = self._best_per_identity(dists, owners)
+            zones.append(self._zone_from_neighbors(dists[:2], owners[:2]))
+        return zones
+
+    @staticmethod
+    def _best_per_identity(dists, owners):
+        """Keeps the closest row of each distinct student (input is sorted by distance)."""
+        _, first = np.unique(owners, return_index=True)
+        first.sort()
+        return dists[first], owners[first]
+
+    def _zone_from_neighbors(self, dists, owners):
+        k_neighbors = len(owners)
+        min_dist = float(dists[0])
+        candidate = self.users_by_id[int(owners[0])]
         
         # --- AMBIGUITY CHECK ---
         # If we found at least 2 neighbors
         if k_neighbors > 1:
-            second_dist = dists[0][1]
-            second_idx = indices[0][1]
-            candidate_2 = self.memory_users[second_idx]
+            second_dist = float(dists[1])
+            candidate_2 = self.users_by_id[int(owners[1])]
             
             # If the gap between #1 and #2 is very small (< 0.05) AND they are different people
             if (second_dist - min_dist < 0.05) and (candidate['id'] != candidate_2['id']):
@@ -178,35 +252,77 @@ class VisionSystem:
 
     # --- Main Processing Function ---
 
+    def skip_frame(self):
+        """Counts one camera frame against SKIP_FRAMES. True = leave it out (the last result stays valid).
+
+        The frame controller is ticked for every frame, so it measures the camera rate in
+        both the serial path and the pipeline. After analyzing a frame the caller resets
+        _frames_to_skip to SKIP_FRAMES.
+        """
+        skipped = self._frames_to_skip > 0
+        if self.frame_controller is not None:
+            self.frame_controller.tick(skipped)
+        if skipped:
+            self._frames_to_skip -= 1
+        return skipped
+
     def process_frame(self, frame):
+        """Serial path: detection, landmarks, encoding and matching in the calling thread."""
         self.frame_count += 1
-        if self.frame_count % (self.SKIP_FRAMES + 1) != 0:
+        if self.skip_frame():
             return self.last_result
 
+        result, encode_job = self.analyze_frame(frame)
+        if encode_job is not None:
+            try:
+                start = time.perf_counter()
+                encoding = encode_face(*encode_job)
+                if self.frame_controller is not None:
+                    self.frame_controller.record("encode", time.perf_counter() - start)
+                if encoding is not None:
+                    self.apply_encoding(result, encoding)
+            except Exception as e:
+                print(f"Encoding Error: {e}")
+        self._frames_to_skip = self.SKIP_FRAMES # may have been changed by the frame controller
+        return result
+
+    def analyze_frame(self, frame):
+        """Stage 1: detection, landmarks, expressions and identity locking (no encoding).
+
+        Returns (result, encode_job). encode_job is None when the locked identity can be
+        reused, otherwise (rgb_small, css_rect) to be passed to encode_face().
+        """
+        resize = self.RESIZE_FACTOR # read once, the frame controller may change it below
+
         # --- Pre-processing ---
-        small_frame = cv2.resize(frame, (0, 0), fx=self.RESIZE_FACTOR, fy=self.RESIZE_FACTOR)
+        start = time.perf_counter()
+        small_frame = cv2.resize(frame, (0, 0), fx=resize, fy=resize)
         gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
-        
+
         # --- Result Initialization ---
         result = self.last_result.copy()
         result["face_detected"] = False # Reset detection for this frame
+        encode_job = None
 
-        # --- Face Detection ---
-        rects = self.detector(gray, 0)
+        # --- Face Detection (or tracking between detections) ---
+        rect = self._locate_face(gray, resize)
+        if self.frame_controller is not None:
+            self.frame_controller.record("detect", time.perf_counter() - start, resize=resize)
 
-        if len(rects) > 0:
+        if rect is not None:
             result["face_detected"] = True
-            rect = max(rects, key=lambda r: r.width() * r.height())
-            
-            # --- Landmark Prediction (on HD frame) ---
-            scale = 1 / self.RESIZE_FACTOR
+
+            # --- Landmark Prediction (on HD frame, face ROI only) ---
+            start = time.perf_counter()
+            scale = 1 / resize
             hd_rect = dlib.rectangle(
                 int(rect.left() * scale), int(rect.top() * scale),
                 int(rect.right() * scale), int(rect.bottom() * scale)
             )
-            gray_hd = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            shape = self.predictor(gray_hd, hd_rect)
-            
+            shape = self._predict_landmarks(frame, hd_rect)
+            if self.frame_controller is not None:
+                self.frame_controller.record("landmarks", time.perf_counter() - start)
+
             result["location"] = (hd_rect.top(), hd_rect.right(), hd_rect.bottom(), hd_rect.left())
 
             # --- Expression Analysis ---
@@ -222,15 +338,15 @@ class VisionSystem:
             result["smile_score"] = self.avg_smile_score
             
             # --- Optimization: Check if we need to re-encode (Identity Locking) ---
-            current_center = np.array([(rect.left() + rect.right()) // 2, (rect.top() + rect.bottom()) // 2])
+            current_center = np.array([(hd_rect.left() + hd_rect.right()) // 2, (hd_rect.top() + hd_rect.bottom()) // 2])
             should_encode = True
-            
+
             if self.last_result["user_data"] is not None and self.last_face_center is not None:
-                # Calculate movement distance (in small frame pixels)
+                # Calculate movement distance (in HD frame pixels, independent of RESIZE_FACTOR)
                 dist = np.linalg.norm(current_center - self.last_face_center)
-                
-                # If stable (moved < 20px) and checked recently, skip encoding
-                if dist < 20 and self.frames_since_identity_check < self.IDENTITY_CHECK_INTERVAL:
+
+                # If stable (moved < 40px) and checked recently, skip encoding
+                if dist < 40 and self.frames_since_identity_check < self.IDENTITY_CHECK_INTERVAL:
                     should_encode = False
                     self.frames_since_identity_check += 1
                 else:
@@ -239,22 +355,15 @@ class VisionSystem:
             self.last_face_center = current_center
 
             if should_encode:
-                # --- Face Encoding and Identification (Heavy) ---
-                css_rect = (int(rect.top()), int(rect.right()), int(rect.bottom()), int(rect.left()))
-                rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-                
-                try:
-                    encodings = face_recognition.face_encodings(rgb_small, [css_rect])
-                    if encodings:
-                        unknown_encoding = encodings[0]
-                        result["encoding"] = unknown_encoding 
-                        
-                        zone, user, dist = self.identify_face_zones(unknown_encoding)
-                        result["zone"] = zone
-                        result["user_data"] = user
-                        result["distance"] = dist
-                except Exception as e:
-                    print(f"Encoding Error: {e}")
+                # --- Face Encoding and Identification (Heavy) -> done by the caller ---
+                if resize == self.ENCODE_RESIZE:
+                    encode_frame, r = small_frame, 1.0
+                else:
+                    encode_frame = cv2.resize(frame, (0, 0), fx=self.ENCODE_RESIZE, fy=self.ENCODE_RESIZE)
+                    r = self.ENCODE_RESIZE / resize
+                css_rect = (int(rect.top() * r), int(rect.right() * r), int(rect.bottom() * r), int(rect.left() * r))
+                rgb_small = cv2.cvtColor(encode_frame, cv2.COLOR_BGR2RGB)
+                encode_job = (rgb_small, css_rect)
             else:
                 # Reuse previous identity
                 result["zone"] = self.last_result["zone"]
@@ -268,5 +377,79 @@ class VisionSystem:
             self.last_face_center = None # Reset tracker
             self.frames_since_identity_check = 0
 
+        if self.frame_controller is not None:
+            self.SKIP_FRAMES, self.RESIZE_FACTOR = self.frame_controller.update(
+                result["face_detected"], result["user_data"] is None
+            )
+
         self.last_result = result
-        return result
\ No newline at end of file
+        return result, encode_job
+
+    def _locate_face(self, gray, resize):
+        """Largest face rectangle in `gray` (small frame coordinates), or None.
+
+        Full HOG detection runs every TRACKER_REDETECT_INTERVAL processed frames, when the
+        correlation tracker loses the face (peak-to-sidelobe ratio below TRACKER_MIN_PSR)
+        or when the detection resize changed. In between only the tracker is updated.
+        """
+        if self.tracker is not None and self.tracker_resize == resize and self.frames_since_detection < self.TRACKER_REDETECT_INTERVAL:
+            psr = self.tracker.update(gray)
+            if psr >= self.TRACKER_MIN_PSR:
+                self.frames_since_detection += 1
+                pos = self.tracker.get_position()
+                height, width = gray.shape[:2]
+                rect = dlib.rectangle(
+                    max(0, int(pos.left())), max(0, int(pos.top())),
+                    min(width - 1, int(pos.right())), min(height - 1, int(pos.bottom()))
+                )
+                if rect.width() > 0 and rect.height() > 0:
+                    return rect
+
+        rects = self.detector(gray, 0)
+        if len(rects) == 0:
+            self.tracker = None
+            return None
+
+        rect = max(rects, key=lambda r: r.width() * r.height())
+        if FACE_TRACKING:
+            self.tracker = dlib.correlation_tracker()
+            self.tracker.start_track(gray, rect)
+            self.tracker_resize = resize
+            self.frames_since_detection = 0
+        return rect
+
+    def _predict_landmarks(self, frame, hd_rect, margin=0.25):
+        """68 landmarks for hd_rect; only the face region (plus margin) is converted to gray.
+
+        The returned points are relative to the crop, which is fine for the expression
+        ratios (they only use distances between points).
+        """
+        frame_h, frame_w = frame.shape[:2]
+        mx, my = int(hd_rect.width() * margin), int(hd_rect.height() * margin)
+        x0, y0 = max(0, hd_rect.left() - mx), max(0, hd_rect.top() - my)
+        x1, y1 = min(frame_w, hd_rect.right() + mx), min(frame_h, hd_rect.bottom() + my)
+        gray_roi = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        roi_rect = dlib.rectangle(hd_rect.left() - x0, hd_rect.top() - y0, hd_rect.right() - x0, hd_rect.bottom() - y0)
+        return self.predictor(gray_roi, roi_rect)
+
+    def apply_encoding(self, result, encoding):
+        """Stage 2: matches an encoding and stores the identity in `result`.
+
+        When `result` is no longer the latest one (encoding finished asynchronously) the
+        identity is carried over to the latest result too, so identity locking keeps working.
+        """
+        zone, user, dist = self.identify_face_zones(encoding)
+        identity = {"encoding": encoding, "zone": zone, "user_data": user, "distance": dist}
+        result.update(identity)
+        if self.last_result is not result and self.last_result["face_detected"]:
+            self.last_result = dict(self.last_result, **identity)
+        return result
+
+
+def encode_face(rgb_image, css_rect):
+    """128-d face encoding for one face location, None if dlib could not compute it.
+
+    Module-level so it can also run inside a worker process (see core.vision_pipeline).
+    """
+    encodings = face_recognition.face_encodings(rgb_image, [css_rect])
+    return encodings[0] if encodings else None
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from core.logger import log
+from core.vision import encode_face
+
+
+def _warm_up():
+    """Runs once per encoder process so dlib models are loaded before the first real job."""
+    import core.vision # noqa: F401  (imports face_recognition + dlib models)
+    return os.getpid()
+
+
+def _crop_for_encoding(rgb, css_rect, margin=0.5):
+    """Cuts the face (plus margin) out of the frame so less data crosses the process boundary."""
+    top, right, bottom, left = css_rect
+    h, w = bottom - top, right - left
+    y0, y1 = max(0, top - int(h * margin)), min(rgb.shape[0], bottom + int(h * margin))
+    x0, x1 = max(0, left - int(w * margin)), min(rgb.shape[1], right + int(w * margin))
+    crop = np.ascontiguousarray(rgb[y0:y1, x0:x1])
+    return crop, (top - y0, right - x0, bottom - y0, left - x0)
+
+
+def _put_latest(q, item):
+    """Bounded queue put that drops the oldest item instead of blocking."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class VisionPipeline:
+    """Staged camera processing: capture -> detect/landmark -> encode (process pool) -> match.
+
+    - Capture thread: reads and flips frames, publishes every frame for display together
+      with the newest vision result, so the UI never waits for the heavy stages.
+    - Detect thread: runs VisionSystem.analyze_frame on the newest frame only (a 1-slot
+      queue, older frames are dropped) and applies finished encodings (matching). It also
+      leaves out vision.SKIP_FRAMES frames after each analyzed one, so the adaptive frame
+      controller sets the processing rate here as in the serial path.
+    - Encoder: ProcessPoolExecutor running encode_face outside the GIL. At most
+      `max_inflight` jobs are queued; new jobs are dropped while it is saturated.
+    """
+
+    def __init__(self, vision, output_queue, encoder_workers=None, camera_index=0):
+        self.vision = vision
+        self.output_queue = output_queue
+        self.camera_index = camera_index
+        self.encoder_workers = encoder_workers or max(1, (os.cpu_count() or 2) - 2)
+        self.max_inflight = self.encoder_workers
+
+        self._detect_queue = queue.Queue(maxsize=1)
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._pool = None
+        self._latest_result = vision.last_result
+
+        # Stats (read by logs / debugging)
+        self.frames_captured = 0
+        self.frames_analyzed = 0
+        self.frames_skipped = 0
+        self.encodings_dropped = 0
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop_event.clear()
+        self._ensure_pool()
+        self._threads = [
+            threading.Thread(target=self._capture_worker, name="vision-capture", daemon=True),
+            threading.Thread(target=self._detect_worker, name="vision-detect", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        """Stops the threads; the encoder processes stay warm for the next wake-up."""
+        self._stop_event.set()
+        for t in self._threads:
+            if t.is_alive():
+                t.join(timeout=1.0)
+        self._threads = []
+        with self._detect_queue.mutex:
+            self._detect_queue.queue.clear()
+
+    def shutdown(self):
+        self.stop()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _ensure_pool(self):
+        if self._pool is not None:
+            return
+        try:
+            # spawn: forking this multithreaded process could copy a held lock into the child
+            self._pool = ProcessPoolExecutor(max_workers=self.encoder_workers, mp_context=multiprocessing.get_context("spawn"))
+            for _ in range(self.encoder_workers):
+                self._pool.submit(_warm_up)
+            log.info(f"🧵 Vision pipeline: {self.encoder_workers} encoder process(es) started.")
+        except Exception as e:
+            # No multiprocessing available: encode in the detect thread instead
+            log.error(f"Vision pipeline: process pool unavailable, encoding in-thread. Error: {e}")
+            self._pool = None
+
+    # --- Stage 1: Capture ---
+
+    def _capture_worker(self):
+        log.info("📷 Capture Thread: Started.")
+        cap = cv2.VideoCapture(self.camera_index)
+        if not cap.isOpened():
+            log.error("📷 Capture Thread: Failed to open camera.")
+            _put_latest(self.output_queue, "ERROR")
+            return
+
+        while not self._stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                _put_latest(self.output_queue, "ERROR")
+                break
+            frame = cv2.flip(frame, 1)
+            self.frames_captured += 1
+
+            _put_latest(self._detect_queue, frame)
+            # The UI draws on its frame, so it gets its own copy
+            _put_latest(self.output_queue, (frame.copy(), self._latest_result))
+
+        cap.release()
+        log.info("📷 Capture Thread: Stopped.")
+
+    # --- Stage 2 + 3: Detect / landmarks, then encode + match ---
+
+    def _detect_worker(self):
+        inflight = deque() # (result, future), oldest first
+
+        while not self._stop_event.is_set():
+            try:
+                frame = self._detect_queue.get(timeout=0.05)
+            except queue.Empty:
+                frame = None
+
+            if frame is not None and self.vision.skip_frame():
+                self.frames_skipped += 1
+                frame = None
+
+            if frame is not None:
+                result, encode_job = self.vision.analyze_frame(frame)
+                self.vision._frames_to_skip = self.vision.SKIP_FRAMES # may have been changed by the frame controller
+                self.frames_analyzed += 1
+
+                if encode_job is not None:
+                    if self._pool is None:
+                        self._encode_inline(result, encode_job)
+                    elif len(inflight) < self.max_inflight:
+                        crop, rect = _crop_for_encoding(*encode_job)
+                        inflight.append((result, self._pool.submit(encode_face, crop, rect)))
+                    else:
+                        self.encodings_dropped += 1 # encoder saturated: drop, a newer frame will follow
+
+            # Apply finished encodings in submission order
+            while inflight and inflight[0][1].done():
+                result, future = inflight.popleft()
+                try:
+                    encoding = future.result()
+                except Exception as e:
+                    log.error(f"Vision pipeline: encoder failed: {e}")
+                    continue
+                if encoding is not None:
+                    self.vision.apply_encoding(result, encoding)
+
+            self._latest_result = self.vision.last_result
+
+        for _, future in inflight:
+            future.cancel()
+
+    def _encode_inline(self, result, encode_job):
+        try:
+            encoding = encode_face(*encode_job)
+            if encoding is not None:
+                self.vision.apply_encoding(result, encoding)
+        except Exception as e:
+            print(f"Encoding Error: {e}")
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.leaderboard import LeaderboardService
+
+
+class FakeRepo:
+    """get_top_siswa over an in-memory {siswa_id: (nama, kelas, total_poin)}."""
+
+    def __init__(self, students):
+        self.students = dict(students)
+        self.reads = 0
+
+    def get_top_siswa(self, limit):
+        self.reads += 1
+        rows = sorted(self.students.items(), key=lambda item: (-item[1][2], item[0]))
+        return [(siswa_id, nama, kelas, poin) for siswa_id, (nama, kelas, poin) in rows[:limit]]
+
+
+class LeaderboardDiffTest(unittest.TestCase):
+    def setUp(self):
+        self.repo = FakeRepo({1: ("Ani", "7-A", 30), 2: ("Budi", "7-B", 20), 3: ("Citra", "7-A", 10),
+                              4: ("Dewi", "8-A", 5)})
+        self.board = LeaderboardService(self.repo, size=3)
+
+    def update(self, siswa_id, poin):
+        nama, kelas, _ = self.repo.students[siswa_id]
+        self.repo.students[siswa_id] = (nama, kelas, poin)
+        return self.board.update(siswa_id, nama, kelas, poin)
+
+    def test_score_change_in_place(self):
+        self.assertEqual(self.update(2, 25), [(1, ("Budi", "7-B", 25))])
+
+    def test_overtaking_relabels_both_rows(self):
+        self.assertEqual(self.update(3, 35), [(0, ("Citra", "7-A", 35)), (1, ("Ani", "7-A", 30)), (2, ("Budi", "7-B", 20))])
+
+    def test_tie_keeps_the_older_student_first(self):
+        self.assertEqual(self.update(3, 20), [(2, ("Citra", "7-A", 20))])
+
+    def test_entering_the_top_pushes_out_the_last(self):
+        self.assertEqual(self.update(4, 15), [(2, ("Dewi", "8-A", 15))])
+        self.assertEqual(self.update(3, 12), []) # still outside the top 3
+        self.assertEqual(self.repo.reads, 1) # no re-read from the database
+
+    def test_new_student_fills_a_short_board(self):
+        board = LeaderboardService(FakeRepo({1: ("Ani", "7-A", 30)}), size=3)
+        self.assertEqual(board.update(5, "Eka", "9-C", 0), [(1, ("Eka", "9-C", 0))])
+        self.assertEqual(board.rows(), [("Ani", "7-A", 30), ("Eka", "9-C", 0)])
+
+    def test_reload_returns_changed_rows(self):
+        self.repo.students[4] = ("Dewi", "8-A", 50)
+        self.assertEqual(self.board.reload(), [(0, ("Dewi", "8-A", 50)), (1, ("Ani", "7-A", 30)), (2, ("Budi", "7-B", 20))])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.migrations import LATEST_VERSION
+from core.repository import ConnectionPool, KebaikanRepository
+from core.samples import import_learned_csv, import_rejected_csv
+from core.streaks import SchoolCalendar
+
+
+def baseline_db(path):
+    """kebaikan.db as the app created it before migrations: JSON encodings on siswa, logs by name."""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE siswa (id INTEGER PRIMARY KEY AUTOINCREMENT, nama TEXT, kelas TEXT, encoding TEXT,
+                            total_poin INTEGER DEFAULT 0, streak INTEGER DEFAULT 0, last_active DATE);
+        CREATE TABLE log_aktivitas (id INTEGER PRIMARY KEY AUTOINCREMENT, nama_siswa TEXT, kelas TEXT,
+                                    ide_kebaikan TEXT, skor_ai INTEGER, kategori_ide TEXT,
+                                    waktu TIMESTAMP DEFAULT CURRENT_TIMESTAMP);''')
+    single = [0.5] * 128
+    several = [[0.25] * 128, [-0.75] * 128]
+    conn.executemany("INSERT INTO siswa (nama, kelas, encoding, total_poin) VALUES (?, ?, ?, ?)",
+                     [("Ani", "7-A", json.dumps(single), 15), ("Budi", "7-B", json.dumps(several), 5),
+                      ("Citra", "7-A", "not json", 0)])
+    conn.executemany("INSERT INTO log_aktivitas (nama_siswa, kelas, ide_kebaikan, skor_ai, kategori_ide, waktu) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     [("Ani", "7-A", "membantu teman", 10, "Friend", "2026-03-02 03:00:00"),
+                      ("Ani", "7-A", "menyiram tanaman", 5, "Nature", "2026-03-02 20:00:00"),
+                      ("Budi", "7-B", "membuang sampah", 5, "Nature", "2026-03-03 01:00:00")])
+    conn.commit()
+    conn.close()
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(",".join(header) + "\n")
+        for row in rows:
+            f.write(",".join(row) + "\n")
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, "kebaikan.db")
+        baseline_db(self.db_path)
+        self.pool = ConnectionPool(self.db_path)
+        self.repo = KebaikanRepository(self.pool)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def query(self, sql, params=()):
+        with self.pool.read() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def test_baseline_is_migrated_in_place(self):
+        self.assertEqual(self.repo.init_schema(), LATEST_VERSION)
+        self.assertEqual(self.query("PRAGMA user_version")[0][0], LATEST_VERSION)
+
+        users, matrix, owners = self.repo.load_face_matrix()
+        self.assertEqual(matrix.dtype, np.dtype("<f4"))
+        self.assertEqual(owners.tolist(), [1, 2, 2])
+        np.testing.assert_array_equal(matrix[:, 0], [0.5, 0.25, -0.75])
+        self.assertEqual(sorted(users), [1, 2])
+        # Converted JSON is cleared; the unreadable one is left in place for a manual fix
+        self.assertEqual(self.query("SELECT id, encoding FROM siswa WHERE encoding IS NOT NULL"), [(3, "not json")])
+
+        self.assertEqual(self.query("SELECT siswa_id FROM log_aktivitas ORDER BY id"), [(1,), (1,), (2,)])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM ide_signature")[0][0], 3)
+        self.assertEqual(self.query("SELECT SUM(poin), SUM(jumlah_ide) FROM poin_harian_siswa"), [(20, 3)])
+
+    def test_migrating_twice_is_a_no_op(self):
+        self.repo.init_schema()
+        before = self.query("SELECT COUNT(*) FROM siswa_encoding")
+        self.assertEqual(self.repo.init_schema(), LATEST_VERSION)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM siswa_encoding"), before)
+
+    def test_rollups_use_the_school_timezone(self):
+        from core.migrations import rebuild_point_rollups
+        self.repo.init_schema()
+        with self.pool.transaction() as conn:
+            rebuild_point_rollups(conn, SchoolCalendar("Asia/Jakarta"))
+        # 2026-03-02 20:00 UTC is already 2026-03-03 in Jakarta
+        self.assertEqual(self.query("SELECT tanggal, poin FROM poin_harian_siswa WHERE siswa_id = 1 ORDER BY tanggal"),
+                         [("2026-03-02", 10), ("2026-03-03", 5)])
+
+    def test_legacy_samples_are_deduplicated(self):
+        self.repo.init_schema()
+        learned = os.path.join(self.tmp, "learned_data.csv")
+        write_csv(learned, ["text", "target_level", "quality"],
+                  [("Membantu teman", "Level 1", "Good"), ("membantu   TEMAN", "Level 2", "Good"),
+                   ("menyiram tanaman", "Level 1", "Good"), ("", "Level 1", "Good")])
+        self.assertEqual(import_learned_csv(self.repo, learned), (3, 2))
+        self.assertEqual(import_learned_csv(self.repo, learned), (3, 0)) # importing again adds nothing
+        self.assertEqual([row[1] for row in self.repo.iter_learned_samples()], ["Membantu teman", "menyiram tanaman"])
+
+        rejected = os.path.join(self.tmp, "rejected_data.csv")
+        write_csv(rejected, ["timestamp", "text", "reason"],
+                  [("2026-03-01 08:00:00", "asdf", "gibberish"), ("2026-03-04 08:00:00", "ASDF", "gibberish"),
+                   ("2026-03-02 08:00:00", "asdf", "too short")])
+        self.assertEqual(import_rejected_csv(self.repo, rejected), (3, 2))
+        self.assertIn(("2026-03-04 08:00:00", "asdf", "gibberish", 2, "2026-03-01 08:00:00"),
+                      list(self.repo.iter_rejected_samples()))
+
+
+if __name__ == "__main__":
+    unittest.main()
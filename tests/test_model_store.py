@@ -0,0 +1,60 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.brain import fit_model
+from core.model_store import bundle_path_to_read, load_bundle, save_bundle
+from core.text_knn import CombinedTextPredictor
+
+TEXTS = ["bantu teman kerja tugas", "buang sampah tempat", "siram tanam pagi", "bantu ibu masak",
+         "sapu kelas bersih", "bagi makan teman", "tolong guru bawa buku", "pungut sampah jalan"]
+QUERIES = ["bantu teman", "sampah kelas", "siram tanam", "kata asing"]
+
+
+class BundleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "model")
+        df = pd.DataFrame({"clean_text": TEXTS,
+                           "target_level": ["Level 2", "Level 1", "Level 1", "Level 2"] * 2,
+                           "quality": ["Good", "Good", "Great", "Great"] * 2})
+        self.model = fit_model(df)
+        save_bundle(self.path, *self.model, {"learned_rows": 7})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def predict(self, vectorizer, knn_level, knn_quality):
+        levels, qualities, confidences = CombinedTextPredictor(vectorizer, knn_level, knn_quality).predict(QUERIES)
+        return levels.tolist(), qualities.tolist(), confidences.tolist()
+
+    def test_round_trip_predicts_the_same(self):
+        vectorizer, knn_level, knn_quality, meta = load_bundle(self.path)
+        self.assertEqual(meta, {"learned_rows": 7})
+        self.assertEqual(self.predict(vectorizer, knn_level, knn_quality), self.predict(*self.model))
+
+    def test_corrupt_file_is_rejected(self):
+        data_path = os.path.join(self.path, "X_data.npy")
+        with open(data_path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+        with self.assertRaisesRegex(ValueError, "X_data.npy is corrupt"):
+            load_bundle(self.path)
+
+    def test_interrupted_save_reads_the_old_copy(self):
+        os.replace(self.path, self.path + ".old") # crash between the two renames of save_bundle
+        self.assertEqual(bundle_path_to_read(self.path), self.path + ".old")
+        self.assertEqual(load_bundle(bundle_path_to_read(self.path))[3], {"learned_rows": 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
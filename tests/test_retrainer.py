@@ -0,0 +1,128 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.constants import RETRAIN_HOLDOUT_SHARE, RETRAIN_MAX_ACCURACY_DROP
+from core.repository import ConnectionPool, KebaikanRepository
+from core.retrainer import RetrainService, train_and_validate
+from core.samples import import_learned_csv
+
+LEARNED_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "learned_data.csv")
+
+
+class FakeBrain:
+    def __init__(self, learned):
+        self._learned_since_train = learned
+        self.model_meta = {}
+        self.is_trained = True
+        self.retrain_service = None
+
+
+class RejectingRetrainService(RetrainService):
+    """Candidate is always rejected; counts the trainings instead of starting a worker process."""
+
+    def __init__(self, brain, **kwargs):
+        super().__init__(brain, **kwargs)
+        self.runs = 0
+
+    def _train_in_worker(self, baseline):
+        self.runs += 1
+        return False, "level accuracy too low", {"level": 0.1}, None
+
+
+class RejectedRetrainTest(unittest.TestCase):
+    def test_rejected_retrain_is_not_due_again(self):
+        brain = FakeBrain(learned=10)
+        service = RejectingRetrainService(brain, min_learned=10, interval_hours=None)
+        self.assertTrue(service._due())
+        self.assertFalse(service.retrain_now())
+        self.assertFalse(service._due())
+        self.assertFalse(service._due(requested=True)) # BrainLogic keeps requesting after each auto_learn
+
+        brain._learned_since_train = 19
+        self.assertFalse(service._due())
+        brain._learned_since_train = 20 # min_learned new rows beyond the failed attempt
+        self.assertTrue(service._due())
+
+    def test_rejected_retrain_does_not_retrigger_on_next_tick(self):
+        brain = FakeBrain(learned=10)
+        service = RejectingRetrainService(brain, check_seconds=0.01, min_learned=10, interval_hours=None)
+        service.start()
+        try:
+            deadline = time.monotonic() + 2.0
+            while service.runs == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            service.request()
+            time.sleep(0.2) # many ticks
+        finally:
+            service.stop()
+        self.assertEqual(service.runs, 1)
+
+
+class BlockingRetrainService(RetrainService):
+    """Accepted candidate whose training only ends when the service is stopped."""
+
+    def __init__(self, brain, **kwargs):
+        super().__init__(brain, **kwargs)
+        self.training = threading.Event()
+
+    def _train_in_worker(self, baseline):
+        self.training.set()
+        self._stop_event.wait()
+        return True, "ok", {"level": 1.0}, (None, None, None, 0)
+
+
+class StopTest(unittest.TestCase):
+    def test_stop_discards_the_retrain_in_flight(self):
+        brain = FakeBrain(learned=10)
+        brain.install_model = lambda *args: self.fail("model installed after stop()")
+        service = BlockingRetrainService(brain, check_seconds=0.01, min_learned=10, interval_hours=None)
+        service.start()
+        self.assertTrue(service.training.wait(2.0))
+        service.stop()
+        self.assertIsNone(service._thread)
+        self.assertFalse(service.retrain_now()) # stopped: no new runs either
+
+    def test_cancel_ends_the_worker_process(self):
+        service = RetrainService(FakeBrain(learned=0))
+        service._executor = ProcessPoolExecutor(max_workers=1)
+        future = service._executor.submit(time.sleep, 30)
+        time.sleep(0.5) # worker picked the task up
+        start = time.monotonic()
+        service._cancel_worker()
+        with self.assertRaises(Exception):
+            future.result(timeout=10)
+        self.assertLess(time.monotonic() - start, 10)
+
+
+class ShippedDataRetrainTest(unittest.TestCase):
+    def test_retrain_on_shipped_data_is_accepted(self):
+        # training_data.csv + the shipped learned rows, like the first retrain on a fresh kiosk
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "kebaikan.db")
+            pool = ConnectionPool(db_path)
+            repo = KebaikanRepository(pool)
+            repo.init_schema()
+            import_learned_csv(repo, LEARNED_CSV)
+            pool.close()
+
+            accepted, reason, scores, bundle, _ = train_and_validate(RETRAIN_HOLDOUT_SHARE, None, RETRAIN_MAX_ACCURACY_DROP, db_path)
+            self.assertTrue(accepted, reason)
+            self.assertGreater(scores["holdout_rows"], 0)
+            self.assertEqual(len(bundle), 4)
+
+            # Next retrain on the same data is measured against the live model's score
+            accepted, reason, _, _, _ = train_and_validate(RETRAIN_HOLDOUT_SHARE, scores["level"], RETRAIN_MAX_ACCURACY_DROP, db_path)
+            self.assertTrue(accepted, reason)
+            accepted, _, _, _, _ = train_and_validate(RETRAIN_HOLDOUT_SHARE, scores["level"] + 0.5, RETRAIN_MAX_ACCURACY_DROP, db_path)
+            self.assertFalse(accepted)
+
+
+if __name__ == "__main__":
+    unittest.main()
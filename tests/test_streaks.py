@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.streaks import SchoolCalendar, current_streak, next_streak
+
+# March 2026: the 6th is a Friday, 9-10 are Monday-Tuesday
+CALENDAR = SchoolCalendar(holidays=["2026-03-10"], holiday_ranges=[("2026-03-16", "2026-03-20")])
+
+
+class NextStreakTest(unittest.TestCase):
+    def test_first_submission_starts_at_one(self):
+        self.assertEqual(next_streak(0, None, date(2026, 3, 2), CALENDAR), (1, date(2026, 3, 2)))
+
+    def test_next_school_day_continues(self):
+        self.assertEqual(next_streak(3, "2026-03-03", date(2026, 3, 4), CALENDAR), (4, date(2026, 3, 4)))
+
+    def test_same_day_is_unchanged(self):
+        self.assertEqual(next_streak(3, date(2026, 3, 4), date(2026, 3, 4), CALENDAR), (3, date(2026, 3, 4)))
+
+    def test_weekend_does_not_break(self):
+        self.assertEqual(next_streak(5, date(2026, 3, 6), date(2026, 3, 9), CALENDAR), (6, date(2026, 3, 9)))
+
+    def test_holiday_does_not_break(self):
+        # Tuesday the 10th is a holiday: Monday -> Wednesday continues
+        self.assertEqual(next_streak(2, date(2026, 3, 9), date(2026, 3, 11), CALENDAR), (3, date(2026, 3, 11)))
+        # A holiday week plus both weekends: Friday the 13th -> Monday the 23rd
+        self.assertEqual(next_streak(4, date(2026, 3, 13), date(2026, 3, 23), CALENDAR), (5, date(2026, 3, 23)))
+
+    def test_missed_school_day_restarts(self):
+        self.assertEqual(next_streak(5, date(2026, 3, 5), date(2026, 3, 9), CALENDAR), (1, date(2026, 3, 9)))
+
+    def test_submission_on_a_weekend_counts(self):
+        streak, last_active = next_streak(2, date(2026, 3, 6), date(2026, 3, 7), CALENDAR)
+        self.assertEqual((streak, last_active), (3, date(2026, 3, 7)))
+        self.assertEqual(next_streak(streak, last_active, date(2026, 3, 9), CALENDAR), (4, date(2026, 3, 9)))
+
+
+class CurrentStreakTest(unittest.TestCase):
+    def test_streak_survives_the_weekend(self):
+        self.assertEqual(current_streak(4, "2026-03-06", CALENDAR, today=date(2026, 3, 9)), 4)
+
+    def test_missed_school_day_shows_zero(self):
+        self.assertEqual(current_streak(4, "2026-03-05", CALENDAR, today=date(2026, 3, 9)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
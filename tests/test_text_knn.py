@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.text_knn import SparseKNNClassifier, training_matrix
+
+
+def random_rows(rng, n, n_terms=40):
+    X = sp.random(n, n_terms, density=0.15, format='csr', random_state=rng)
+    X.data = np.round(X.data, 1) + 0.1 # coarse values: equal distances (ties) do occur
+    return X
+
+
+class ExtendTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(7)
+        self.X = random_rows(self.rng, 300)
+        self.y = self.rng.choice(["baik", "cukup", "kurang"], 300)
+        self.queries = random_rows(self.rng, 50)
+
+    def assert_same_model(self, extended, refit):
+        np.testing.assert_array_equal(extended.kneighbors(self.queries)[1], refit.kneighbors(self.queries)[1])
+        np.testing.assert_allclose(extended.kneighbors(self.queries)[0], refit.kneighbors(self.queries)[0])
+        np.testing.assert_array_equal(extended.predict(self.queries), refit.predict(self.queries))
+        self.assertEqual(extended.n_samples_fit_, refit.n_samples_fit_)
+
+    def test_extend_matches_refit(self):
+        base = SparseKNNClassifier().fit(self.X[:250], self.y[:250])
+        extended = base.extend(self.X[250:270], self.y[250:270]).extend(self.X[270:], self.y[270:])
+        self.assertIs(extended._postings, base._postings) # main index shared, not rebuilt
+        self.assertEqual(extended._delta_X.shape[0], 50)
+        self.assert_same_model(extended, SparseKNNClassifier().fit(self.X, self.y))
+        self.assertEqual(base.n_samples_fit_, 250) # the snapshot in use is left untouched
+
+    def test_unseen_class_refits(self):
+        base = SparseKNNClassifier().fit(self.X[:250], np.where(self.y[:250] == "kurang", "cukup", self.y[:250]))
+        y = np.concatenate([base.classes_[base._y], ["kurang"] * 50])
+        self.assert_same_model(base.extend(self.X[250:], y[250:]), SparseKNNClassifier().fit(self.X, y))
+
+    def test_delta_merged_past_limit(self):
+        base = SparseKNNClassifier().fit(self.X[:250], self.y[:250])
+        base.MAX_DELTA_ROWS = 30
+        extended = base.extend(self.X[250:], self.y[250:])
+        self.assertIsNone(extended._delta_X)
+        self.assertEqual(training_matrix(extended).shape[0], 300)
+        self.assert_same_model(extended, SparseKNNClassifier().fit(self.X, self.y))
+
+
+if __name__ == "__main__":
+    unittest.main()
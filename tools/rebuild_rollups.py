@@ -0,0 +1,38 @@
+"""Rebuilds the daily point rollups (poin_harian_siswa / poin_harian_kelas) from log_aktivitas.
+
+Repair tool for when the rollups no longer match the log, e.g. after the timezone in
+school_calendar.json was changed (days are bucketed in the school timezone, like add_points
+does) or log rows were edited by hand. Runs in one transaction.
+
+Usage: python tools/rebuild_rollups.py [--db data/kebaikan.db] [--calendar data/school_calendar.json]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.migrations import rebuild_point_rollups
+from core.repository import ConnectionPool, KebaikanRepository, DB_PATH
+from core.streaks import CALENDAR_PATH, load_calendar
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--calendar", default=CALENDAR_PATH)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.db)
+    KebaikanRepository(pool).init_schema()
+    start = time.perf_counter()
+    with pool.transaction() as conn:
+        rebuild_point_rollups(conn, load_calendar(args.calendar))
+        days = conn.execute("SELECT COUNT(DISTINCT tanggal), COUNT(*) FROM poin_harian_siswa").fetchone()
+    pool.close()
+    print(f"{days[1]} siswa-day rows over {days[0]} days rebuilt [{time.perf_counter() - start:.2f}s]")
+
+
+if __name__ == "__main__":
+    main()
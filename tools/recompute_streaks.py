@@ -0,0 +1,75 @@
+"""Rebuilds siswa.streak / siswa.last_active for every student from log_aktivitas.
+
+Repair tool for when the stored streaks are wrong (e.g. the school calendar was changed
+after the fact, or data was edited by hand). The log is read once, ordered by
+(siswa_id, waktu) via idx_log_siswa_waktu, and streamed through the same next_streak() rule
+add_points applies incrementally; only one student's state is held in memory at a time.
+
+Usage: python tools/recompute_streaks.py [--db data/kebaikan.db] [--calendar data/school_calendar.json] [--dry-run]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.repository import ConnectionPool, KebaikanRepository, DB_PATH
+from core.streaks import CALENDAR_PATH, load_calendar, next_streak
+
+BATCH_SIZE = 500
+
+
+def stream_streaks(conn, calendar):
+    """Yields (siswa_id, streak, last_active ISO date) per student that has logged ideas."""
+    rows = conn.execute("SELECT siswa_id, waktu FROM log_aktivitas WHERE siswa_id IS NOT NULL AND waktu IS NOT NULL "
+                        "ORDER BY siswa_id, waktu")
+    for siswa_id, logs in itertools.groupby(rows, key=lambda row: row[0]):
+        streak, last_active = 0, None
+        for _, waktu in logs:
+            streak, last_active = next_streak(streak, last_active, calendar.local_date(waktu), calendar)
+        yield siswa_id, streak, last_active.isoformat()
+
+
+def rebuild(pool, calendar, dry_run=False):
+    """Rewrites every streak in one transaction. Returns (siswa, siswa with logs, corrected)."""
+    with pool.read() as reader:
+        stored = {row[0]: (row[1] or 0, row[2]) for row in reader.execute("SELECT id, streak, last_active FROM siswa")}
+        seen, changed, batch = set(), 0, []
+        with (nullcontext() if dry_run else pool.transaction()) as writer:
+            if writer is not None:
+                writer.execute("UPDATE siswa SET streak = 0, last_active = NULL") # siswa without logged ideas
+            for siswa_id, streak, last_active in stream_streaks(reader, calendar):
+                seen.add(siswa_id)
+                changed += stored.get(siswa_id, (0, None)) != (streak, last_active)
+                if writer is not None:
+                    batch.append((streak, last_active, siswa_id))
+                    if len(batch) >= BATCH_SIZE:
+                        writer.executemany("UPDATE siswa SET streak = ?, last_active = ? WHERE id = ?", batch)
+                        batch = []
+            if writer is not None:
+                writer.executemany("UPDATE siswa SET streak = ?, last_active = ? WHERE id = ?", batch)
+    changed += sum(1 for siswa_id, value in stored.items() if siswa_id not in seen and value != (0, None))
+    return len(stored), len(seen), changed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--calendar", default=CALENDAR_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="only report how many streaks would change")
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.db)
+    KebaikanRepository(pool).init_schema()
+    start = time.perf_counter()
+    total, active, changed = rebuild(pool, load_calendar(args.calendar), dry_run=args.dry_run)
+    pool.close()
+    action = "would be corrected" if args.dry_run else "corrected"
+    print(f"{total} siswa, {active} with logged ideas, {changed} streaks {action} [{time.perf_counter() - start:.2f}s]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Moves learned / rejected samples between CSV files and the database.
+
+The app keeps learned and rejected samples in SQLite (learned_sample / rejected_sample) and
+imports the old data/learned_data.csv / rejected_data.csv once on first start. This tool is
+for everything else: importing more CSV rows (duplicates are skipped / counted), exporting
+the tables as CSV for teachers, and clearing the stored preprocessed texts after the
+slang/stopword lists changed (the next training preprocesses and stores them again).
+
+Usage: python tools/samples_csv.py import [--learned data/learned_data.csv] [--rejected data/rejected_data.csv] [--no-preprocess] [--db data/kebaikan.db]
+       python tools/samples_csv.py export [--learned learned.csv] [--rejected rejected.csv] [--db data/kebaikan.db]
+       python tools/samples_csv.py reclean [--db data/kebaikan.db]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.repository import ConnectionPool, KebaikanRepository, DB_PATH
+from core.samples import export_learned_csv, export_rejected_csv, import_learned_csv, import_rejected_csv
+
+
+def run_import(repo, args):
+    if args.learned:
+        preprocessor = None
+        if not args.no_preprocess:
+            from core.text_pipeline import TextPreprocessor
+            preprocessor = TextPreprocessor()
+        read, added = import_learned_csv(repo, args.learned, preprocessor)
+        if preprocessor is not None:
+            preprocessor.save_cache()
+        print(f"learned: {read} rows read, {added} added, {read - added} duplicates skipped")
+    if args.rejected:
+        read, distinct = import_rejected_csv(repo, args.rejected)
+        print(f"rejected: {read} rows read, {distinct} distinct (text, reason) stored")
+
+
+def run_export(repo, args):
+    if args.learned:
+        print(f"learned: {export_learned_csv(repo, args.learned)} rows -> {args.learned}")
+    if args.rejected:
+        print(f"rejected: {export_rejected_csv(repo, args.rejected)} rows -> {args.rejected}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=("import", "export", "reclean"))
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--learned", help="learned samples CSV (text,target_level,quality)")
+    parser.add_argument("--rejected", help="rejected samples CSV (timestamp,text,reason)")
+    parser.add_argument("--no-preprocess", action="store_true", help="import without clean_text (the next training fills it in)")
+    args = parser.parse_args()
+    if args.command != "reclean" and not (args.learned or args.rejected):
+        parser.error("give --learned and/or --rejected")
+
+    pool = ConnectionPool(args.db)
+    repo = KebaikanRepository(pool)
+    repo.init_schema()
+    start = time.perf_counter()
+    if args.command == "import":
+        run_import(repo, args)
+    elif args.command == "export":
+        run_export(repo, args)
+    else:
+        print(f"{repo.reset_learned_clean_texts()} stored clean_text values cleared")
+    pool.close()
+    print(f"[{time.perf_counter() - start:.2f}s]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import customtkinter as ctk
+
+class LeaderboardView(ctk.CTkScrollableFrame):
+    """Sidebar leaderboard with a fixed pool of row widgets.
+
+    The rows are created once; show() and apply() only change label texts and hide or show
+    rows (grid_remove keeps each row in its grid slot), nothing is destroyed or re-created.
+    """
+
+    def __init__(self, master, size, **kwargs):
+        super().__init__(master, label_text="Orang Baik", fg_color="white", **kwargs)
+        self.grid_columnconfigure(0, weight=1)
+        self._values = [None] * size
+
+        self.lbl_empty = ctk.CTkLabel(self, text="Belum ada data.")
+        self.lbl_empty.grid(row=0, column=0)
+
+        self._rows = []
+        for idx in range(size):
+            row = ctk.CTkFrame(self, fg_color="transparent")
+            lbl_name = ctk.CTkLabel(row, text="", anchor="w")
+            lbl_name.pack(side="left", padx=5)
+            lbl_score = ctk.CTkLabel(row, text="", font=ctk.CTkFont(weight="bold"))
+            lbl_score.pack(side="right", padx=5)
+            self._rows.append((row, lbl_name, lbl_score))
+
+    def show(self, data):
+        """Sets the whole list ([(nama, kelas, total_poin)], best first)."""
+        data = list(data)[:len(self._rows)]
+        self.apply([(idx, data[idx] if idx < len(data) else None) for idx in range(len(self._rows))])
+
+    def apply(self, diff):
+        """Relabels only the rows in diff [(position, (nama, kelas, total_poin) or None)]."""
+        for idx, value in diff:
+            if idx >= len(self._rows) or value == self._values[idx]:
+                continue
+            row, lbl_name, lbl_score = self._rows[idx]
+            if value is None:
+                row.grid_remove()
+            else:
+                name, class_name, score = value
+                lbl_name.configure(text=f"{idx+1}. {name} ({class_name})")
+                lbl_score.configure(text=f"{score} poin")
+                if self._values[idx] is None:
+                    row.grid(row=idx + 1, column=0, sticky="ew", pady=2)
+            self._values[idx] = value
+
+        if self._values[0] is None:
+            self.lbl_empty.grid()
+        else:
+            self.lbl_empty.grid_remove()